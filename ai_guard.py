@@ -0,0 +1,166 @@
+"""
+AI 聊天的隔离舱（bulkhead）与熔断器。
+
+Coze 变慢时 AI 对话会长时间占用后台线程和上游连接。这里在所有 uWSGI worker 之间
+（借助跨进程缓存）限制同时进行的 AI 对话数：
+    - 并发槽位：AI_CHAT_MAX_CONCURRENT 个槽位租约，用 cache.add 原子抢占，带过期时间，
+      worker 异常退出时租约会自动回收；
+    - 等待队列：槽位已满时最多 AI_CHAT_MAX_WAITING 个请求排队，最长等待 AI_CHAT_QUEUE_TIMEOUT 秒，
+      队列也满了立即拒绝；
+    - 熔断器：上游连续失败 AI_BREAKER_THRESHOLD 次后打开，AI_BREAKER_COOLDOWN 秒内直接拒绝；
+      冷却结束后只放行一个探测请求，成功则关闭，失败则重新打开。
+被拒绝时抛出 Unavailable，由后台任务（chat_jobs.py）作为错误返回给前端。
+/chat_api 提交任务前先调用 check()：熔断中或槽位与等待队列都已满时直接返回 503 和 Retry-After，
+不必等前端轮询才得知。check() 不占用槽位，真正的申请仍在后台线程中由 acquire() 完成。
+"""
+import time
+import uuid
+
+from flask import current_app
+
+import cache
+
+WAITING_KEY = 'ai_guard:waiting'
+FAILURES_KEY = 'ai_guard:failures'
+OPEN_UNTIL_KEY = 'ai_guard:open_until'
+PROBE_KEY = 'ai_guard:probe'
+
+
+class Unavailable(Exception):
+    """AI 聊天暂时不可用（并发已满或熔断中）"""
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def _slot_key(index):
+    return f'ai_guard:slot:{index}'
+
+
+class Lease:
+    """一次 AI 对话占用的并发槽位；release() 可重复调用"""
+
+    def __init__(self, slot_key, token, probe):
+        self.slot_key = slot_key
+        self.token = token
+        self.probe = probe
+        self.released = False
+
+    def succeeded(self):
+        """上游正常返回：清零失败计数，关闭熔断器"""
+        cache.delete(FAILURES_KEY, OPEN_UNTIL_KEY, PROBE_KEY)
+
+    def failed(self):
+        """上游超时或出错：累计失败次数，达到阈值（或探测失败）时打开熔断器"""
+        config = current_app.config
+        failures = cache.incr(FAILURES_KEY, ttl=config['AI_BREAKER_COOLDOWN'] * 10)
+        if self.probe or failures >= config['AI_BREAKER_THRESHOLD']:
+            cache.put(OPEN_UNTIL_KEY, time.time() + config['AI_BREAKER_COOLDOWN'])
+            cache.delete(PROBE_KEY)
+            current_app.logger.warning(f"AI 聊天熔断器打开（连续失败 {failures} 次）")
+
+    def release(self):
+        if self.released:
+            return
+        self.released = True
+        # 租约可能已过期并被其他请求抢到，只释放自己持有的
+        if cache.get(self.slot_key) == self.token:
+            cache.delete(self.slot_key)
+        if self.probe:
+            cache.delete(PROBE_KEY)
+
+
+def _check_breaker():
+    """熔断器打开时抛出 Unavailable；冷却结束后返回 True 表示本次请求作为探测放行"""
+    open_until = cache.get(OPEN_UNTIL_KEY)
+    if open_until is None:
+        return False
+    remaining = open_until - time.time()
+    if remaining > 0:
+        raise Unavailable('AI 助手暂时不可用，请稍后再试', int(remaining) + 1)
+    # 半开：同一时间只放行一个探测请求
+    if not cache.add(PROBE_KEY, 1, current_app.config['AI_CHAT_SLOT_TTL']):
+        raise Unavailable('AI 助手正在恢复，请稍后再试', current_app.config['AI_BREAKER_COOLDOWN'])
+    return True
+
+
+def check():
+    """不占用槽位的快速检查：熔断中（含半开时已有探测请求）或槽位与等待队列都已满时抛出 Unavailable"""
+    config = current_app.config
+    open_until = cache.get(OPEN_UNTIL_KEY)
+    if open_until is not None:
+        remaining = open_until - time.time()
+        if remaining > 0:
+            raise Unavailable('AI 助手暂时不可用，请稍后再试', int(remaining) + 1)
+        if cache.get(PROBE_KEY) is not None:
+            raise Unavailable('AI 助手正在恢复，请稍后再试', config['AI_BREAKER_COOLDOWN'])
+    slots_full = all(cache.get(_slot_key(i)) is not None for i in range(config['AI_CHAT_MAX_CONCURRENT']))
+    if slots_full and cache.get(WAITING_KEY, 0) >= config['AI_CHAT_MAX_WAITING']:
+        raise Unavailable('AI 助手当前繁忙，请稍后再试', 5)
+
+
+def _try_acquire(token):
+    config = current_app.config
+    for index in range(config['AI_CHAT_MAX_CONCURRENT']):
+        if cache.add(_slot_key(index), token, config['AI_CHAT_SLOT_TTL']):
+            return _slot_key(index)
+    return None
+
+
+def acquire():
+    """
+    申请一个 AI 对话槽位，返回 Lease；调用结束后必须 release()。
+    熔断中、等待队列已满或排队超时时抛出 Unavailable。
+    """
+    probe = _check_breaker()
+    token = uuid.uuid4().hex
+    try:
+        slot_key = _try_acquire(token)
+        if slot_key is None:
+            slot_key = _wait_for_slot(token)
+    except Unavailable:
+        if probe:
+            cache.delete(PROBE_KEY)
+        raise
+    return Lease(slot_key, token, probe)
+
+
+def _wait_for_slot(token):
+    config = current_app.config
+    # 计数器带过期时间，worker 异常退出导致的计数泄漏会在空闲后自动清零
+    waiting = cache.incr(WAITING_KEY, ttl=60)
+    try:
+        if waiting > config['AI_CHAT_MAX_WAITING']:
+            raise Unavailable('AI 助手当前繁忙，请稍后再试', 5)
+        deadline = time.monotonic() + config['AI_CHAT_QUEUE_TIMEOUT']
+        delay = 0.05
+        while time.monotonic() < deadline:
+            time.sleep(delay)
+            slot_key = _try_acquire(token)
+            if slot_key is not None:
+                return slot_key
+            delay = min(delay * 2, 0.4)
+        raise Unavailable('AI 助手当前繁忙，请稍后再试', 5)
+    finally:
+        cache.incr(WAITING_KEY, -1, ttl=60)
+
+
+def get_state():
+    """当前占用的槽位数、排队数与熔断器状态（供管理接口查看）"""
+    config = current_app.config
+    open_until = cache.get(OPEN_UNTIL_KEY)
+    if open_until is None:
+        breaker = 'closed'
+    elif open_until > time.time():
+        breaker = 'open'
+    else:
+        breaker = 'half_open'
+    return {
+        'in_flight': sum(1 for i in range(config['AI_CHAT_MAX_CONCURRENT']) if cache.get(_slot_key(i)) is not None),
+        'max_concurrent': config['AI_CHAT_MAX_CONCURRENT'],
+        'waiting': max(cache.get(WAITING_KEY, 0), 0),
+        'max_waiting': config['AI_CHAT_MAX_WAITING'],
+        'breaker': breaker,
+        'consecutive_failures': cache.get(FAILURES_KEY, 0),
+    }
@@ -1,24 +1,67 @@
 import os
+import hmac
 import uuid
 import json
-from flask import Flask, render_template, request, redirect, url_for, flash, send_from_directory, jsonify, session, make_response, g
+from flask import Flask, render_template, request, redirect, url_for, flash, send_from_directory, jsonify, session, make_response, g, \
+    Response
+from werkzeug.middleware.proxy_fix import ProxyFix
 from config import Config
 from datetime import datetime, timedelta
-from database import db, app
-from models import Post, Comment, User, Friendship, Message
-from sqlalchemy import cast, Date
+import database
+from database import db
+from models import Post, Comment, User, Friendship, Message, MessageArchive
+from sqlalchemy import cast, Date, insert, select
+from sqlalchemy.exc import IntegrityError
 from functools import wraps
-import time
-import requests as http_requests
-from PIL import Image, ImageOps
 import io
-
+from types import SimpleNamespace
+import click
+import friend_graph
+import timeline
+import user_search
+import coze_client
+import ai_guard
+import chat_jobs
+import reply_cache
+import user_cache
+import metrics
+import profiler
+import file_outbox
+import assets
+import comment_threads
+import compression
+import streaming
+import post_views
+import preload
+import serializers
+import warmup
+from db_routing import use_primary
+
+
+# 应用实例只有这一个：路由和钩子在本模块导入时注册到它上面，uWSGI 的 callable、flask --app app 都使用它
+app = Flask(__name__)
+app.config.from_object(Config)
 # 确保上传目录存在
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+# uWSGI 在 nginx 之后，request.remote_addr 改为取代理转发的客户端地址（浏览计数按它去重）
+if app.config['PROXY_FIX_X_FOR']:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config['PROXY_FIX_X_FOR'])
+
+# 数据库、读写分离、SQL 统计与指标
+database.init_app(app)
+# Jinja 字节码缓存，需在模板环境创建之前设置
+warmup.init_app(app)
+# 管理员按需剖析请求（?_profile=1）
+profiler.init_app(app)
+# 模板中的 asset_url()：引用 build-assets 生成的带哈希资源
+assets.init_app(app)
+# HTML / JSON 响应按 Accept-Encoding 压缩，流式响应逐段压缩
+compression.init_app(app)
+# 首页、个人主页、好友动态以流式模板输出（模板中的 stream_flush() 为分段点）
+streaming.init_app(app)
+# 博客浏览计数在内存中累积后批量写入，进程退出时写入剩余部分
+post_views.init_app(app)
 
-COZE_API_TOKEN = "pat_QpFYH4qtFkBBWT6Rbo8qU5ImMEkhgUM6Ot5CeU5VoNFsltAkNzj6193GzOg1FK1U"
-COZE_BOT_ID = "7443766574072807458"
-COZE_API_BASE = "https://api.coze.cn"
 NEW_DOMAINS = ['oceanyublog.top', 'www.oceanyublog.top']  # 新域名列表
 OLD_DOMAINS = ['loiioblog.top', 'www.loiioblog.top']  # 旧域名列表
 
@@ -58,87 +101,6 @@ def check_domain():
 
 
 # ========== 辅助函数 ==========
-def coze_chat(user_message: str, conversation_id: str = None):
-    """
-    调用 Coze /v3/chat 接口（非流式），轮询直至获得回复。
-    返回 (reply_text, conversation_id) 或抛出异常。
-    """
-    headers = {
-        "Authorization": f"Bearer {COZE_API_TOKEN}",
-        "Content-Type": "application/json",
-    }
-
-    payload = {
-        "bot_id": COZE_BOT_ID,
-        "user_id": "blog_user",  # 可按需改为真实 user_id
-        "stream": False,
-        "auto_save_history": True,
-        "additional_messages": [
-            {
-                "role": "user",
-                "content": user_message,
-                "content_type": "text",
-            }
-        ],
-    }
-
-    # 如果传入了 conversation_id，则追加（实现多轮对话）
-    if conversation_id:
-        payload["conversation_id"] = conversation_id
-
-    # 1. 发起对话
-    resp = http_requests.post(
-        f"{COZE_API_BASE}/v3/chat",
-        headers=headers,
-        json=payload,
-        timeout=15,
-    )
-    resp.raise_for_status()
-    result = resp.json()
-
-    chat_data = result.get("data", {})
-    chat_id = chat_data.get("id")
-    new_conv_id = chat_data.get("conversation_id")
-
-    if not chat_id:
-        raise RuntimeError(f"Coze 返回异常: {result}")
-
-    # 2. 轮询状态
-    for _ in range(30):
-        time.sleep(1)
-        retrieve_resp = http_requests.get(
-            f"{COZE_API_BASE}/v3/chat/retrieve",
-            headers=headers,
-            params={"chat_id": chat_id, "conversation_id": new_conv_id},
-            timeout=10,
-        )
-        retrieve_resp.raise_for_status()
-        status = retrieve_resp.json().get("data", {}).get("status")
-
-        if status == "completed":
-            # 3. 获取消息列表
-            msg_resp = http_requests.get(
-                f"{COZE_API_BASE}/v3/chat/message/list",
-                headers=headers,
-                params={"chat_id": chat_id, "conversation_id": new_conv_id},
-                timeout=10,
-            )
-            msg_resp.raise_for_status()
-            messages = msg_resp.json().get("data", [])
-
-            # 找到 assistant 的 answer 消息
-            for msg in messages:
-                if msg.get("role") == "assistant" and msg.get("type") == "answer":
-                    return msg.get("content", ""), new_conv_id
-
-            raise RuntimeError("未找到 assistant 回复")
-
-        elif status in ("failed", "requires_action", "canceled"):
-            raise RuntimeError(f"对话状态异常: {status}")
-
-    raise TimeoutError("Coze 响应超时（30秒）")
-
-
 def get_file_full_path(file_path):
     """获取文件的完整系统路径"""
     if not file_path:
@@ -179,6 +141,10 @@ def delete_file(file_path):
         return False
 
 
+# 删除博客 / 评论时文件先记入发件箱，提交后由后台线程删除
+file_outbox.init_app(app, get_file_full_path)
+
+
 def allowed_file(filename):
     return '.' in filename and \
         filename.rsplit('.', 1)[1].lower() in app.config['ALLOWED_EXTENSIONS']
@@ -192,6 +158,8 @@ def save_image_with_thumbnail(file_storage, upload_folder):
         orig_path  (str): 原图相对路径，如 'uploads/orig_<uuid>.jpg'
         thumb_path (str): 缩略图相对路径，如 'uploads/thumb_<uuid>.webp'
     """
+    from PIL import Image, ImageOps  # 只在上传图片时用到，不在 worker 启动时导入
+
     uid = uuid.uuid4().hex
     ext = file_storage.filename.rsplit('.', 1)[1].lower() if '.' in file_storage.filename else 'jpg'
 
@@ -199,11 +167,12 @@ def save_image_with_thumbnail(file_storage, upload_folder):
     orig_filename = f"orig_{uid}.{ext}"
     orig_save_path = os.path.join(upload_folder, orig_filename)
     file_storage.save(orig_save_path)
+    metrics.inc('blog_upload_bytes_total', os.path.getsize(orig_save_path), kind='post_image')
     orig_path = f"uploads/{orig_filename}"
 
     # ---- 压缩图（WebP） ----
     try:
-        with Image.open(orig_save_path) as img:
+        with metrics.timer('blog_image_processing_seconds'), Image.open(orig_save_path) as img:
             # 使用 Pillow 的 exif_transpose 方法自动修正方向
             # 这个方法会根据 EXIF 信息自动旋转图片
             img = ImageOps.exif_transpose(img)
@@ -245,13 +214,29 @@ def get_thumb_path(orig_path):
     return orig_path  # 旧数据直接返回原路径
 
 
+# 首页、个人主页、好友动态的 Link 预加载头（样式表 + 本页前几张缩略图）
+preload.init_app(app, get_thumb_path)
+# JSON 接口的按列查询与序列化，jsonify 在安装了 orjson 时用它编码
+serializers.init_app(app, get_thumb_path)
+
+
 def get_current_user():
-    """从 session 中获取当前登录用户，同一请求内只查询一次数据库"""
+    """
+    从 session 中获取当前登录用户的只读快照（user_cache.UserSnapshot），
+    同一请求内只取一次，跨请求由 user_cache 缓存，通常不会查询数据库。
+    需要修改用户资料时用 load_current_user() 取 User 实例。
+    """
     if '_current_user' not in g:
         user_id = session.get('user_id')
-        g._current_user = User.query.get(user_id) if user_id else None
+        g._current_user = user_cache.get(user_id) if user_id else None
     return g._current_user
 
+
+def load_current_user():
+    """从数据库加载当前登录用户的 User 实例（可修改）"""
+    user_id = session.get('user_id')
+    return db.session.get(User, user_id) if user_id else None
+
 def login_required(f):
     """登录验证装饰器"""
 
@@ -265,6 +250,19 @@ def login_required(f):
     return decorated_function
 
 
+def admin_required(f):
+    """管理员验证装饰器（用于内部运维接口）"""
+
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        current_user = get_current_user()
+        if not current_user or not current_user.is_admin:
+            return jsonify({'success': False, 'error': '无权限'}), 403
+        return f(*args, **kwargs)
+
+    return decorated_function
+
+
 def can_edit_post(post, current_user):
     """判断当前用户是否可以编辑/删除该博客"""
     if not current_user:
@@ -303,31 +301,123 @@ def uploaded_file(filename):
     return send_from_directory(app.config['UPLOAD_FOLDER'], filename)
 
 
+@app.route('/static/dist/<path:filename>')
+def dist_file(filename):
+    """build-assets 生成的带哈希资源：预压缩版本 + 一年 immutable 缓存"""
+    return assets.send(filename)
+
+
 # ========== chat路由 ==========
+
 @app.route('/chat_api', methods=['POST'])
 def chat_api():
-    """前端聊天组件调用的接口"""
+    """
+    前端聊天组件调用的接口：提交一条消息，返回后台任务 id（202），回复由前端轮询 /chat_api/<job_id> 取回。
+    Coze 的回复在后台线程中读取（见 chat_jobs.py），请求线程不会被一次 AI 回复占住。
+    首轮的常见问题直接从 reply_cache 返回完整回复（conversation_id 为空），不请求 Coze；
+    另提交 seed 任务在后台把这轮问答写入一个新建的 Coze 对话，前端轮询 seed_job_id 取回 conversation_id。
+    seed 任务提交失败时仍返回缓存的回复，下一轮开启新对话。
+    熔断中或 AI 槽位与等待队列都已满时立即返回 503 和 Retry-After（见 ai_guard.check）。
+    """
+    data = request.get_json(force=True, silent=True) or {}
+    user_message = (data.get('message') or '').strip()
+    conversation_id = data.get('conversation_id')  # 可选，用于多轮对话
+
+    if not user_message:
+        return jsonify({'success': False, 'error': '消息不能为空'})
+
+    cache_reply = reply_cache.cacheable(user_message, conversation_id)
+    cached = reply_cache.get(user_message) if cache_reply else None
+    if cached is not None:
+        try:
+            ai_guard.check()
+            seed_job_id = chat_jobs.seed(user_message, cached)
+        except ai_guard.Unavailable:
+            seed_job_id = None
+        return jsonify({'success': True, 'reply': cached, 'conversation_id': None, 'cached': True,
+                        'seed_job_id': seed_job_id})
+
     try:
-        data = request.get_json(force=True) or {}
-        user_message = data.get('message', '').strip()
-        conversation_id = data.get('conversation_id')  # 可选，用于多轮对话
+        ai_guard.check()  # 熔断中或各进程的槽位与队列都已满时立即拒绝，不创建任务
+        job_id = chat_jobs.start(user_message, conversation_id, cache_reply)
+    except ai_guard.Unavailable as e:
+        return jsonify({'success': False, 'error': str(e)}), 503, {'Retry-After': str(e.retry_after)}
+    return jsonify({'success': True, 'job_id': job_id}), 202
 
-        if not user_message:
-            return jsonify({'success': False, 'error': '消息不能为空'})
 
-        reply, new_conv_id = coze_chat(user_message, conversation_id)
+@app.route('/chat_api/<job_id>')
+def chat_job_status(job_id):
+    """
+    轮询对话进度：返回 offset 之后新增的回复文本和任务状态（running / done / error）。
+    任务不存在时（已过期或执行它的 worker 已退出）返回 404。
+    """
+    job = chat_jobs.get(job_id)
+    if job is None:
+        return jsonify({'success': False, 'error': '对话已中断，请重新发送'}), 404
+    offset = request.args.get('offset', 0, type=int)
+    return jsonify({
+        'success': True,
+        'status': job['status'],
+        'delta': job['text'][offset:],
+        'offset': len(job['text']),
+        'conversation_id': job['conversation_id'],
+        'error': job['error'],
+        'retry_after': job['retry_after'],
+    })
 
-        return jsonify({
-            'success': True,
-            'reply': reply,
-            'conversation_id': new_conv_id,
-        })
 
-    except TimeoutError as e:
-        return jsonify({'success': False, 'error': str(e)}), 504
-    except Exception as e:
-        app.logger.error(f"chat_api error: {e}")
-        return jsonify({'success': False, 'error': str(e)}), 500
+@app.route('/admin/coze_stats')
+@admin_required
+def coze_stats():
+    """Coze 上游各接口的调用次数、失败次数与平均耗时"""
+    return jsonify({
+        'success': True,
+        'stats': coze_client.get_stats(),
+        'guard': ai_guard.get_state(),
+        'reply_cache': reply_cache.get_stats(),
+    })
+
+
+@app.route('/internal/metrics')
+def internal_metrics():
+    """
+    Prometheus 抓取接口：必须携带 METRICS_TOKEN（Authorization: Bearer <token>），未配置时不开放。
+    不按来源地址放行：uWSGI 在反向代理之后，来源地址取自代理转发的请求头，不能作为凭据。
+    """
+    token = app.config['METRICS_TOKEN']
+    provided = request.headers.get('Authorization', '')
+    if not token or not hmac.compare_digest(provided.encode(), f'Bearer {token}'.encode()):
+        return jsonify({'success': False, 'error': '无权限'}), 403
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+
+@app.route('/admin/profiles')
+@admin_required
+def admin_profiles():
+    """最近的请求剖析结果；带 name 参数时显示该次剖析按累计耗时排序的前 40 行"""
+    name = request.args.get('name')
+    profiles = profiler.list_profiles()
+    if name not in {p['name'] for p in profiles}:
+        name = None
+    return render_template('admin_profiles.html', profiles=profiles, selected=name,
+                           summary=profiler.summary(name) if name else None)
+
+
+@app.route('/admin/profiles/<path:filename>')
+@admin_required
+def download_profile(filename):
+    """下载 .prof（pstats）或 .collapsed（火焰图输入）文件"""
+    if not filename.endswith(('.prof', '.collapsed')):
+        return jsonify({'success': False, 'error': '不支持的文件类型'}), 404
+    return send_from_directory(profiler.profile_dir(), filename, as_attachment=True)
+
+
+@app.route('/admin/reply_cache/purge', methods=['POST'])
+@admin_required
+def purge_reply_cache():
+    """清空 AI 聊天的回复缓存"""
+    reply_cache.purge()
+    return jsonify({'success': True})
 
 
 # ========== 主页 ==========
@@ -336,6 +426,7 @@ def chat_api():
 def index():
     search_title = request.args.get('search_title', '').strip()
     search_date = request.args.get('search_date', '').strip()
+    sort = 'hot' if request.args.get('sort') == 'hot' else None
     page = request.args.get('page', 1, type=int)
     per_page = 9
 
@@ -351,19 +442,22 @@ def index():
         except ValueError:
             flash('日期格式错误，请使用 YYYY-MM-DD 格式', 'error')
 
-    posts_pagination = query.order_by(Post.date.desc()).paginate(
+    order = post_views.hot_order() if sort == 'hot' else (Post.date.desc(),)
+    posts_pagination = query.order_by(*order).paginate(
         page=page, per_page=per_page, error_out=False
     )
 
     posts = posts_pagination.items
+    preload.use_posts(posts)
     current_user = get_current_user()
 
-    return render_template('index.html',
-                           posts=posts,
-                           pagination=posts_pagination,
-                           search_title=search_title,
-                           search_date=search_date,
-                           current_user=current_user)
+    return streaming.render('index.html',
+                            posts=posts,
+                            pagination=posts_pagination,
+                            search_title=search_title,
+                            search_date=search_date,
+                            sort=sort,
+                            current_user=current_user)
 
 
 # ========== 用户认证 ==========
@@ -438,6 +532,7 @@ def register():
             filename = f"avatar_{uuid.uuid4().hex}.{ext}"
             save_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
             file.save(save_path)
+            metrics.inc('blog_upload_bytes_total', os.path.getsize(save_path), kind='avatar')
             avatar_path = f"uploads/{filename}"
 
         # 判断是否为第一个用户（自动设为管理员）
@@ -456,6 +551,8 @@ def register():
         new_user.set_password(password)
 
         db.session.add(new_user)
+        db.session.flush()
+        user_search.index_user(new_user.id, new_user.username)
         db.session.commit()
 
         session['user_id'] = new_user.id
@@ -481,27 +578,28 @@ def user_profile(user_id):
     current_user = get_current_user()
     # 获取该用户的博客
     posts = Post.query.filter_by(user_id=user_id).order_by(Post.date.desc()).all()
+    preload.use_posts(posts)
 
     # 好友关系状态（仅对登录用户且不是自己时有效）
-    friendship_obj = None
+    friendship_id = None
     friendship_status = None
     if current_user and current_user.id != user_id:
-        friendship_obj, friendship_status = get_friendship_status(current_user.id, user_id)
+        friendship_id, friendship_status = get_friendship_status(current_user.id, user_id)
 
-    return render_template(
+    return streaming.render(
         'user_profile.html',
         profile_user=user,
         posts=posts,
         current_user=current_user,
         friendship_status=friendship_status,
-        friendship_id=friendship_obj.id if friendship_obj else None,
+        friendship_id=friendship_id,
     )
 
 
 @app.route('/user/edit', methods=['GET', 'POST'])
 @login_required
 def edit_profile():
-    current_user = get_current_user()
+    current_user = load_current_user()
 
     if request.method == 'POST':
         bio = request.form.get('bio', '').strip() or '这个人很神秘，什么都没有留下~'
@@ -541,6 +639,7 @@ def edit_profile():
             os.makedirs(upload_folder, exist_ok=True)
             save_path = os.path.join(upload_folder, filename)
             file.save(save_path)
+            metrics.inc('blog_upload_bytes_total', os.path.getsize(save_path), kind='avatar')
 
             current_user.avatar_path = f"uploads/{filename}"
 
@@ -549,6 +648,7 @@ def edit_profile():
         current_user.updated_at = datetime.utcnow() + timedelta(hours=8)  # 更新时区时间
 
         db.session.commit()
+        user_cache.invalidate(current_user.id)
 
         flash('个人信息更新成功！', 'success')
         return redirect(url_for('user_profile', user_id=current_user.id))
@@ -583,15 +683,19 @@ def add_post():
 
         image_paths_json = json.dumps(image_paths) if image_paths else None
 
+        date = datetime.utcnow() + timedelta(hours=8)
         new_post = Post(
             title=title,
             content=content,
             tags=tags,
             image_path=image_paths_json,
-            date=datetime.utcnow() + timedelta(hours=8),
-            user_id=current_user.id
+            date=date,
+            user_id=current_user.id,
+            hot_score=post_views.score_at(date)  # 发布时计一次浏览，新博客有初始热度
         )
         db.session.add(new_post)
+        db.session.flush()
+        timeline.fan_out_post(new_post)  # 写入好友时间线，与博客同一事务提交
         db.session.commit()
 
         flash('文章发布成功！', 'success')
@@ -622,8 +726,9 @@ def get_user_info(user_id):
 def api_posts():
     page = request.args.get('page', 1, type=int)
     per_page = 9
+    order = post_views.hot_order() if request.args.get('sort') == 'hot' else (Post.date.desc(),)
 
-    posts = Post.query.order_by(Post.date.desc()).paginate(
+    posts = serializers.project_posts(Post.query).order_by(*order).paginate(
         page=page, per_page=per_page, error_out=False
     )
 
@@ -631,16 +736,7 @@ def api_posts():
 
     return jsonify({
         'success': True,
-        'posts': [{
-            'id': post.id,
-            'title': post.title,
-            'content': post.content,
-            'tags': post.tags,
-            'date': post.date.strftime('%Y-%m-%d'),
-            'image_paths_json': post.image_paths_json,
-            'author': post.author_user.username if post.author_user else post.tags,
-            'can_edit': can_edit_post(post, current_user)
-        } for post in posts.items],
+        'posts': [serializers.post(row, can_edit_post(row, current_user)) for row in posts.items],
         'pagination': {
             'page': posts.page,
             'pages': posts.pages,
@@ -729,28 +825,28 @@ def delete_post(post_id):
         if not can_edit_post(post, current_user):
             return jsonify({'success': False, 'message': '你没有权限删除这篇文章'})
 
-        # 删除博客关联的图片文件（原图 + 缩略图）
+        # 图片（原图 + 缩略图）与评论语音记入文件删除发件箱，与删除数据同一事务提交
+        file_paths = []
         if post.image_path:
             try:
-                image_paths = json.loads(post.image_path)
-                for entry in image_paths:
+                for entry in json.loads(post.image_path):
                     orig_path = entry if isinstance(entry, str) else entry.get('orig', '')
-                    delete_file(orig_path)
+                    file_paths.append(orig_path)
                     thumb_path = get_thumb_path(orig_path)
                     if thumb_path != orig_path:
-                        delete_file(thumb_path)
+                        file_paths.append(thumb_path)
             except (json.JSONDecodeError, Exception) as e:
-                print(f"删除图片文件时出错: {e}")
-
-        # 删除博客关联的评论中的语音文件
-        comments = Comment.query.filter_by(post_id=post_id).all()
-        for comment in comments:
-            if comment.voice_path:
-                delete_file(comment.voice_path)  # 使用辅助函数删除
-            db.session.delete(comment)
-
-        db.session.delete(post)
+                print(f"解析图片路径时出错: {e}")
+        file_outbox.enqueue(file_paths)
+        file_outbox.enqueue_comment_voices(post_id)
+
+        # 转发过这篇博客的私信保留，只去掉引用；评论和时间线由外键 ON DELETE CASCADE 删除
+        for model in (Message, MessageArchive):
+            model.query.filter_by(forwarded_post_id=post_id).update(
+                {'forwarded_post_id': None}, synchronize_session=False)
+        Post.query.filter_by(id=post_id).delete(synchronize_session=False)
         db.session.commit()
+        file_outbox.kick()
 
         return jsonify({'success': True, 'message': '文章及关联文件删除成功！'})
     except Exception as e:
@@ -776,6 +872,7 @@ def upload_voice():
         os.makedirs(upload_folder, exist_ok=True)
         save_path = os.path.join(upload_folder, filename)
         file.save(save_path)
+        metrics.inc('blog_upload_bytes_total', os.path.getsize(save_path), kind='voice')
 
         voice_path = f"uploads/{filename}"
         return jsonify({'success': True, 'voice_path': voice_path, 'duration': duration})
@@ -783,37 +880,34 @@ def upload_voice():
         return jsonify({'success': False, 'message': str(e)})
 
 
+@app.route('/post/<int:post_id>/view', methods=['POST'])
+def record_post_view(post_id):
+    """打开博客详情时由前端 sendBeacon 调用，只在内存中计数"""
+    post_views.record(post_id)
+    return '', 204
+
+
 # ========== 评论操作 ==========
 
 @app.route('/get_comments/<int:post_id>')
 def get_comments(post_id):
+    """
+    一页顶层评论（新的在前）及各自的前几条回复；count 为包括回复在内的评论总数。
+    下一页以 ?before=<next_cursor> 请求，next_cursor 为空表示没有更早的评论。
+    """
     current_user = get_current_user()
-    comments = Comment.query.filter_by(post_id=post_id).order_by(Comment.date.desc()).all()
-    comments_data = []
-    for comment in comments:
-        can_edit = can_edit_comment(comment, current_user)
-        author_avatar = None
-        author_id = None
-        is_admin = False  # 默认不是管理员
-
-        if comment.author_user:
-            author_avatar = comment.author_user.avatar_path
-            author_id = comment.author_user.id
-            is_admin = comment.author_user.role == 'admin'  # 判断是否为管理员
-
-        comments_data.append({
-            'id': comment.id,
-            'content': comment.content,
-            'author': comment.author,
-            'date': comment.date.strftime('%Y-%m-%d %H:%M'),
-            'can_edit': can_edit,
-            'author_avatar': author_avatar,
-            'author_id': author_id,
-            'is_admin': is_admin,
-            'voice_path': comment.voice_path,
-            'voice_duration': comment.voice_duration
-        })
-    return jsonify({'comments': comments_data})
+    before = request.args.get('before', type=int)
+    threads, next_cursor = comment_threads.post_threads(post_id, current_user, can_edit_comment, before)
+    return jsonify({'comments': threads, 'count': comment_threads.count(post_id), 'next_cursor': next_cursor})
+
+
+@app.route('/get_comment_thread/<int:comment_id>')
+def get_comment_thread(comment_id):
+    """一条评论及其全部回复（按楼层先序排列）"""
+    thread = comment_threads.thread(comment_id, get_current_user(), can_edit_comment)
+    if thread is None:
+        return jsonify({'success': False, 'message': '评论不存在'}), 404
+    return jsonify({'success': True, 'comment': thread})
 
 
 @app.route('/add_comment', methods=['POST'])
@@ -832,6 +926,12 @@ def add_comment():
         if not post:
             return jsonify({'success': False, 'message': '文章不存在'})
 
+        parent = None
+        if data.get('parent_id'):
+            parent = db.session.get(Comment, int(data['parent_id']))
+            if not parent or parent.post_id != post.id:
+                return jsonify({'success': False, 'message': '回复的评论不存在'})
+
         voice_path = data.get('voice_path')
         voice_duration = data.get('voice_duration')
 
@@ -846,23 +946,21 @@ def add_comment():
         )
 
         db.session.add(new_comment)
+        db.session.flush()
+        comment_threads.attach(new_comment, parent)  # 需要 flush 得到的 id
+        # 提交前按内存中的值序列化，提交后不必再查询评论和作者
+        comment = serializers.comment(SimpleNamespace(
+            id=new_comment.id, content=content, author=current_user.username, date=new_comment.date,
+            author_avatar=current_user.avatar_path, author_id=current_user.id, author_role=current_user.role,
+            voice_path=voice_path, voice_duration=voice_duration,
+            parent_id=new_comment.parent_id, depth=new_comment.depth, reply_count=0,
+        ), can_edit=True)
         db.session.commit()
 
         return jsonify({
             'success': True,
             'message': '评论添加成功',
-            'comment': {
-                'id': new_comment.id,
-                'content': new_comment.content,
-                'author': new_comment.author,
-                'date': new_comment.date.strftime('%Y-%m-%d %H:%M'),
-                'can_edit': True,
-                'author_avatar': current_user.avatar_path,
-                'author_id': current_user.id,
-                'is_admin': current_user.role == 'admin',
-                'voice_path': new_comment.voice_path,
-                'voice_duration': new_comment.voice_duration
-            }
+            'comment': comment
         })
     except Exception as e:
         db.session.rollback()
@@ -874,9 +972,9 @@ def add_comment():
 def edit_comment(comment_id):
     try:
         current_user = get_current_user()
-        comment = Comment.query.get_or_404(comment_id)
+        row = serializers.project_comments(Comment.query.filter(Comment.id == comment_id)).first_or_404()
 
-        if not can_edit_comment(comment, current_user):
+        if not can_edit_comment(row, current_user):
             return jsonify({'success': False, 'message': '你没有权限编辑这条评论'})
 
         data = request.get_json()
@@ -885,24 +983,15 @@ def edit_comment(comment_id):
         if not content:
             return jsonify({'success': False, 'message': '评论内容不能为空'})
 
-        comment.content = content
+        Comment.query.filter(Comment.id == comment_id).update({'content': content})
         db.session.commit()
 
-        # 获取评论作者信息
-        is_admin = comment.author_user.role == 'admin' if comment.author_user else False
-
+        comment = serializers.comment(row)
+        comment['content'] = content
         return jsonify({
             'success': True,
             'message': '评论更新成功',
-            'comment': {
-                'id': comment.id,
-                'content': comment.content,
-                'author': comment.author,
-                'date': comment.date.strftime('%Y-%m-%d %H:%M'),
-                'author_id': comment.user_id,
-                'author_avatar': comment.author_user.avatar_path if comment.author_user else None,
-                'is_admin': is_admin  # 添加管理员标志
-            }
+            'comment': comment
         })
     except Exception as e:
         db.session.rollback()
@@ -919,12 +1008,10 @@ def delete_comment(comment_id):
         if not can_edit_comment(comment, current_user):
             return jsonify({'success': False, 'message': '你没有权限删除这条评论'})
 
-        # 删除评论关联的语音文件
-        if comment.voice_path:
-            delete_file(comment.voice_path)  # 使用辅助函数删除
-
-        db.session.delete(comment)
+        # 连同全部回复一起删除，语音文件在提交后由发件箱删除
+        comment_threads.delete(comment)
         db.session.commit()
+        file_outbox.kick()
 
         return jsonify({'success': True, 'message': '评论及语音文件删除成功'})
     except Exception as e:
@@ -961,39 +1048,130 @@ def thumb_path_filter(orig_path):
     return get_thumb_path(orig_path)
 
 
+# ========== 私信辅助 ==========
+
+def conversation_query(model, user_id, friend_id):
+    """两人之间对 user_id 可见的消息查询，model 为 Message 或 MessageArchive"""
+    return model.query.filter(
+        ((model.sender_id == user_id) & (model.receiver_id == friend_id) & (
+                model.is_deleted_by_sender == False)) |
+        ((model.sender_id == friend_id) & (model.receiver_id == user_id) & (
+                model.is_deleted_by_receiver == False))
+    )
+
+
+def purge_deleted_messages(model, batch_size):
+    """分批硬删除双方都已删除的消息，提交后再删除其图片与缩略图文件"""
+    total = 0
+    while True:
+        rows = db.session.query(model.id, model.image_path, model.thumb_path).filter(
+            model.is_deleted_by_sender == True,
+            model.is_deleted_by_receiver == True
+        ).order_by(model.id).limit(batch_size).all()
+        if not rows:
+            break
+        model.query.filter(model.id.in_([r.id for r in rows])).delete(synchronize_session=False)
+        db.session.commit()
+        for r in rows:
+            delete_file(r.image_path)
+            if r.thumb_path and r.thumb_path != r.image_path:
+                delete_file(r.thumb_path)
+        total += len(rows)
+    return total
+
+
+def archive_old_messages(older_than_days, batch_size):
+    """分批把超过保留期的已读消息移入归档表，返回移动的行数"""
+    cutoff = datetime.utcnow() + timedelta(hours=8) - timedelta(days=older_than_days)
+    columns = [c.name for c in Message.__table__.columns]
+    total = 0
+    while True:
+        ids = [r.id for r in db.session.query(Message.id).filter(
+            Message.created_at < cutoff,
+            Message.is_read == True
+        ).order_by(Message.id).limit(batch_size).all()]
+        if not ids:
+            break
+        db.session.execute(insert(MessageArchive).from_select(
+            columns,
+            select(*[Message.__table__.c[name] for name in columns]).where(Message.id.in_(ids))
+        ))
+        Message.query.filter(Message.id.in_(ids)).delete(synchronize_session=False)
+        db.session.commit()
+        total += len(ids)
+    return total
+
+
+@app.cli.command('compact-messages')
+@click.option('--days', type=int, default=None, help='归档早于该天数的已读消息，默认取 MESSAGE_ARCHIVE_DAYS')
+@click.option('--batch-size', type=int, default=None, help='每批处理行数，默认取 MESSAGE_COMPACT_BATCH')
+def compact_messages_command(days, batch_size):
+    """清理双方都已删除的消息，并归档旧消息（由 uWSGI cron 定时执行）"""
+    days = days if days is not None else app.config['MESSAGE_ARCHIVE_DAYS']
+    batch_size = batch_size or app.config['MESSAGE_COMPACT_BATCH']
+    purged = purge_deleted_messages(Message, batch_size)
+    purged += purge_deleted_messages(MessageArchive, batch_size)
+    archived = archive_old_messages(days, batch_size)
+    click.echo(f'已清理 {purged} 条双方删除的消息，归档 {archived} 条旧消息')
+
+
+@app.cli.command('rebuild-timelines')
+def rebuild_timelines_command():
+    """根据现有好友关系重建全部好友动态时间线"""
+    pairs = timeline.rebuild_all()
+    db.session.commit()
+    click.echo(f'已根据 {pairs} 对好友关系重建时间线')
+
+
+@app.cli.command('rebuild-search-index')
+def rebuild_search_index_command():
+    """为全部用户重建用户名 n-gram 搜索索引"""
+    count = user_search.rebuild_index()
+    db.session.commit()
+    click.echo(f'已为 {count} 个用户重建用户名搜索索引')
+
+
+@app.cli.command('process-file-deletions')
+@click.option('--batch-size', type=int, default=None, help='每批处理的文件数，默认取 FILE_DELETION_BATCH')
+def process_file_deletions_command(batch_size):
+    """处理文件删除发件箱中遗留的记录（由 uWSGI cron 定时执行）"""
+    count = file_outbox.drain(batch_size or app.config['FILE_DELETION_BATCH'], click.echo)
+    click.echo(f'已处理 {count} 条文件删除记录')
+
+
+@app.cli.command('rebuild-hot-scores')
+def rebuild_hot_scores_command():
+    """按发布时间和浏览数重算热度（上线或修改 HOT_HALF_LIFE_HOURS 后执行）"""
+    count = post_views.rebuild()
+    click.echo(f'已重算 {count} 篇博客的热度')
+
+
+@app.cli.command('build-assets')
+@click.option('--clean', is_flag=True, help='删除不再被 manifest 引用的旧构建产物')
+def build_assets_command(clean):
+    """压缩 static/css、static/js 并按内容哈希写入 static/dist（部署时执行，之后重启 uWSGI）"""
+    manifest = assets.build(app.static_folder, clean=clean, log=click.echo)
+    click.echo(f'已构建 {len(manifest)} 个资源')
+
+
 # ========== 好友功能辅助 ==========
 
 def get_friends(user_id):
-    """获取已接受的好友列表"""
-    friendships = Friendship.query.filter(
-        ((Friendship.requester_id == user_id) | (Friendship.receiver_id == user_id)),
-        Friendship.status == 'accepted'
-    ).all()
-    friends = []
-    for f in friendships:
-        friend = f.receiver if f.requester_id == user_id else f.requester
-        friends.append(friend)
-    return friends
+    """获取已接受的好友列表（好友 id 来自关系图缓存，用户信息一次查询）"""
+    friend_ids = friend_graph.get_friend_ids(user_id)
+    if not friend_ids:
+        return []
+    return User.query.filter(User.id.in_(friend_ids)).all()
 
 
 def are_friends(user_id_a, user_id_b):
     """检查两用户是否是好友"""
-    return Friendship.query.filter(
-        ((Friendship.requester_id == user_id_a) & (Friendship.receiver_id == user_id_b)) |
-        ((Friendship.requester_id == user_id_b) & (Friendship.receiver_id == user_id_a)),
-        Friendship.status == 'accepted'
-    ).first() is not None
+    return friend_graph.are_friends(user_id_a, user_id_b)
 
 
 def get_friendship_status(current_user_id, other_user_id):
-    """获取两用户之间的好友关系状态"""
-    f = Friendship.query.filter(
-        ((Friendship.requester_id == current_user_id) & (Friendship.receiver_id == other_user_id)) |
-        ((Friendship.requester_id == other_user_id) & (Friendship.receiver_id == current_user_id))
-    ).first()
-    if not f:
-        return None, None
-    return f, f.status
+    """获取两用户之间的好友关系，返回 (friendship_id, status)"""
+    return friend_graph.get_status(current_user_id, other_user_id)
 
 
 # ========== 好友博客页 ==========
@@ -1003,26 +1181,23 @@ def get_friendship_status(current_user_id, other_user_id):
 def friend_posts():
     current_user = get_current_user()
     friends = get_friends(current_user.id)
-    friend_ids = [f.id for f in friends]
-    page = request.args.get('page', 1, type=int)
+    cursor = request.args.get('cursor')
     per_page = 9
-    if friend_ids:
-        posts_pagination = Post.query.filter(Post.user_id.in_(friend_ids)).order_by(Post.date.desc()).paginate(
-            page=page, per_page=per_page, error_out=False
-        )
-    else:
-        posts_pagination = Post.query.filter(Post.id == -1).paginate(page=1, per_page=per_page, error_out=False)
-    return render_template('friend_posts.html',
-                           posts=posts_pagination.items,
-                           pagination=posts_pagination,
-                           friends=friends,
-                           friends_json=[{  # ← 新增这个
-                               'id': f.id,
-                               'username': f.username,
-                               'avatar_path': f.avatar_path or None
-                           } for f in friends],
-                           current_user=current_user,
-                           get_thumb_path=get_thumb_path)
+    # 从当前用户的时间线按 keyset 读取一页，不再对全部好友的博客做 IN + OFFSET
+    posts, next_cursor = timeline.read_timeline(current_user.id, cursor, per_page)
+    preload.use_posts(posts)
+    return streaming.render('friend_posts.html',
+                            posts=posts,
+                            next_cursor=next_cursor,
+                            is_first_page=not cursor,
+                            friends=friends,
+                            friends_json=[{  # ← 新增这个
+                                'id': f.id,
+                                'username': f.username,
+                                'avatar_path': f.avatar_path or None
+                            } for f in friends],
+                            current_user=current_user,
+                            get_thumb_path=get_thumb_path)
 
 
 # ========== 消息列表页 ==========
@@ -1065,6 +1240,7 @@ def messages_list():
 
 @app.route('/chat/<int:friend_id>')
 @login_required
+@use_primary
 def chat(friend_id):
     current_user = get_current_user()
     friend = User.query.get_or_404(friend_id)
@@ -1080,14 +1256,44 @@ def chat(friend_id):
     ).update({'is_read': True})
     db.session.commit()
 
-    messages = Message.query.filter(
-        ((Message.sender_id == current_user.id) & (Message.receiver_id == friend_id) & (
-                    Message.is_deleted_by_sender == False)) |
-        ((Message.sender_id == friend_id) & (Message.receiver_id == current_user.id) & (
-                    Message.is_deleted_by_receiver == False))
-    ).order_by(Message.created_at.asc()).all()
+    # 首屏只加载最近一页，更早的消息由 /chat_history 向上翻页加载。
+    # 与 chat_history 一样从热表和归档表各取一页后合并：未读的旧消息不归档，两表的 id 会交错
+    page_size = app.config['CHAT_PAGE_SIZE']
+    messages = []
+    for model in (Message, MessageArchive):
+        messages += conversation_query(model, current_user.id, friend_id).order_by(
+            model.id.desc()).limit(page_size + 1).all()
+    messages.sort(key=lambda m: m.id, reverse=True)
+    has_more = len(messages) > page_size
+    messages = messages[:page_size][::-1]
+
+    return render_template('chat.html', friend=friend, messages=messages, has_more=has_more,
+                           current_user=current_user)
 
-    return render_template('chat.html', friend=friend, messages=messages, current_user=current_user)
+
+@app.route('/chat_history/<int:friend_id>')
+@login_required
+def chat_history(friend_id):
+    """
+    向上翻页：返回 before_id 之前的一页消息。
+    归档只移走已读的旧消息，未读的旧消息仍在热表中，两表的 id 会交错，
+    因此按同一游标分别取一页后合并排序，不能以热表中最旧的一条作为归档表的边界。
+    """
+    current_user = get_current_user()
+    before_id = request.args.get('before_id', 0, type=int)
+    page_size = app.config['CHAT_PAGE_SIZE']
+
+    messages = []
+    for model in (Message, MessageArchive):
+        query = conversation_query(model, current_user.id, friend_id)
+        if before_id:
+            query = query.filter(model.id < before_id)
+        messages += serializers.project_messages(query, model).order_by(model.id.desc()).limit(page_size + 1).all()
+    messages.sort(key=lambda m: m.id, reverse=True)
+
+    has_more = len(messages) > page_size
+    messages = messages[:page_size][::-1]
+    return jsonify({'messages': [serializers.message(m) for m in messages], 'has_more': has_more})
 
 
 @app.route('/mark_read/<int:friend_id>', methods=['POST'])
@@ -1148,27 +1354,12 @@ def send_message():
         created_at=datetime.utcnow() + timedelta(hours=8)
     )
     db.session.add(msg)
+    db.session.flush()
+    # 提交前按 id 取回一行（转发的博客在同一条语句中取得），提交后不必刷新 msg
+    row = serializers.project_messages(Message.query.filter(Message.id == msg.id), Message).one()
     db.session.commit()
 
-    # 构建返回数据
-    msg_data = {
-        'id': msg.id,
-        'sender_id': msg.sender_id,
-        'content': msg.content,
-        'image_thumb': f'/static/{msg.thumb_path}' if msg.thumb_path else None,
-        'image_orig': f'/static/{msg.image_path}' if msg.image_path else None,
-        'forwarded_post': None,
-        'created_at': msg.created_at.strftime('%H:%M'),
-        'created_at_full': msg.created_at.strftime('%Y-%m-%d %H:%M'),
-    }
-    if msg.forwarded_post_id and msg.forwarded_post:
-        post = msg.forwarded_post
-        msg_data['forwarded_post'] = {
-            'id': post.id,
-            'title': post.title,
-            'content': post.content[:100],
-        }
-    return jsonify({'success': True, 'message': msg_data})
+    return jsonify({'success': True, 'message': serializers.message(row)})
 
 
 # ========== 删除消息 API ==========
@@ -1177,7 +1368,8 @@ def send_message():
 @login_required
 def delete_message(msg_id):
     current_user = get_current_user()
-    msg = Message.query.get_or_404(msg_id)
+    # 已归档的旧消息同样允许删除
+    msg = Message.query.get(msg_id) or MessageArchive.query.get_or_404(msg_id)
     if msg.sender_id == current_user.id:
         msg.is_deleted_by_sender = True
     elif msg.receiver_id == current_user.id:
@@ -1213,15 +1405,35 @@ def add_friend(user_id):
     if user_id == current_user.id:
         return jsonify({'success': False, 'error': '不能添加自己为好友'})
     target = User.query.get_or_404(user_id)
-    existing, status = get_friendship_status(current_user.id, user_id)
-    if existing:
-        if status == 'accepted':
+    _, status = get_friendship_status(current_user.id, user_id)
+    if status == 'accepted':
+        return jsonify({'success': False, 'error': '你们已经是好友了'})
+    elif status == 'pending':
+        return jsonify({'success': False, 'error': '请求已发送，等待对方同意'})
+
+    # 每对用户只有一行：曾被拒绝的关系沿用原行，按新方向重新发起。
+    # 上面的判断读的是缓存的好友图，可能已过时或与对方的同意并发，这里锁住该行按实际状态处理
+    f = Friendship.query.filter(Friendship.between(current_user.id, user_id)).with_for_update().first()
+    if f and f.status != 'rejected':
+        db.session.rollback()
+        friend_graph.invalidate(current_user.id, user_id)
+        if f.status == 'accepted':
             return jsonify({'success': False, 'error': '你们已经是好友了'})
-        elif status == 'pending':
-            return jsonify({'success': False, 'error': '请求已发送，等待对方同意'})
-    f = Friendship(requester_id=current_user.id, receiver_id=user_id)
-    db.session.add(f)
-    db.session.commit()
+        return jsonify({'success': False, 'error': '请求已发送，等待对方同意'})
+    if f:
+        f.set_direction(current_user.id, user_id)
+        f.status = 'pending'
+    else:
+        f = Friendship(requester_id=current_user.id, receiver_id=user_id)
+        db.session.add(f)
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # 并发请求已为这对用户写入关系，被唯一索引拦下
+        db.session.rollback()
+        friend_graph.invalidate(current_user.id, user_id)
+        return jsonify({'success': False, 'error': '请求已发送，等待对方同意'})
+    friend_graph.invalidate(current_user.id, user_id)
     return jsonify({'success': True, 'message': f'好友请求已发送给 {target.username}'})
 
 
@@ -1236,6 +1448,10 @@ def accept_friend(friendship_id):
         return jsonify({'success': False, 'error': '无权限'})
     f.status = 'accepted'
     db.session.commit()
+    friend_graph.invalidate(f.requester_id, f.receiver_id)
+    # 回填需要读到包含这段新关系的好友图
+    timeline.on_friendship_added(f.requester_id, f.receiver_id)
+    db.session.commit()
     return jsonify({'success': True, 'message': f'已接受 {f.requester.username} 的好友请求'})
 
 
@@ -1250,6 +1466,7 @@ def reject_friend(friendship_id):
         return jsonify({'success': False, 'error': '无权限'})
     db.session.delete(f)
     db.session.commit()
+    friend_graph.invalidate(f.requester_id, f.receiver_id)
     return jsonify({'success': True})
 
 
@@ -1259,14 +1476,13 @@ def reject_friend(friendship_id):
 @login_required
 def remove_friend(user_id):
     current_user = get_current_user()
-    f = Friendship.query.filter(
-        ((Friendship.requester_id == current_user.id) & (Friendship.receiver_id == user_id)) |
-        ((Friendship.requester_id == user_id) & (Friendship.receiver_id == current_user.id)),
-        Friendship.status == 'accepted'
-    ).first()
-    if not f:
+    _, status = get_friendship_status(current_user.id, user_id)
+    if status != 'accepted':
         return jsonify({'success': False, 'error': '好友关系不存在'})
-    db.session.delete(f)
+    Friendship.query.filter(Friendship.between(current_user.id, user_id)).delete(synchronize_session=False)
+    db.session.commit()
+    friend_graph.invalidate(current_user.id, user_id)
+    timeline.on_friendship_removed(current_user.id, user_id)
     db.session.commit()
     return jsonify({'success': True})
 
@@ -1280,20 +1496,10 @@ def search_users():
     q = request.args.get('q', '').strip()
     if not q:
         return jsonify({'users': []})
-    users = User.query.filter(
-        User.username.contains(q),
-        User.id != current_user.id
-    ).limit(10).all()
-    result = []
-    for u in users:
-        _, status = get_friendship_status(current_user.id, u.id)
-        result.append({
-            'id': u.id,
-            'username': u.username,
-            'bio': u.bio,
-            'avatar': f'/static/{u.avatar_path}' if u.avatar_path else None,
-            'friendship_status': status
-        })
+    # 多取一条，排除自己后仍能凑满 10 条
+    users = [u for u in user_search.search(q, limit=11) if u['id'] != current_user.id][:10]
+    statuses = friend_graph.get_statuses(current_user.id, [u['id'] for u in users])
+    result = [dict(u, friendship_status=statuses[u['id']]) for u in users]
     return jsonify({'users': result})
 
 
@@ -1304,23 +1510,43 @@ def search_users():
 def forward_post(post_id):
     current_user = get_current_user()
     post = Post.query.get_or_404(post_id)
-    receiver_ids = request.json.get('receiver_ids', [])
+    receiver_ids = (request.get_json(silent=True) or {}).get('receiver_ids', [])
     if not receiver_ids:
         return jsonify({'success': False, 'error': '请选择要转发的好友'})
-    sent_to = []
+
+    # 规范化接收者 id：去重并保持原顺序，无法解析的 id 单独标记
+    results = []
+    candidate_ids = []
     for rid in receiver_ids:
-        if not are_friends(current_user.id, rid):
+        try:
+            rid = int(rid)
+        except (TypeError, ValueError):
+            results.append({'receiver_id': rid, 'status': 'invalid'})
             continue
-        msg = Message(
-            sender_id=current_user.id,
-            receiver_id=rid,
-            forwarded_post_id=post_id,
-            created_at=datetime.utcnow() + timedelta(hours=8)
-        )
-        db.session.add(msg)
-        sent_to.append(rid)
-    db.session.commit()
-    return jsonify({'success': True, 'sent_to': sent_to, 'count': len(sent_to)})
+        if rid not in candidate_ids:
+            candidate_ids.append(rid)
+
+    # 通过关系图缓存批量校验好友关系
+    friend_ids = friend_graph.friends_among(current_user.id, candidate_ids)
+    sent_to = [rid for rid in candidate_ids if rid in friend_ids]
+    for rid in candidate_ids:
+        results.append({'receiver_id': rid, 'status': 'sent' if rid in friend_ids else 'not_friend'})
+
+    # 单条多行 INSERT 写入全部转发消息
+    if sent_to:
+        now = datetime.utcnow() + timedelta(hours=8)
+        db.session.execute(insert(Message).values([{
+            'sender_id': current_user.id,
+            'receiver_id': rid,
+            'forwarded_post_id': post.id,
+            'is_read': False,
+            'is_deleted_by_sender': False,
+            'is_deleted_by_receiver': False,
+            'created_at': now,
+        } for rid in sent_to]))
+        db.session.commit()
+
+    return jsonify({'success': True, 'sent_to': sent_to, 'count': len(sent_to), 'results': results})
 
 
 # ========== 获取聊天消息（轮询 API） ==========
@@ -1330,38 +1556,12 @@ def forward_post(post_id):
 def poll_messages(friend_id):
     current_user = get_current_user()
     after_id = request.args.get('after_id', 0, type=int)
-    messages = Message.query.filter(
-        ((Message.sender_id == current_user.id) & (Message.receiver_id == friend_id) & (
-                    Message.is_deleted_by_sender == False)) |
-        ((Message.sender_id == friend_id) & (Message.receiver_id == current_user.id) & (
-                    Message.is_deleted_by_receiver == False)),
-        Message.id > after_id
-    ).order_by(Message.created_at.asc()).all()
-
-    result = []
-    for msg in messages:
-        item = {
-            'id': msg.id,
-            'sender_id': msg.sender_id,
-            'content': msg.content,
-            'image_thumb': f'/static/{msg.thumb_path}' if msg.thumb_path else None,
-            'image_orig': f'/static/{msg.image_path}' if msg.image_path else None,
-            'forwarded_post': None,
-            'created_at': msg.created_at.strftime('%H:%M'),
-            'created_at_full': msg.created_at.strftime('%Y-%m-%d %H:%M'),
-        }
-        if msg.forwarded_post_id and msg.forwarded_post:
-            p = msg.forwarded_post
-            imgs = p.image_paths
-            item['forwarded_post'] = {
-                'id': p.id,
-                'title': p.title,
-                'content': p.content[:100],
-                'thumb': f'/static/{get_thumb_path(imgs[0])}' if imgs else None
-            }
-        result.append(item)
-    return jsonify({'messages': result})
+    query = conversation_query(Message, current_user.id, friend_id).filter(Message.id > after_id)
+    rows = serializers.project_messages(query, Message).order_by(Message.created_at.asc()).all()
+    return jsonify({'messages': [serializers.message(row) for row in rows]})
 
+# uWSGI 下在开始接收请求前编译模板、建立数据库连接
+warmup.on_start(app)
 
 if __name__ == '__main__':
     with app.app_context():
@@ -0,0 +1,322 @@
+"""
+静态资源构建与引用。
+
+页面样式和脚本放在 static/css、static/js 下，模板通过 asset_url('css/index.css') 引用。
+`flask --app app build-assets` 把这些文件压缩后按内容哈希命名写入 static/dist
+（如 dist/css/index.3f2a9c1b.css），同时生成 .gz / .br 预压缩版本，并写出 manifest.json 记录
+源文件到构建产物的映射。asset_url 读取 manifest：有构建产物时返回带哈希的地址，由 send() 以一年
+immutable 缓存发送（内容变化时文件名随之变化）；未构建时（开发环境）退回 url_for('static', ...)。
+
+安装了 rcssmin / rjsmin 时用它们压缩，否则使用本模块的保守压缩；安装了 brotli 时才生成 .br。
+CSS 中的相对 url() 不做改写，引用图片请使用 /static/... 绝对路径。
+由 nginx 直接托管 /static 时，/static/dist/ 需同样开启 gzip_static（及 brotli_static）并设置一年缓存。
+"""
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+
+from flask import abort, current_app, g, has_request_context, request, send_from_directory, url_for
+from werkzeug.security import safe_join
+
+try:
+    import brotli
+except ImportError:  # 只生成 .gz
+    brotli = None
+
+try:
+    import rcssmin
+except ImportError:
+    rcssmin = None
+
+try:
+    import rjsmin
+except ImportError:
+    rjsmin = None
+
+SOURCE_DIRS = {'css': '.css', 'js': '.js'}  # static 下参与构建的目录及扩展名
+DIST_DIR = 'dist'
+MANIFEST = 'manifest.json'
+ONE_YEAR = 365 * 24 * 3600
+
+_manifest = None
+_manifest_mtime = None
+
+
+# ========== 压缩 ==========
+
+def _string_end(source, start, quote):
+    """返回从 start 处引号开始的字符串结束后的位置"""
+    i = start + 1
+    while i < len(source):
+        if source[i] == '\\':
+            i += 2
+            continue
+        if source[i] == quote or (source[i] == '\n' and quote != '`'):
+            return i + 1
+        i += 1
+    return len(source)
+
+
+def _is_word(c):
+    return c.isalnum() or c in '_$' or ord(c) > 127
+
+
+def minify_css(source):
+    """去掉注释和多余空白；字符串原样保留，calc() 等表达式中的空格不动"""
+    if rcssmin:
+        return rcssmin.cssmin(source)
+    out = []
+    space = False
+    i, n = 0, len(source)
+    while i < n:
+        c = source[i]
+        if c in '"\'':
+            j = _string_end(source, i, c)
+        elif source.startswith('/*', i):
+            end = source.find('*/', i + 2)
+            i = n if end < 0 else end + 2
+            space = True
+            continue
+        elif c.isspace():
+            space = True
+            i += 1
+            continue
+        else:
+            j = i + 1
+        token = source[i:j]
+        if space and out and out[-1][-1] not in '{};,>:(' and token[0] not in '{};,>)':
+            out.append(' ')
+        if token == '}' and out and out[-1] == ';':
+            out.pop()
+        out.append(token)
+        space = False
+        i = j
+    return ''.join(out) + '\n'
+
+
+_REGEX_AFTER = set('(,=:[!&|?{};+-*%<>~^')
+_REGEX_KEYWORDS = {'return', 'typeof', 'case', 'do', 'else', 'in', 'of', 'new', 'delete', 'void',
+                   'throw', 'instanceof', 'yield', 'await'}
+
+
+def _regex_end(source, start):
+    """返回从 start 处 / 开始的正则字面量（含 flags）结束后的位置"""
+    i, in_class = start + 1, False
+    while i < len(source):
+        c = source[i]
+        if c == '\\':
+            i += 2
+            continue
+        if c == '\n':
+            break
+        if c == '[':
+            in_class = True
+        elif c == ']':
+            in_class = False
+        elif c == '/' and not in_class:
+            i += 1
+            break
+        i += 1
+    while i < len(source) and _is_word(source[i]):
+        i += 1
+    return i
+
+
+def minify_js(source):
+    """
+    去掉注释，合并空白。字符串、模板字符串、正则原样保留；保留可能影响自动分号插入的换行，
+    只删除 { ; , ( [ 之后和 ) ] } ; , 之前的换行。
+    """
+    if rjsmin:
+        return rjsmin.jsmin(source)
+    out = []
+    pending = None  # 待输出的空白：None / ' ' / '\n'
+    prev, word = '', ''  # 上一个输出的非空白字符、上一个完整的单词
+    template_depths = []  # 进入模板字符串 ${ 时的花括号深度
+    depth = 0
+    i, n = 0, len(source)
+
+    def emit(token):
+        nonlocal pending, prev, word
+        first = token[0]
+        if pending == '\n' and prev and prev not in '{;,([' and first not in ')]};,':
+            out.append('\n')
+        elif pending and prev and ((_is_word(prev) and _is_word(first))
+                                   or (prev in '+-' and first in '+-') or (prev == '/' and first == '/')):
+            out.append(' ')
+        pending = None
+        out.append(token)
+        word = token if _is_word(first) and _is_word(token[-1]) else ''
+        prev = token[-1]
+
+    while i < n:
+        c = source[i]
+        if c.isspace():
+            j = i
+            while j < n and source[j].isspace():
+                j += 1
+            if pending != '\n':
+                pending = '\n' if '\n' in source[i:j] else ' '
+            i = j
+        elif source.startswith('//', i):
+            end = source.find('\n', i)
+            i = n if end < 0 else end
+        elif source.startswith('/*', i):
+            end = source.find('*/', i + 2)
+            end = n if end < 0 else end + 2
+            if pending != '\n':
+                pending = '\n' if '\n' in source[i:end] else ' '
+            i = end
+        elif c in '"\'':
+            j = _string_end(source, i, c)
+            emit(source[i:j])
+            i = j
+        elif c == '`' or (c == '}' and template_depths and template_depths[-1] == depth):
+            if c == '}':
+                template_depths.pop()
+            j = i + 1
+            while j < n:
+                if source[j] == '\\':
+                    j += 2
+                elif source[j] == '`':
+                    j += 1
+                    break
+                elif source.startswith('${', j):
+                    j += 2
+                    template_depths.append(depth)
+                    break
+                else:
+                    j += 1
+            emit(source[i:j])
+            i = j
+        elif c == '/' and (not prev or prev in _REGEX_AFTER or word in _REGEX_KEYWORDS):
+            j = _regex_end(source, i)
+            emit(source[i:j])
+            i = j
+        elif _is_word(c):
+            j = i
+            while j < n and _is_word(source[j]):
+                j += 1
+            emit(source[i:j])
+            i = j
+        else:
+            if c == '{':
+                depth += 1
+            elif c == '}':
+                depth -= 1
+            emit(c)
+            i += 1
+    return ''.join(out) + '\n'
+
+
+# ========== 构建 ==========
+
+def _write(path, data):
+    """先写临时文件再替换，正在运行的 worker 不会读到写了一半的文件"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f'{path}.{os.getpid()}.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def build(static_folder, clean=False, log=print):
+    """
+    构建全部资源，返回 manifest。
+    旧的构建产物默认保留，滚动发布期间仍在使用旧页面的浏览器可以继续取到；clean=True 时删除。
+    """
+    dist = os.path.join(static_folder, DIST_DIR)
+    manifest, outputs = {}, set()
+    for directory, ext in SOURCE_DIRS.items():
+        source_dir = os.path.join(static_folder, directory)
+        if not os.path.isdir(source_dir):
+            continue
+        for filename in sorted(os.listdir(source_dir)):
+            if not filename.endswith(ext):
+                continue
+            with open(os.path.join(source_dir, filename), encoding='utf-8') as f:
+                source = f.read().replace('\r\n', '\n')
+            data = (minify_css(source) if ext == '.css' else minify_js(source)).encode('utf-8')
+            digest = hashlib.sha256(data).hexdigest()[:10]
+            name = f'{directory}/{filename}'
+            built = f'{directory}/{filename[:-len(ext)]}.{digest}{ext}'
+            path = os.path.join(dist, built)
+            _write(path, data)
+            _write(path + '.gz', gzip.compress(data, 9, mtime=0))
+            outputs.update((built, built + '.gz'))
+            sizes = f'{len(source.encode("utf-8"))} -> {len(data)} 字节，gzip {os.path.getsize(path + ".gz")}'
+            if brotli:
+                _write(path + '.br', brotli.compress(data, quality=11))
+                outputs.add(built + '.br')
+                sizes += f'，br {os.path.getsize(path + ".br")}'
+            manifest[name] = f'{DIST_DIR}/{built}'
+            log(f'{name} -> {built}（{sizes}）')
+    if not brotli:
+        log('未安装 brotli，只生成了 .gz 预压缩文件')
+
+    _write(os.path.join(dist, MANIFEST), json.dumps(manifest, indent=2, sort_keys=True).encode('utf-8'))
+    if clean:
+        for root, _, files in os.walk(dist):
+            for filename in files:
+                rel = os.path.relpath(os.path.join(root, filename), dist).replace(os.sep, '/')
+                if rel != MANIFEST and rel not in outputs:
+                    os.remove(os.path.join(root, filename))
+    return manifest
+
+
+# ========== 引用与发送 ==========
+
+def _load_manifest():
+    """读取 manifest；调试模式下文件变化时重新读取，生产环境构建后需重启 worker"""
+    global _manifest, _manifest_mtime
+    if _manifest is not None and not current_app.debug:
+        return _manifest
+    path = os.path.join(current_app.static_folder, DIST_DIR, MANIFEST)
+    try:
+        mtime = os.path.getmtime(path)
+        if mtime != _manifest_mtime:
+            with open(path, encoding='utf-8') as f:
+                _manifest = json.load(f)
+            _manifest_mtime = mtime
+    except (OSError, ValueError):
+        _manifest = {}
+    return _manifest
+
+
+def asset_url(name):
+    """
+    模板中引用 static 下的资源：已构建时返回带内容哈希的地址，否则返回源文件地址。
+    本次请求引用过的地址记录在 g._asset_urls 中，preload.py 据此生成预加载头。
+    """
+    url = url_for('static', filename=_load_manifest().get(name, name))
+    if has_request_context():
+        g.setdefault('_asset_urls', []).append(url)
+    return url
+
+
+def send(filename):
+    """发送构建产物：按 Accept-Encoding 优先返回 .br / .gz 预压缩文件，缓存一年且标记 immutable"""
+    directory = os.path.join(current_app.static_folder, DIST_DIR)
+    path = safe_join(directory, filename)
+    if path is None:
+        abort(404)
+    mimetype = mimetypes.guess_type(filename)[0]
+    encoding = None
+    for candidate, suffix in (('br', '.br'), ('gzip', '.gz')):
+        if request.accept_encodings[candidate] and os.path.isfile(path + suffix):
+            encoding = candidate
+            filename += suffix
+            break
+    response = send_from_directory(directory, filename, mimetype=mimetype, max_age=ONE_YEAR)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+
+def init_app(app):
+    app.add_template_global(asset_url)
@@ -0,0 +1,82 @@
+"""
+响应压缩级别的基准：每个压缩级别的 CPU 耗时与节省的字节数。
+
+从 seed 生成的数据库渲染几类典型响应（首页 HTML、/api/posts、/get_comments 等），对每个响应
+依次用 gzip 1 / 3 / 6 / 9 和 brotli 1 / 4 / 6 / 9 / 11（安装了 brotli 时）压缩若干次，
+输出平均压缩耗时、压缩后大小和压缩率，用来选择 COMPRESS_GZIP_LEVEL / COMPRESS_BROTLI_QUALITY。
+
+    python -m benchmarks.compression --database sqlite:///benchmarks/bench.db
+"""
+import argparse
+import random
+import time
+
+from benchmarks import load_app
+from benchmarks.load_profile import Context
+
+GZIP_LEVELS = (1, 3, 6, 9)
+BROTLI_QUALITIES = (1, 4, 6, 9, 11)
+
+
+def sample_payloads(app, ctx, random_seed):
+    """渲染典型响应，返回 [(名称, 字节)]"""
+    rng = random.Random(random_seed)
+    user_id = rng.choice(ctx.friend_pairs)[0]
+    paths = [
+        ('index', '/', None),
+        ('api_posts', '/api/posts?page=1', None),
+        ('get_comments', f'/get_comments/{rng.randint(1, ctx.max_post_id)}', None),
+        ('user_profile', f'/user/{user_id}', None),
+        ('friend_posts', '/friend_posts', user_id),
+    ]
+    payloads = []
+    for name, path, login in paths:
+        client = app.test_client()
+        if login:
+            with client.session_transaction() as sess:
+                sess['user_id'] = login
+        response = client.get(path, base_url='http://localhost')
+        payloads.append((name, response.get_data()))
+    return payloads
+
+
+def measure(compress, data, encoding, level, rounds):
+    """返回 (平均耗时毫秒, 压缩后字节数)"""
+    size = 0
+    started = time.perf_counter()
+    for _ in range(rounds):
+        size = len(compress(encoding, level, data))
+    return (time.perf_counter() - started) * 1000 / rounds, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description='比较各压缩级别的 CPU 耗时与压缩率')
+    parser.add_argument('--database', default='sqlite:///benchmarks/bench.db')
+    parser.add_argument('--rounds', type=int, default=50, help='每个级别重复压缩的次数')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    app, db = load_app(args.database)
+    import compression  # 需在 load_app 之后导入
+    with app.app_context():
+        ctx = Context.load(db)
+    payloads = sample_payloads(app, ctx, args.seed)
+
+    settings = [('gzip', level) for level in GZIP_LEVELS]
+    if compression.brotli:
+        settings += [('br', quality) for quality in BROTLI_QUALITIES]
+    else:
+        print('未安装 brotli，只测试 gzip')
+
+    print(f"{'响应':<14}{'原始字节':>10}{'编码':>7}{'级别':>5}{'耗时ms':>9}{'压缩后':>9}{'压缩率':>8}{'MB/s':>8}")
+    for name, data in payloads:
+        for encoding, level in settings:
+            ms, size = measure(compression.compress, data, encoding, level, args.rounds)
+            ratio = size / len(data) if data else 0
+            throughput = len(data) / 1024 / 1024 / (ms / 1000) if ms else 0
+            print(f'{name:<14}{len(data):>10}{encoding:>7}{level:>5}{ms:>9.3f}{size:>9}{ratio:>8.1%}{throughput:>8.0f}')
+        print()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+"""
+压测场景。
+
+每个场景给出请求方法、路径（由随机数生成，保证可复现）以及是否需要登录。
+需要的 id 范围来自 seed 生成的数据（Context），不同规模的数据库都能使用。
+"""
+import io
+import random
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+from sqlalchemy import func
+
+
+@dataclass
+class Context:
+    """从数据库中读取的 id 范围与可用的好友对"""
+    max_user_id: int
+    max_post_id: int
+    friend_pairs: list
+    search_terms: list
+
+    @classmethod
+    def load(cls, db):
+        from models import Friendship, Post, User
+        pairs = db.session.query(Friendship.user_low_id, Friendship.user_high_id).filter(
+            Friendship.status == 'accepted').limit(500).all()
+        return cls(
+            max_user_id=db.session.query(func.max(User.id)).scalar() or 1,
+            max_post_id=db.session.query(func.max(Post.id)).scalar() or 1,
+            friend_pairs=[tuple(pair) for pair in pairs] or [(1, 2)],
+            search_terms=['bench_1', 'bench_2', '_12', '99', 'bench_100', '7'],
+        )
+
+
+@dataclass
+class Request:
+    method: str
+    path: str
+    user_id: Optional[int] = None
+    data: Optional[dict] = None
+
+
+@dataclass
+class Scenario:
+    name: str
+    build: Callable  # (rng, Context) -> Request
+
+
+def _tiny_wav():
+    """44 字节的空 WAV 文件头，用于语音上传"""
+    return (b'RIFF$\x00\x00\x00WAVEfmt \x10\x00\x00\x00\x01\x00\x01\x00@\x1f\x00\x00'
+            b'\x80>\x00\x00\x02\x00\x10\x00data\x00\x00\x00\x00')
+
+
+def _small_jpeg(rng):
+    from PIL import Image
+    buf = io.BytesIO()
+    Image.new('RGB', (1600, 1200), tuple(rng.randint(0, 255) for _ in range(3))).save(buf, 'JPEG', quality=85)
+    buf.seek(0)
+    return buf
+
+
+def _friend_pair(rng, ctx):
+    a, b = rng.choice(ctx.friend_pairs)
+    return (a, b) if rng.random() < 0.5 else (b, a)
+
+
+def _poll_messages(rng, ctx):
+    """聊天页的增量轮询：after_id 取一个较大的值，模拟没有新消息时的常态"""
+    user_id, friend_id = _friend_pair(rng, ctx)
+    return Request('GET', f'/poll_messages/{friend_id}?after_id={10 ** 9}', user_id=user_id)
+
+
+SCENARIOS = [
+    Scenario('index', lambda rng, ctx: Request('GET', '/')),
+    Scenario('index_page', lambda rng, ctx: Request('GET', f'/?page={rng.randint(2, 50)}')),
+    Scenario('api_posts', lambda rng, ctx: Request('GET', f'/api/posts?page={rng.randint(1, 50)}')),
+    Scenario('get_comments', lambda rng, ctx: Request('GET', f'/get_comments/{rng.randint(1, ctx.max_post_id)}')),
+    Scenario('user_profile', lambda rng, ctx: Request('GET', f'/user/{rng.randint(1, ctx.max_user_id)}')),
+    Scenario('messages', lambda rng, ctx: Request('GET', '/messages', user_id=_friend_pair(rng, ctx)[0])),
+    Scenario('poll_messages', _poll_messages),
+    Scenario('friend_posts', lambda rng, ctx: Request('GET', '/friend_posts', user_id=_friend_pair(rng, ctx)[0])),
+    Scenario('search_users', lambda rng, ctx: Request(
+        'GET', f'/search_users?q={rng.choice(ctx.search_terms)}', user_id=rng.randint(1, ctx.max_user_id))),
+    Scenario('upload_voice', lambda rng, ctx: Request(
+        'POST', '/upload_voice', user_id=rng.randint(1, ctx.max_user_id),
+        data={'voice': (io.BytesIO(_tiny_wav()), 'bench.wav'), 'duration': '1'})),
+    Scenario('add_post_with_image', lambda rng, ctx: Request(
+        'POST', '/add_post', user_id=rng.randint(1, ctx.max_user_id),
+        data={'title': '基准测试', 'content': '压测上传', 'tags': '', 'images': (_small_jpeg(rng), 'bench.jpg')})),
+]
+
+
+def requests_for(scenario, ctx, count, random_seed):
+    """按固定种子生成场景的请求序列"""
+    rng = random.Random(f'{scenario.name}:{random_seed}')
+    return [scenario.build(rng, ctx) for _ in range(count)]
@@ -0,0 +1,236 @@
+"""
+基准测试运行器。
+
+默认在进程内用 Flask test client 请求（不经过网络，结果更稳定）；--url 时改为请求正在运行的服务，
+登录使用 seed 生成的账号。每个场景先预热若干次，再记录 p50 / p95 / p99 延迟与每请求查询数，
+延迟包括读完整个响应正文（流式页面直到最后一段）。进程内运行时查询数取自请求结束时 sql_timing 的统计，
+包含流式输出期间的查询；--url 时只能取自 Server-Timing 头，流式响应的头只覆盖第一段之前，不计入。
+与基线比较：p95 超过基线 (1 + tolerance) 倍且差值超过 MIN_SLACK_MS，或平均查询数增加超过
+0.5 条，即视为退步，进程以状态 1 退出。
+"""
+import argparse
+import json
+import os
+import platform
+import re
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from benchmarks import ROOT, load_app
+from benchmarks.load_profile import SCENARIOS, Context, requests_for
+from benchmarks.seed import PASSWORD, USERNAME_PREFIX
+
+DEFAULT_BASELINE = os.path.join(ROOT, 'benchmarks', 'baseline.json')
+MIN_SLACK_MS = 2.0  # 小于该差值的 p95 变化视为噪声
+QUERY_SLACK = 0.5
+
+_QUERIES_RE = re.compile(r'db;[^,]*desc="(\d+) queries"')
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    index = min(int(round(pct / 100 * (len(ordered) - 1))), len(ordered) - 1)
+    return ordered[index]
+
+
+def _queries(headers):
+    match = _QUERIES_RE.search(headers.get('Server-Timing', ''))
+    return int(match.group(1)) if match else None
+
+
+class LocalTarget:
+    """进程内请求"""
+
+    def __init__(self, app):
+        import sql_timing
+        self.app = app
+        self._clients = {}
+        self._finished = threading.local()  # 请求与 sql_timing 回调在同一线程中
+        sql_timing.on_request_finished(self._record)
+
+    def _record(self, entry):
+        self._finished.queries = entry['queries']
+
+    def _client(self, user_id):
+        if user_id not in self._clients:
+            client = self.app.test_client()
+            if user_id:
+                with client.session_transaction() as sess:
+                    sess['user_id'] = user_id
+            self._clients[user_id] = client
+        return self._clients[user_id]
+
+    def send(self, req):
+        """返回 (状态码, 查询数)；读完正文再关闭，流式响应的查询统计在关闭时才完成"""
+        client = self._client(req.user_id)
+        self._finished.queries = None
+        response = client.open(req.path, method=req.method, data=req.data, base_url='http://localhost')
+        response.get_data()
+        response.close()
+        return response.status_code, self._finished.queries
+
+
+class HttpTarget:
+    """请求正在运行的服务"""
+
+    def __init__(self, base_url):
+        import requests
+        self.base_url = base_url.rstrip('/')
+        self._requests = requests
+        self._sessions = {}
+
+    def _session(self, user_id):
+        if user_id not in self._sessions:
+            session = self._requests.Session()
+            if user_id:
+                session.post(f'{self.base_url}/login', data={
+                    'username': f'{USERNAME_PREFIX}{user_id}', 'password': PASSWORD})
+            self._sessions[user_id] = session
+        return self._sessions[user_id]
+
+    def send(self, req):
+        data, files = None, None
+        if req.data:
+            files = {k: v for k, v in req.data.items() if isinstance(v, tuple)}
+            data = {k: v for k, v in req.data.items() if not isinstance(v, tuple)}
+        response = self._session(req.user_id).request(
+            req.method, self.base_url + req.path, data=data, files=files, allow_redirects=False)
+        return response.status_code, _queries(response.headers)
+
+
+def run_scenario(target, scenario, ctx, count, warmup, concurrency, random_seed):
+    for req in requests_for(scenario, ctx, warmup, random_seed + 1):
+        target.send(req)
+
+    def timed(req):
+        started = time.perf_counter()
+        status, queries = target.send(req)
+        return (time.perf_counter() - started) * 1000, status, queries
+
+    reqs = requests_for(scenario, ctx, count, random_seed)
+    if concurrency > 1:
+        with ThreadPoolExecutor(concurrency) as pool:
+            samples = list(pool.map(timed, reqs))
+    else:
+        samples = [timed(req) for req in reqs]
+
+    latencies = [ms for ms, _, _ in samples]
+    queries = [q for _, _, q in samples if q is not None]
+    errors = sum(1 for _, status, _ in samples if status >= 500)
+    return {
+        'requests': len(samples),
+        'errors': errors,
+        'p50_ms': round(percentile(latencies, 50), 2),
+        'p95_ms': round(percentile(latencies, 95), 2),
+        'p99_ms': round(percentile(latencies, 99), 2),
+        'queries_per_request': round(sum(queries) / len(queries), 2) if queries else None,
+    }
+
+
+def compare(results, baseline, tolerance):
+    """返回退步描述列表"""
+    regressions = []
+    for name, current in results.items():
+        base = baseline.get('scenarios', {}).get(name)
+        if not base:
+            continue
+        if (current['p95_ms'] > base['p95_ms'] * (1 + tolerance)
+                and current['p95_ms'] - base['p95_ms'] > MIN_SLACK_MS):
+            regressions.append(f"{name}: p95 {base['p95_ms']}ms -> {current['p95_ms']}ms")
+        if (current['queries_per_request'] is not None and base.get('queries_per_request') is not None
+                and current['queries_per_request'] > base['queries_per_request'] + QUERY_SLACK):
+            regressions.append(
+                f"{name}: 每请求查询数 {base['queries_per_request']} -> {current['queries_per_request']}")
+        if current['errors'] > base.get('errors', 0):
+            regressions.append(f"{name}: 5xx {base.get('errors', 0)} -> {current['errors']}")
+    return regressions
+
+
+def _cleanup(db, max_post_id, uploads_before):
+    """删除压测上传场景产生的博客和文件，保证多次运行面对的数据相同"""
+    from models import Post, TimelineEntry
+    TimelineEntry.query.filter(TimelineEntry.post_id > max_post_id).delete(synchronize_session=False)
+    Post.query.filter(Post.id > max_post_id).delete(synchronize_session=False)
+    db.session.commit()
+
+    upload_dir = os.path.join(ROOT, 'static', 'uploads')
+    if uploads_before is not None and os.path.isdir(upload_dir):
+        for filename in set(os.listdir(upload_dir)) - uploads_before:
+            os.remove(os.path.join(upload_dir, filename))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='运行基准测试并与基线比较')
+    parser.add_argument('--database', default='sqlite:///benchmarks/bench.db')
+    parser.add_argument('--url', help='请求正在运行的服务（默认进程内运行）')
+    parser.add_argument('--requests', type=int, default=200, help='每个场景的请求数')
+    parser.add_argument('--warmup', type=int, default=20)
+    parser.add_argument('--concurrency', type=int, default=1)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--only', help='只运行这些场景，逗号分隔')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--update-baseline', action='store_true', help='把本次结果写为新基线')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='允许的 p95 退步比例')
+    args = parser.parse_args()
+
+    app, db = load_app(args.database)
+    with app.app_context():
+        ctx = Context.load(db)
+        database = db.engine.url.render_as_string(hide_password=True)
+    target = HttpTarget(args.url) if args.url else LocalTarget(app)
+
+    scenarios = SCENARIOS
+    if args.only:
+        names = set(args.only.split(','))
+        scenarios = [s for s in SCENARIOS if s.name in names]
+
+    upload_dir = os.path.join(ROOT, 'static', 'uploads')
+    uploads_before = set(os.listdir(upload_dir)) if os.path.isdir(upload_dir) else set()
+    results = {}
+    try:
+        print(f"{'场景':<22}{'p50':>9}{'p95':>9}{'p99':>9}{'查询/请求':>10}{'5xx':>6}")
+        for scenario in scenarios:
+            result = run_scenario(target, scenario, ctx, args.requests, args.warmup, args.concurrency, args.seed)
+            results[scenario.name] = result
+            print(f"{scenario.name:<22}{result['p50_ms']:>9}{result['p95_ms']:>9}{result['p99_ms']:>9}"
+                  f"{str(result['queries_per_request']):>10}{result['errors']:>6}")
+    finally:
+        with app.app_context():
+            # --url 时上传的文件在服务端，只清理数据库
+            _cleanup(db, ctx.max_post_id, None if args.url else uploads_before)
+
+    report = {
+        'recorded_at': datetime.now().isoformat(timespec='seconds'),
+        'database': database,
+        'target': args.url or 'in-process',
+        'python': platform.python_version(),
+        'requests_per_scenario': args.requests,
+        'concurrency': args.concurrency,
+        'scenarios': results,
+    }
+
+    if args.update_baseline or not os.path.exists(args.baseline):
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f'基线已写入 {args.baseline}')
+        return 0
+
+    with open(args.baseline, encoding='utf-8') as f:
+        baseline = json.load(f)
+    regressions = compare(results, baseline, args.tolerance)
+    if regressions:
+        print('性能退步：')
+        for line in regressions:
+            print('  ' + line)
+        return 1
+    print(f"未发现退步（基线记录于 {baseline.get('recorded_at')}）")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,188 @@
+"""
+生成基准测试数据。
+
+--scale 1 时的数据量：2000 个用户、10 万篇博客（带图片 JSON）、100 万条私信、
+每人约 40 个好友的好友关系图、30 万条中文评论。随机数种子固定，同样的参数总是生成同样的数据。
+生成后重建好友动态时间线和用户名搜索索引。所有用户的密码都是 PASSWORD。
+"""
+import argparse
+import json
+import random
+import time
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import insert
+
+from benchmarks import load_app
+
+PASSWORD = 'benchmark'
+USERNAME_PREFIX = 'bench_'
+BATCH = 5000
+
+WORDS = ('今天', '博客', '分享', '一下', '最近', '学习', '心得', '生活', '记录', '周末', '旅行', '照片',
+         '美食', '推荐', '电影', '读书', '笔记', '代码', '项目', '上线', '感觉', '非常', '不错', '大家',
+         '可以', '试试', '天气', '晴朗', '朋友', '聚会', '音乐', '好听', '咖啡', '早上', '晚上', '散步')
+TAGS = ('生活', '技术', '旅行', '美食', '读书', '摄影', '随笔', '音乐')
+
+VOLUMES = {
+    'users': 2000,
+    'posts': 100_000,
+    'messages': 1_000_000,
+    'friends_per_user': 40,
+    'comments': 300_000,
+}
+
+
+def sentence(rng, min_words=4, max_words=20):
+    return ''.join(rng.choice(WORDS) for _ in range(rng.randint(min_words, max_words))) + rng.choice('。！？~')
+
+
+def _insert(db, model, rows):
+    for start in range(0, len(rows), BATCH):
+        db.session.execute(insert(model), rows[start:start + BATCH])
+    db.session.commit()
+
+
+def seed(db, scale=1.0, random_seed=42, log=print):
+    from models import Comment, Friendship, Message, Post, User
+    import timeline
+    import user_search
+
+    rng = random.Random(random_seed)
+    volumes = {key: max(int(value * scale), 1) for key, value in VOLUMES.items()}
+    volumes['friends_per_user'] = VOLUMES['friends_per_user']  # 好友密度不随规模缩小
+    now = datetime(2025, 1, 1)
+    started = time.perf_counter()
+
+    db.drop_all()
+    db.create_all()
+
+    # 只计算一次密码哈希，所有用户共用
+    probe = User(username='_')
+    probe.set_password(PASSWORD)
+    user_count = volumes['users']
+    _insert(db, User, [{
+        'id': uid,
+        'username': f'{USERNAME_PREFIX}{uid}',
+        'password_hash': probe.password_hash,
+        'role': 'admin' if uid == 1 else 'user',
+        'bio': sentence(rng, 2, 6),
+        'created_at': now,
+    } for uid in range(1, user_count + 1)])
+    log(f'users: {user_count}')
+
+    # 好友关系：每个用户与随机的若干用户配对，约 90% 已接受
+    pairs = set()
+    for uid in range(1, user_count + 1):
+        for _ in range(volumes['friends_per_user'] // 2):
+            other = rng.randint(1, user_count)
+            if other != uid:
+                pairs.add(Friendship.pair_key(uid, other))
+    friend_rows, accepted = [], []
+    for low, high in sorted(pairs):
+        requester, receiver = (low, high) if rng.random() < 0.5 else (high, low)
+        status = 'accepted' if rng.random() < 0.9 else 'pending'
+        if status == 'accepted':
+            accepted.append((low, high))
+        friend_rows.append({
+            'user_low_id': low, 'user_high_id': high,
+            'requester_id': requester, 'receiver_id': receiver,
+            'status': status, 'created_at': now, 'updated_at': now,
+        })
+    _insert(db, Friendship, friend_rows)
+    log(f'friendships: {len(friend_rows)} ({len(accepted)} accepted)')
+
+    post_count = volumes['posts']
+    post_rows = []
+    for pid in range(1, post_count + 1):
+        images = [f'uploads/orig_{rng.getrandbits(64):016x}.jpg' for _ in range(rng.choice((0, 0, 1, 1, 2, 4)))]
+        date = now - timedelta(minutes=(post_count - pid) * 5)
+        post_rows.append({
+            'id': pid,
+            'title': sentence(rng, 2, 6),
+            'content': '\n'.join(sentence(rng, 10, 40) for _ in range(rng.randint(1, 6))),
+            'date': date,
+            'tags': ','.join(rng.sample(TAGS, rng.randint(0, 3))),
+            'image_path': json.dumps(images) if images else None,
+            'user_id': rng.randint(1, user_count),
+            'created_at': date,
+            'updated_at': date,
+        })
+    _insert(db, Post, post_rows)
+    log(f'posts: {post_count}')
+    del post_rows
+
+    usernames = {uid: f'{USERNAME_PREFIX}{uid}' for uid in range(1, user_count + 1)}
+    # 约三成是回复：回复同一博客下已有的某条评论（最深 COMMENT_MAX_DEPTH 层），路径与 comment_threads 一致
+    comment_rows = []
+    max_depth = current_app.config['COMMENT_MAX_DEPTH']
+    for cid in range(1, volumes['comments'] + 1):
+        uid = rng.randint(1, user_count)
+        parent = comment_rows[rng.randrange(len(comment_rows))] if comment_rows and rng.random() < 0.3 else None
+        row = {
+            'id': cid,
+            'post_id': parent['post_id'] if parent else rng.randint(1, post_count),
+            'content': sentence(rng, 3, 15),
+            'author': usernames[uid],
+            'user_id': uid,
+            'date': now - timedelta(seconds=rng.randint(0, 86400 * 365)),
+            'parent_id': None,
+            'path': f'{cid:010d}/',
+            'depth': 0,
+            'reply_count': 0,
+        }
+        if parent:
+            depth = min(parent['depth'] + 1, max_depth)
+            prefix = parent['path'][:depth * 11]
+            row.update(parent_id=int(prefix[-11:-1]), path=prefix + row['path'], depth=depth)
+            for ancestor in prefix.split('/')[:-1]:
+                comment_rows[int(ancestor) - 1]['reply_count'] += 1
+        comment_rows.append(row)
+    _insert(db, Comment, comment_rows)
+    log(f'comments: {len(comment_rows)}')
+    del comment_rows
+
+    # 私信只在好友之间，按时间递增；越早的消息越可能已读
+    message_count = volumes['messages']
+    message_rows = []
+    for i in range(message_count):
+        a, b = rng.choice(accepted) if accepted else (1, min(2, user_count))
+        sender, receiver = (a, b) if rng.random() < 0.5 else (b, a)
+        message_rows.append({
+            'sender_id': sender,
+            'receiver_id': receiver,
+            'content': sentence(rng, 1, 12),
+            'forwarded_post_id': rng.randint(1, post_count) if rng.random() < 0.02 else None,
+            'is_read': i < message_count * 0.95 or rng.random() < 0.5,
+            'is_deleted_by_sender': False,
+            'is_deleted_by_receiver': False,
+            'created_at': now - timedelta(seconds=message_count - i),
+        })
+        if len(message_rows) >= BATCH * 10:
+            _insert(db, Message, message_rows)
+            message_rows = []
+    _insert(db, Message, message_rows)
+    log(f'messages: {message_count}')
+
+    log(f'timelines: {timeline.rebuild_all()} friend pairs')
+    log(f'search index: {user_search.rebuild_index()} users')
+    db.session.commit()
+    log(f'done in {time.perf_counter() - started:.1f}s')
+    return volumes
+
+
+def main():
+    parser = argparse.ArgumentParser(description='生成基准测试数据（会清空目标数据库）')
+    parser.add_argument('--database', default='sqlite:///benchmarks/bench.db')
+    parser.add_argument('--scale', type=float, default=1.0, help='数据量倍数，1 对应 10 万篇博客 / 100 万条私信')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    app, db = load_app(args.database)
+    with app.app_context():
+        seed(db, args.scale, args.seed)
+
+
+if __name__ == '__main__':
+    main()
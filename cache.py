@@ -0,0 +1,189 @@
+"""
+跨进程共享缓存。
+
+在 uWSGI 下使用其内置缓存（config.ini 中的 cache2 配置），所有 worker 进程共享同一份数据；
+直接运行 python app.py 调试时退化为进程内带过期时间的 LRU 字典。
+值统一用 pickle 序列化，调用方可以直接存取 dict / list / set 等对象。
+
+从数据库加载后回填的缓存（好友图、用户快照）用 generation() / put_if_current() / invalidate()：
+invalidate() 在删除 key 的同时递增它的代数，加载期间被失效过的旧数据不会再写回缓存。
+"""
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+try:
+    import uwsgi
+except ImportError:  # 不在 uWSGI 中运行
+    uwsgi = None
+
+DEFAULT_CACHE = 'blog'
+GENERATION_TTL = 3600  # 代数计数器的过期时间（秒），需远大于一次加载的耗时
+
+
+class _LocalCache:
+    """进程内缓存：带过期时间和条目上限的 LRU 字典"""
+
+    def __init__(self, max_items=10000):
+        self.max_items = max_items
+        self._items = OrderedDict()
+
+    def _alive(self, key):
+        item = self._items.get(key)
+        if item is None:
+            return None
+        value, expires = item
+        if expires and expires <= time.time():
+            del self._items[key]
+            return None
+        self._items.move_to_end(key)
+        return value
+
+    def get(self, key):
+        return self._alive(key)
+
+    def put(self, key, value, ttl):
+        self._items[key] = (value, time.time() + ttl if ttl else 0)
+        self._items.move_to_end(key)
+        while len(self._items) > self.max_items:
+            self._items.popitem(last=False)
+
+    def add(self, key, value, ttl):
+        if self._alive(key) is not None:
+            return False
+        self.put(key, value, ttl)
+        return True
+
+    def delete(self, key):
+        self._items.pop(key, None)
+
+    def clear(self):
+        self._items.clear()
+
+
+_local_caches = {}
+_local_limits = {}
+_local_lock = threading.RLock()
+
+
+def configure(cache, max_items):
+    """设置进程内退化缓存的条目上限（uWSGI 下由 config.ini 的 cache2 items 决定）"""
+    _local_limits[cache] = max_items
+    with _local_lock:
+        if cache in _local_caches:
+            _local_caches[cache].max_items = max_items
+
+
+def _local(cache):
+    if cache not in _local_caches:
+        _local_caches[cache] = _LocalCache(_local_limits.get(cache, 10000))
+    return _local_caches[cache]
+
+
+def get(key, default=None, cache=DEFAULT_CACHE):
+    """读取缓存，不存在或已过期时返回 default"""
+    if uwsgi is not None:
+        raw = uwsgi.cache_get(key, cache)
+    else:
+        with _local_lock:
+            raw = _local(cache).get(key)
+    if raw is None:
+        return default
+    try:
+        return pickle.loads(raw)
+    except Exception:
+        return default
+
+
+def put(key, value, ttl=0, cache=DEFAULT_CACHE):
+    """写入缓存（覆盖旧值），ttl 为 0 表示不过期。值过大写入失败时返回 False"""
+    raw = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+    if uwsgi is not None:
+        return bool(uwsgi.cache_update(key, raw, ttl, cache))
+    with _local_lock:
+        _local(cache).put(key, raw, ttl)
+    return True
+
+
+def add(key, value, ttl=0, cache=DEFAULT_CACHE):
+    """仅当 key 不存在时写入，原子操作；写入成功返回 True"""
+    raw = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+    if uwsgi is not None:
+        # uwsgi.cache_set 在 key 已存在时不会覆盖
+        return bool(uwsgi.cache_set(key, raw, ttl, cache))
+    with _local_lock:
+        return _local(cache).add(key, raw, ttl)
+
+
+def delete(*keys, cache=DEFAULT_CACHE):
+    """删除一个或多个 key"""
+    for key in keys:
+        if uwsgi is not None:
+            uwsgi.cache_del(key, cache)
+        else:
+            with _local_lock:
+                _local(cache).delete(key)
+
+
+def update(key, func, default=None, ttl=0, cache=DEFAULT_CACHE):
+    """在锁内原子地读取-修改-写入：新值为 func(当前值，不存在时为 default)，返回新值"""
+    if uwsgi is not None:
+        uwsgi.lock()
+        try:
+            value = func(get(key, default, cache))
+            put(key, value, ttl, cache)
+        finally:
+            uwsgi.unlock()
+        return value
+    with _local_lock:
+        value = func(get(key, default, cache))
+        put(key, value, ttl, cache)
+    return value
+
+
+def incr(key, delta=1, ttl=0, cache=DEFAULT_CACHE):
+    """原子地把整数值加上 delta 并返回新值，key 不存在时从 0 开始"""
+    return update(key, lambda value: value + delta, 0, ttl, cache)
+
+
+def _generation_key(key):
+    return f'gen:{key}'
+
+
+def generation(key, cache=DEFAULT_CACHE):
+    """key 当前的代数；从数据库加载前读取，回填时交给 put_if_current()"""
+    return get(_generation_key(key), 0, cache)
+
+
+def put_if_current(key, value, generation, ttl=0, cache=DEFAULT_CACHE):
+    """仅当 key 自读取 generation 以来没有被 invalidate() 过时写入，返回是否写入"""
+    def write():
+        if get(_generation_key(key), 0, cache) != generation:
+            return False
+        return put(key, value, ttl, cache)
+
+    if uwsgi is not None:
+        uwsgi.lock()
+        try:
+            return write()
+        finally:
+            uwsgi.unlock()
+    with _local_lock:
+        return write()
+
+
+def invalidate(*keys, cache=DEFAULT_CACHE):
+    """删除 key 并递增其代数，之前开始的加载不会再把旧值写回"""
+    for key in keys:
+        incr(_generation_key(key), ttl=GENERATION_TTL, cache=cache)
+    delete(*keys, cache=cache)
+
+
+def clear(cache=DEFAULT_CACHE):
+    """清空整个缓存"""
+    if uwsgi is not None:
+        uwsgi.cache_clear(cache)
+    else:
+        with _local_lock:
+            _local(cache).clear()
@@ -0,0 +1,172 @@
+"""
+AI 对话的后台任务。
+
+一次 Coze 回复往往持续十几秒，若在请求线程上转发事件流，uWSGI 的 worker 线程（共 4×2 个）
+会一直被占住。这里把对话交给本进程的后台线程池：/chat_api 创建任务后立即返回任务 id，
+后台线程读取 Coze 的流式回复，把进度（已收到的回复文本、conversation_id、状态）写入跨进程缓存；
+前端轮询 /chat_api/<job_id>?offset=N 取回新增的文本。每次轮询只读一次缓存，任意 worker 都能回答。
+
+AI 并发槽位与熔断器（ai_guard）在后台线程中申请，排队等待也不占用请求线程。
+首轮命中回复缓存时，/chat_api 立即返回缓存的回复，另提交一个 seed 任务在后台新建一个包含这轮问答的
+Coze 对话，前端轮询取回它的 conversation_id 后接着聊。
+本进程已有 AI_CHAT_MAX_CONCURRENT + AI_CHAT_MAX_WAITING 个任务在执行或排队时直接拒绝。
+后台线程是守护线程，worker 重启时不等待进行中的对话；运行中的任务每次写入进度都会续期，
+执行它的 worker 退出后任务很快过期，轮询得到 404。
+"""
+import os
+import queue
+import threading
+import time
+import uuid
+
+from flask import current_app
+
+import ai_guard
+import cache
+import coze_client
+import reply_cache
+
+FINISHED_TTL = 300  # 结束的任务保留多久供前端取回（秒）
+PUBLISH_INTERVAL = 0.1  # 两次写入进度之间的最短间隔（秒），合并零碎的增量
+
+_jobs = queue.Queue()
+_workers_pid = None
+_lock = threading.Lock()
+_active = 0
+
+
+def _key(job_id):
+    return f'chat_job:{job_id}'
+
+
+def _running_ttl():
+    # 最长的静默期：排队 + 两段数据之间的最长等待 + 事件流中断后轮询取回
+    config = current_app.config
+    return config['AI_CHAT_QUEUE_TIMEOUT'] + config['COZE_STREAM_TIMEOUT'] * 2 + 10
+
+
+def _capacity():
+    config = current_app.config
+    return config['AI_CHAT_MAX_CONCURRENT'] + config['AI_CHAT_MAX_WAITING']
+
+
+def _ensure_workers():
+    """启动本进程的后台线程（fork 出的 worker 首次提交任务时启动）"""
+    global _jobs, _workers_pid, _active
+    if _workers_pid == os.getpid():
+        return
+    _jobs, _workers_pid, _active = queue.Queue(), os.getpid(), 0
+    app = current_app._get_current_object()
+    for i in range(_capacity()):
+        threading.Thread(target=_work, args=(app, _jobs), daemon=True, name=f'chat-job-{i}').start()
+
+
+def _save(job_id, job):
+    ttl = FINISHED_TTL if job['status'] != 'running' else _running_ttl()
+    cache.put(_key(job_id), job, ttl)
+
+
+def get(job_id):
+    """任务的当前状态，不存在或已过期时返回 None"""
+    return cache.get(_key(job_id))
+
+
+def _submit(target, conversation_id, *args):
+    global _active
+    with _lock:
+        _ensure_workers()
+        if _active >= _capacity():
+            raise ai_guard.Unavailable('AI 助手当前繁忙，请稍后再试', 5)
+        _active += 1
+    job_id = uuid.uuid4().hex
+    _save(job_id, {'status': 'running', 'text': '', 'conversation_id': conversation_id,
+                   'error': None, 'retry_after': None})
+    _jobs.put((target, job_id, args))
+    return job_id
+
+
+def start(message, conversation_id, cache_reply=False):
+    """
+    提交一次对话，返回任务 id。本进程的后台线程已满时抛出 ai_guard.Unavailable。
+    任务状态：{'status': 'running' / 'done' / 'error', 'text', 'conversation_id', 'error', 'retry_after'}
+    """
+    return _submit(_converse, conversation_id, message, conversation_id, cache_reply)
+
+
+def seed(message, reply):
+    """
+    提交一个任务：在 Coze 新建包含这轮问答（缓存的回复）的对话，返回任务 id，
+    完成后任务状态的 conversation_id 即新对话。本进程的后台线程已满时抛出 ai_guard.Unavailable。
+    """
+    return _submit(_seed, None, message, reply)
+
+
+def _work(app, jobs):
+    global _active
+    while True:
+        target, job_id, args = jobs.get()
+        try:
+            with app.app_context():
+                target(job_id, *args)
+        except Exception as e:
+            app.logger.error(f"chat job error: {e}")
+        finally:
+            with _lock:
+                _active -= 1
+
+
+def _converse(job_id, message, conversation_id, cache_reply):
+    job = {'status': 'running', 'text': '', 'conversation_id': conversation_id, 'error': None, 'retry_after': None}
+    try:
+        lease = ai_guard.acquire()
+    except ai_guard.Unavailable as e:
+        job.update(status='error', error=str(e), retry_after=e.retry_after)
+        _save(job_id, job)
+        return
+
+    published = time.monotonic()
+    try:
+        for event, value in coze_client.stream_chat(message, conversation_id):
+            if event == 'delta':
+                job['text'] += value
+            else:
+                job['conversation_id'] = value
+            if time.monotonic() - published >= PUBLISH_INTERVAL:
+                _save(job_id, job)
+                published = time.monotonic()
+        lease.succeeded()
+        if cache_reply:
+            reply_cache.put(message, job['text'])
+        job['status'] = 'done'
+    except TimeoutError as e:
+        lease.failed()
+        job.update(status='error', error=str(e))
+    except Exception as e:
+        lease.failed()
+        current_app.logger.error(f"chat job error: {e}")
+        job.update(status='error', error=str(e))
+    finally:
+        lease.release()
+        _save(job_id, job)
+
+
+def _seed(job_id, message, reply):
+    job = {'status': 'running', 'text': '', 'conversation_id': None, 'error': None, 'retry_after': None}
+    try:
+        lease = ai_guard.acquire()
+    except ai_guard.Unavailable as e:
+        job.update(status='error', error=str(e), retry_after=e.retry_after)
+        _save(job_id, job)
+        return
+
+    try:
+        job['conversation_id'] = coze_client.create_conversation([('user', message), ('assistant', reply)])
+        lease.succeeded()
+        job['status'] = 'done'
+    except Exception as e:
+        lease.failed()
+        current_app.logger.warning(f"为缓存回复创建对话失败: {e}")
+        job.update(status='error', error=str(e))
+    finally:
+        lease.release()
+        _save(job_id, job)
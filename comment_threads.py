@@ -0,0 +1,128 @@
+"""
+评论回复楼（物化路径）。
+
+每条评论的 path 是从顶层评论到它自己的 id 序列，每段为 10 位补零的 id 加 '/'，例如
+    0000000042/                        顶层评论 42
+    0000000042/0000000057/             42 的回复 57
+    0000000042/0000000057/0000000060/  57 的回复 60
+按 path 排序即为先序遍历（父评论总在其回复之前，同层按发表先后），一棵子树就是 (post_id, path)
+索引上的一个连续区间 [path, path 去掉末尾 '/' 后加 '0')，取整棵子树或整篇博客的评论都只需一次范围查询，
+与楼层深度无关。reply_count 是评论下全部回复（含间接回复）的数量，发表和删除时更新路径上的各个祖先。
+回复深度超过 COMMENT_MAX_DEPTH 时挂到该深度的祖先下，避免路径无限增长。
+"""
+from flask import current_app
+from sqlalchemy import func, select
+
+import file_outbox
+import serializers
+from database import db
+from models import Comment
+
+SEGMENT_LENGTH = 11  # 10 位 id + '/'
+
+
+def segment(comment_id):
+    return f'{comment_id:010d}/'
+
+
+def ancestor_ids(path):
+    """path 上除最后一段（评论自身）外的各评论 id，从顶层开始"""
+    return [int(part) for part in path.split('/')[:-2]]
+
+
+def _subtree(query, path):
+    return query.filter(Comment.path >= path, Comment.path < path[:-1] + '0')
+
+
+def attach(comment, parent=None):
+    """
+    新评论 flush 得到 id 后调用：设置 parent_id / path / depth，并给各祖先的 reply_count 加一。
+    parent 为 None 时是顶层评论。
+    """
+    if parent is None:
+        comment.parent_id, comment.depth, prefix = None, 0, ''
+    else:
+        max_depth = current_app.config['COMMENT_MAX_DEPTH']
+        depth = min(parent.depth + 1, max_depth)
+        prefix = parent.path[:depth * SEGMENT_LENGTH]
+        comment.parent_id = int(prefix[-SEGMENT_LENGTH:-1])
+        comment.depth = depth
+    comment.path = prefix + segment(comment.id)
+    ancestors = ancestor_ids(comment.path)
+    if ancestors:
+        Comment.query.filter(Comment.id.in_(ancestors)).update(
+            {Comment.reply_count: Comment.reply_count + 1}, synchronize_session=False)
+
+
+def delete(comment):
+    """删除评论及其全部回复，语音文件交给发件箱，返回删除的条数"""
+    subtree = _subtree(Comment.query.filter(Comment.post_id == comment.post_id), comment.path)
+    file_outbox.enqueue([voice for voice, in subtree.filter(Comment.voice_path.isnot(None))
+                        .with_entities(Comment.voice_path)])
+    ancestors = ancestor_ids(comment.path)
+    if ancestors:
+        Comment.query.filter(Comment.id.in_(ancestors)).update(
+            {Comment.reply_count: Comment.reply_count - (comment.reply_count + 1)}, synchronize_session=False)
+    return subtree.delete(synchronize_session=False)
+
+
+def _nest(rows, current_user, can_edit):
+    """把按 path 排好序的行组成顶层评论列表，回复按先序平铺在各自顶层评论的 replies 中"""
+    threads, authors = [], {}
+    for row in rows:
+        item = serializers.comment(row, can_edit(row, current_user))
+        authors[row.id] = row.author
+        if row.depth == 0 or not threads:
+            item['replies'] = []
+            threads.append(item)
+        else:
+            item['reply_to'] = authors.get(row.parent_id)
+            threads[-1]['replies'].append(item)
+    return threads
+
+
+def post_threads(post_id, current_user, can_edit, before=None):
+    """
+    博客的一页顶层评论（新的在前，COMMENT_PAGE_SIZE 条），每条附带按先序排列的前 COMMENT_REPLY_PREVIEW 条回复。
+    before 为上一页最后一条顶层评论的 id（键集游标），返回 (评论列表, 下一页的游标或 None)。
+    一次查询：顶层 path 的一页确定 path 区间 [本页最早的顶层评论, before)，区间内按顶层评论分区编号，
+    只取每个分区的前若干行。
+    """
+    config = current_app.config
+    page_size, preview = config['COMMENT_PAGE_SIZE'], config['COMMENT_REPLY_PREVIEW']
+    in_post = Comment.query.filter(Comment.post_id == post_id)
+    if before:
+        in_post = in_post.filter(Comment.path < segment(before))
+    # 多取一条顶层评论用来判断是否还有下一页
+    tops = select(Comment.path).where(Comment.post_id == post_id, Comment.depth == 0)
+    if before:
+        tops = tops.where(Comment.path < segment(before))
+    tops = tops.order_by(Comment.path.desc()).limit(page_size + 1).subquery()
+    lowest = select(func.min(tops.c.path)).scalar_subquery()
+
+    position = func.row_number().over(partition_by=func.substr(Comment.path, 1, SEGMENT_LENGTH),
+                                      order_by=Comment.path).label('thread_position')
+    ranked = serializers.project_comments(in_post.filter(Comment.path >= lowest)).add_columns(position).subquery()
+    rows = db.session.execute(select(ranked).where(ranked.c.thread_position <= preview + 1)
+                              .order_by(ranked.c.path)).all()
+    threads = _nest(rows, current_user, can_edit)
+    threads.reverse()
+    if len(threads) > page_size:
+        threads = threads[:page_size]
+        return threads, threads[-1]['id']
+    return threads, None
+
+
+def count(post_id):
+    """博客的评论总数（含回复）"""
+    return db.session.query(func.count(Comment.id)).filter(Comment.post_id == post_id).scalar()
+
+
+def thread(comment_id, current_user, can_edit):
+    """一条评论及其全部回复；评论不存在时返回 None"""
+    root = db.session.execute(select(Comment.post_id, Comment.path).where(Comment.id == comment_id)).first()
+    if root is None:
+        return None
+    query = _subtree(Comment.query.filter(Comment.post_id == root.post_id), root.path)
+    rows = serializers.project_comments(query).order_by(Comment.path).all()
+    return _nest(rows, current_user, can_edit)[0]
@@ -0,0 +1,138 @@
+"""
+响应压缩（WSGI 中间件）。
+
+按请求的 Accept-Encoding 选择 br（安装了 brotli 时）或 gzip，只压缩 COMPRESS_MIMETYPES 中的类型：
+- 有 Content-Length 的普通响应：小于 COMPRESS_MIN_SIZE 字节不压缩，否则整体压缩后重新计算长度；
+- 流式响应（没有 Content-Length，如 SSE 和流式模板）：逐段压缩，每段都做一次 flush，
+  客户端能立即解出已输出的内容，不会因为压缩而攒到结束才收到；
+- 已经带 Content-Encoding、206 分段、Cache-Control: no-transform 的响应，以及
+  COMPRESS_SKIP_PREFIXES 下的路径（用户上传的图片、语音本身已压缩）原样返回。
+压缩级别由 COMPRESS_GZIP_LEVEL / COMPRESS_BROTLI_QUALITY 控制，各级别的 CPU 耗时与压缩率
+见 `python -m benchmarks.compression`。
+"""
+import zlib
+
+from werkzeug.datastructures import Headers
+from werkzeug.http import parse_accept_header
+from werkzeug.wsgi import ClosingIterator
+
+try:
+    import brotli
+except ImportError:  # 只提供 gzip
+    brotli = None
+
+
+class _Gzip:
+    def __init__(self, level):
+        self._obj = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)  # 带 gzip 头
+
+    def compress(self, data):
+        return self._obj.compress(data)
+
+    def flush(self):
+        return self._obj.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self._obj.flush()
+
+
+class _Brotli:
+    def __init__(self, quality):
+        self._obj = brotli.Compressor(quality=quality)
+
+    def compress(self, data):
+        return self._obj.process(data)
+
+    def flush(self):
+        return self._obj.flush()
+
+    def finish(self):
+        return self._obj.finish()
+
+
+def compressor(encoding, level):
+    return _Brotli(level) if encoding == 'br' else _Gzip(level)
+
+
+def compress(encoding, level, data):
+    """一次性压缩，供基准测试和整体压缩的响应使用"""
+    c = compressor(encoding, level)
+    return c.compress(data) + c.finish()
+
+
+class CompressionMiddleware:
+    def __init__(self, wsgi_app, config):
+        self.wsgi_app = wsgi_app
+        self.config = config
+
+    def _choose_encoding(self, environ):
+        accepted = parse_accept_header(environ.get('HTTP_ACCEPT_ENCODING'))
+        if brotli and accepted['br']:
+            return 'br', self.config['COMPRESS_BROTLI_QUALITY']
+        if accepted['gzip']:
+            return 'gzip', self.config['COMPRESS_GZIP_LEVEL']
+        return None, None
+
+    def __call__(self, environ, start_response):
+        path = environ.get('PATH_INFO', '')
+        if environ['REQUEST_METHOD'] == 'HEAD' or path.startswith(tuple(self.config['COMPRESS_SKIP_PREFIXES'])):
+            return self.wsgi_app(environ, start_response)
+
+        encoding, level = self._choose_encoding(environ)
+        captured = {}
+
+        def capture(status, headers, exc_info=None):
+            captured.update(status=status, headers=Headers(headers), exc_info=exc_info)
+            return lambda data: None  # Flask 不使用 write()
+
+        app_iter = self.wsgi_app(environ, capture)
+        status, headers = captured['status'], captured['headers']
+
+        mimetype = headers.get('Content-Type', '').split(';')[0].strip()
+        if mimetype not in self.config['COMPRESS_MIMETYPES']:
+            start_response(status, headers.to_wsgi_list(), captured['exc_info'])
+            return app_iter
+
+        headers['Vary'] = _add_vary(headers.get('Vary', ''))
+        length = headers.get('Content-Length', type=int)
+        if (encoding is None or status[:3] in ('204', '206', '304') or 'Content-Encoding' in headers
+                or 'no-transform' in headers.get('Cache-Control', '')
+                or (length is not None and length < self.config['COMPRESS_MIN_SIZE'])):
+            start_response(status, headers.to_wsgi_list(), captured['exc_info'])
+            return app_iter
+
+        headers['Content-Encoding'] = encoding
+        etag = headers.get('ETag')
+        if etag and not etag.startswith('W/'):
+            headers['ETag'] = 'W/' + etag  # 压缩后字节不同，强 ETag 改为弱 ETag
+
+        if length is None:
+            start_response(status, headers.to_wsgi_list(), captured['exc_info'])
+            return ClosingIterator(_stream(app_iter, compressor(encoding, level)), getattr(app_iter, 'close', None))
+
+        try:
+            body = compress(encoding, level, b''.join(app_iter))
+        finally:
+            if hasattr(app_iter, 'close'):
+                app_iter.close()
+        headers['Content-Length'] = str(len(body))
+        start_response(status, headers.to_wsgi_list(), captured['exc_info'])
+        return [body]
+
+
+def _add_vary(value):
+    fields = [field.strip() for field in value.split(',') if field.strip()]
+    if 'accept-encoding' not in (field.lower() for field in fields) and '*' not in fields:
+        fields.append('Accept-Encoding')
+    return ', '.join(fields)
+
+
+def _stream(app_iter, c):
+    for chunk in app_iter:
+        if chunk:
+            yield c.compress(chunk) + c.flush()
+    yield c.finish()
+
+
+def init_app(app):
+    app.wsgi_app = CompressionMiddleware(app.wsgi_app, app.config)
@@ -0,0 +1,287 @@
+"""
+Coze 智能体对话客户端。
+
+使用 /v3/chat 的流式模式（stream=true）：上游以 SSE 逐段推送回复，这里把它解析成
+(事件, 数据) 序列，由后台任务（chat_jobs.py）读取并把进度写入缓存供前端轮询，请求线程不参与。
+只有事件流在对话创建后意外中断时，才退回到按自适应间隔轮询 /v3/chat/retrieve 取回完整回复。
+
+每个进程共用一个带连接池的 requests.Session（keep-alive，连接失败和 GET 的 5xx 自动退避重试），
+各接口的调用次数、失败次数和耗时记录在跨进程缓存中，见 get_stats()。
+本地离线调试可运行 tools/mock_coze.py 并把 COZE_API_BASE 指向它，
+或用 COZE_CASSETTE_MODE=record / replay 录制、回放真实的上游响应（见 coze_replay.py）。
+requests 导入较慢，在第一次调用 Coze 时才导入，不拖慢 worker 启动。
+"""
+import json
+import os
+import time
+
+from flask import current_app
+
+import cache
+import metrics
+
+STATS_ENDPOINTS = ('chat', 'retrieve', 'message_list', 'conversation')
+
+_session = None
+_session_pid = None
+
+
+class CozeError(RuntimeError):
+    """Coze 返回了异常状态或无法解析的数据"""
+
+
+class StreamInterrupted(CozeError):
+    """事件流在回复完成前结束"""
+
+
+def _headers():
+    return {
+        "Authorization": f"Bearer {current_app.config['COZE_API_TOKEN']}",
+        "Content-Type": "application/json",
+    }
+
+
+def get_session():
+    """当前进程共用的 Session；在 fork 出的 worker 中首次使用时才创建，避免共享父进程的连接"""
+    global _session, _session_pid
+    if _session is None or _session_pid != os.getpid():
+        import requests
+        from requests.adapters import HTTPAdapter
+        from urllib3.util.retry import Retry
+
+        config = current_app.config
+        session = requests.Session()
+        adapter_kwargs = dict(
+            pool_connections=2,
+            pool_maxsize=config['COZE_POOL_SIZE'],
+            # 连接失败对所有请求重试；读超时和 5xx 只对幂等的 GET 重试，POST /v3/chat 不会重复发起对话
+            max_retries=Retry(
+                total=3, connect=2, read=1, status=2,
+                backoff_factor=0.3,
+                status_forcelist=(429, 502, 503, 504),
+                allowed_methods=frozenset({'GET'}),
+                raise_on_status=False,
+            ),
+        )
+        session.mount('https://', HTTPAdapter(**adapter_kwargs))
+        session.mount('http://', HTTPAdapter(**adapter_kwargs))
+        if config.get('COZE_CASSETTE_MODE'):
+            import coze_replay
+            coze_replay.install(session, config['COZE_CASSETTE_MODE'], config['COZE_CASSETTE_DIR'], **adapter_kwargs)
+        _session, _session_pid = session, os.getpid()
+    return _session
+
+
+def _record(endpoint, started, ok):
+    """记录一次上游调用的次数、失败数与耗时（毫秒）"""
+    elapsed = time.perf_counter() - started
+    cache.incr(f'coze_stats:{endpoint}:calls')
+    if not ok:
+        cache.incr(f'coze_stats:{endpoint}:errors')
+    cache.incr(f'coze_stats:{endpoint}:latency_ms', int(elapsed * 1000))
+    metrics.inc('blog_coze_requests_total', endpoint=endpoint, result='ok' if ok else 'error')
+    metrics.observe('blog_coze_request_duration_seconds', elapsed, endpoint=endpoint)
+
+
+def get_stats():
+    """各上游接口的累计调用次数、失败次数和平均耗时（所有 worker 进程合计）"""
+    stats = {}
+    for endpoint in STATS_ENDPOINTS:
+        calls = cache.get(f'coze_stats:{endpoint}:calls', 0)
+        latency = cache.get(f'coze_stats:{endpoint}:latency_ms', 0)
+        stats[endpoint] = {
+            'calls': calls,
+            'errors': cache.get(f'coze_stats:{endpoint}:errors', 0),
+            'avg_latency_ms': round(latency / calls, 1) if calls else None,
+        }
+    return stats
+
+
+def _get(endpoint, path, params):
+    started = time.perf_counter()
+    try:
+        resp = get_session().get(
+            f"{current_app.config['COZE_API_BASE']}{path}",
+            headers=_headers(),
+            params=params,
+            timeout=10,
+        )
+        resp.raise_for_status()
+        data = resp.json()
+    except Exception:
+        _record(endpoint, started, False)
+        raise
+    _record(endpoint, started, True)
+    return data
+
+
+def create_conversation(messages):
+    """
+    创建一个带初始消息的对话，返回 conversation_id。
+    messages 为 [(role, content), ...]；回复缓存命中时用它把问答写入新对话，下一轮可接着聊。
+    """
+    started = time.perf_counter()
+    try:
+        resp = get_session().post(
+            f"{current_app.config['COZE_API_BASE']}/v1/conversation/create",
+            headers=_headers(),
+            json={
+                "bot_id": current_app.config['COZE_BOT_ID'],
+                "messages": [{"role": role, "content": content, "content_type": "text",
+                              **({"type": "answer"} if role == "assistant" else {})}
+                             for role, content in messages],
+            },
+            timeout=(3, 5),
+        )
+        resp.raise_for_status()
+        body = resp.json()
+        if body.get("code") != 0 or not (body.get("data") or {}).get("id"):
+            raise CozeError(f"创建对话失败: {body.get('msg')}")
+    except Exception:
+        _record('conversation', started, False)
+        raise
+    _record('conversation', started, True)
+    return body["data"]["id"]
+
+
+def iter_sse(response):
+    """逐条解析 SSE 响应，产出 (event, data) 字符串对"""
+    event, data_lines = None, []
+    for line in response.iter_lines(decode_unicode=True):
+        if line is None:
+            continue
+        if line == '':
+            if event or data_lines:
+                yield event, '\n'.join(data_lines)
+            event, data_lines = None, []
+        elif line.startswith('event:'):
+            event = line[6:].strip()
+        elif line.startswith('data:'):
+            data_lines.append(line[5:].lstrip())
+    if event or data_lines:
+        yield event, '\n'.join(data_lines)
+
+
+def poll_schedule(total):
+    """自适应轮询间隔：从 0.2 秒起步，每次放大 1.5 倍，最长 2 秒，累计不超过 total 秒"""
+    delay, waited = 0.2, 0.0
+    while waited + delay <= total:
+        yield delay
+        waited += delay
+        delay = min(delay * 1.5, 2.0)
+
+
+def wait_for_answer(chat_id, conversation_id, timeout):
+    """按自适应间隔轮询对话状态，完成后返回 assistant 的完整回复"""
+    params = {"chat_id": chat_id, "conversation_id": conversation_id}
+    for delay in poll_schedule(timeout):
+        time.sleep(delay)
+        status = _get('retrieve', '/v3/chat/retrieve', params).get("data", {}).get("status")
+
+        if status == "completed":
+            for msg in _get('message_list', '/v3/chat/message/list', params).get("data", []):
+                if msg.get("role") == "assistant" and msg.get("type") == "answer":
+                    return msg.get("content", "")
+            raise CozeError("未找到 assistant 回复")
+        elif status in ("failed", "requires_action", "canceled"):
+            raise CozeError(f"对话状态异常: {status}")
+
+    raise TimeoutError(f"Coze 响应超时（{timeout}秒）")
+
+
+def stream_chat(user_message, conversation_id=None):
+    """
+    以流式模式发起对话，依次产出事件：
+        ('conversation', conversation_id)  对话已创建
+        ('delta', text)                    回复增量
+        ('done', conversation_id)          回复完成
+    上游报错时抛出 CozeError，超时抛出 TimeoutError。
+    """
+    import requests
+
+    payload = {
+        "bot_id": current_app.config['COZE_BOT_ID'],
+        "user_id": "blog_user",  # 可按需改为真实 user_id
+        "stream": True,
+        "auto_save_history": True,
+        "additional_messages": [
+            {
+                "role": "user",
+                "content": user_message,
+                "content_type": "text",
+            }
+        ],
+    }
+    # 如果传入了 conversation_id，则追加（实现多轮对话）
+    if conversation_id:
+        payload["conversation_id"] = conversation_id
+
+    started = time.perf_counter()
+    ok = False
+    chat_id, new_conv_id, streamed = None, conversation_id, []
+    try:
+        with get_session().post(
+            f"{current_app.config['COZE_API_BASE']}/v3/chat",
+            headers=_headers(),
+            json=payload,
+            stream=True,
+            # (连接超时, 两段数据之间的最长等待)
+            timeout=(5, current_app.config['COZE_STREAM_TIMEOUT']),
+        ) as resp:
+            resp.raise_for_status()
+            # 参数错误等情况下上游直接返回 JSON 而不是事件流
+            if 'text/event-stream' not in resp.headers.get('Content-Type', ''):
+                raise CozeError(f"Coze 返回异常: {resp.text[:500]}")
+
+            try:
+                for event, data in iter_sse(resp):
+                    if event == 'done':
+                        break
+                    try:
+                        body = json.loads(data) if data else {}
+                    except ValueError:
+                        continue
+
+                    if event == 'conversation.chat.created':
+                        chat_id = body.get('id')
+                        new_conv_id = body.get('conversation_id') or new_conv_id
+                        yield 'conversation', new_conv_id
+                    elif event == 'conversation.message.delta':
+                        if body.get('role') == 'assistant' and body.get('type') == 'answer' and body.get('content'):
+                            streamed.append(body['content'])
+                            yield 'delta', body['content']
+                    elif event == 'conversation.chat.completed':
+                        ok = True
+                        yield 'done', new_conv_id
+                        return
+                    elif event in ('conversation.chat.failed', 'conversation.chat.requires_action', 'error'):
+                        detail = (body.get('last_error') or {}).get('msg') or body.get('msg') or ''
+                        raise CozeError(f"对话状态异常: {event} {detail}".strip())
+                raise StreamInterrupted("Coze 事件流意外结束")
+            except (requests.ConnectionError, requests.exceptions.ChunkedEncodingError, StreamInterrupted) as e:
+                # 对话已创建但事件流中断：改为轮询取回完整回复，只补发尚未推送的部分
+                if not chat_id:
+                    raise
+                current_app.logger.warning(f"Coze 事件流中断，改为轮询: {e}")
+                answer = wait_for_answer(chat_id, new_conv_id, current_app.config['COZE_STREAM_TIMEOUT'])
+                sent = ''.join(streamed)
+                rest = answer[len(sent):] if answer.startswith(sent) else answer
+                if rest:
+                    yield 'delta', rest
+                ok = True
+                yield 'done', new_conv_id
+    except requests.Timeout:
+        raise TimeoutError("Coze 响应超时")
+    finally:
+        _record('chat', started, ok)
+
+
+def chat(user_message, conversation_id=None):
+    """非流式调用：读完整个事件流，返回 (reply_text, conversation_id)"""
+    parts, new_conv_id = [], conversation_id
+    for event, value in stream_chat(user_message, conversation_id):
+        if event == 'delta':
+            parts.append(value)
+        else:
+            new_conv_id = value
+    return ''.join(parts), new_conv_id
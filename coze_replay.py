@@ -0,0 +1,103 @@
+"""
+Coze 请求的录制 / 回放。
+
+COZE_CASSETTE_MODE = 'record' 时，真实请求照常发出，响应（状态码、头、完整正文）另存到
+COZE_CASSETTE_DIR 下，文件名为请求的指纹；= 'replay' 时不访问网络，直接按指纹返回录制好的响应，
+找不到录制时抛出 ConnectionError。回放得到的 chat_id 与录制时一致，因此后续的 retrieve /
+message/list 请求也能按指纹命中。
+"""
+import hashlib
+import io
+import json
+import os
+from urllib.parse import parse_qsl, urlsplit
+
+import requests
+from requests.adapters import BaseAdapter, HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from urllib3.response import HTTPResponse
+
+
+def fingerprint(request):
+    """请求指纹：方法 + 路径 + 排序后的查询参数 + 规范化的 JSON 正文"""
+    parts = urlsplit(request.url)
+    body = request.body or b''
+    if isinstance(body, bytes):
+        body = body.decode('utf-8', 'replace')
+    try:
+        body = json.dumps(json.loads(body), sort_keys=True, ensure_ascii=False)
+    except ValueError:
+        pass
+    raw = json.dumps([request.method, parts.path, sorted(parse_qsl(parts.query)), body], ensure_ascii=False)
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+
+def _cassette_path(directory, request):
+    return os.path.join(directory, f'{fingerprint(request)}.json')
+
+
+class RecordingAdapter(HTTPAdapter):
+    """照常发送请求，并把完整响应写入录制目录"""
+
+    def __init__(self, directory, **kwargs):
+        self.directory = directory
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        response = super().send(request, **kwargs)
+        content = response.content  # 录制模式下读完整个正文（包括事件流）
+        os.makedirs(self.directory, exist_ok=True)
+        with open(_cassette_path(self.directory, request), 'w', encoding='utf-8') as f:
+            json.dump({
+                'request': {'method': request.method, 'url': request.url},
+                'status': response.status_code,
+                'headers': dict(response.headers),
+                'body': content.decode('utf-8'),
+            }, f, ensure_ascii=False, indent=2)
+        return response
+
+
+class ReplayAdapter(BaseAdapter):
+    """不访问网络，按请求指纹返回录制好的响应"""
+
+    def __init__(self, directory):
+        super().__init__()
+        self.directory = directory
+
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        path = _cassette_path(self.directory, request)
+        if not os.path.exists(path):
+            raise requests.ConnectionError(f'没有找到录制的响应: {request.method} {request.url}', request=request)
+        with open(path, encoding='utf-8') as f:
+            recorded = json.load(f)
+
+        # 录制时 requests 已解压正文，回放时去掉编码相关的头
+        headers = {k: v for k, v in recorded['headers'].items()
+                   if k.lower() not in ('content-encoding', 'transfer-encoding', 'content-length')}
+        body = recorded['body'].encode('utf-8')
+        raw = HTTPResponse(body=io.BytesIO(body), headers=headers, status=recorded['status'], preload_content=False)
+
+        response = requests.Response()
+        response.status_code = recorded['status']
+        response.headers = CaseInsensitiveDict(headers)
+        response.raw = raw
+        response.url = request.url
+        response.request = request
+        response.encoding = requests.utils.get_encoding_from_headers(response.headers) or 'utf-8'
+        response.reason = 'REPLAYED'
+        return response
+
+    def close(self):
+        pass
+
+
+def install(session, mode, directory, **adapter_kwargs):
+    """按模式为 session 挂载录制或回放适配器"""
+    if mode == 'record':
+        adapter = RecordingAdapter(directory, **adapter_kwargs)
+    elif mode == 'replay':
+        adapter = ReplayAdapter(directory)
+    else:
+        raise ValueError(f'未知的 COZE_CASSETTE_MODE: {mode}')
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
@@ -1,8 +1,27 @@
-from flask import Flask
+import sqlite3
+
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+import db_routing
+import metrics
+import sql_timing
+
+db = SQLAlchemy(session_options={'class_': db_routing.RoutingSession})
+
+
+def init_app(app):
+    """绑定数据库（主库与只读副本）并注册查询统计和指标；由 app.py 在创建应用时调用"""
+    app.config['SQLALCHEMY_BINDS'] = db_routing.replica_binds(app.config['DATABASE_REPLICA_URLS'])
+    db.init_app(app)
+    db_routing.init_app(app, db)
+    sql_timing.init_app(app)
+    metrics.init_app(app)
 
-from config import Config
 
-app = Flask(__name__)
-app.config.from_object(Config)
-db = SQLAlchemy(app)
\ No newline at end of file
+@event.listens_for(Engine, 'connect')
+def _sqlite_foreign_keys(dbapi_connection, connection_record):
+    """本地 SQLite 默认不执行外键约束，打开后 ON DELETE CASCADE 与 MySQL 行为一致"""
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        dbapi_connection.execute('PRAGMA foreign_keys=ON')
@@ -0,0 +1,114 @@
+"""
+数据库读写分离。
+
+主库由 SQLALCHEMY_DATABASE_URI 指定，只读副本由 DATABASE_REPLICA_URLS 指定（注册为
+replica_0、replica_1 … 等 bind）。RoutingSession 按以下规则为每条语句选择连接：
+    - flush、INSERT / UPDATE / DELETE、SELECT ... FOR UPDATE 以及原生 SQL 一律走主库；
+    - 请求内已经写过库之后，该请求余下的读取也走主库；
+    - 其余 SELECT 按请求的路由走副本：GET / HEAD 请求默认读副本，其他方法读主库，
+      可用 @use_primary / @use_replica 覆盖；
+    - 用户写过库后的 DB_STICKY_SECONDS 秒内（db_primary cookie），其请求全部读主库，
+      保证读到自己刚写入的数据（read-your-writes）。
+没有配置副本或不在请求上下文中（CLI、定时任务）时全部走主库。
+"""
+import random
+from contextlib import contextmanager
+from functools import wraps
+
+from flask import current_app, g, has_request_context, request
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+
+STICKY_COOKIE = 'db_primary'
+
+
+def replica_binds(urls):
+    """把副本地址列表转换成 SQLALCHEMY_BINDS 的条目"""
+    return {f'replica_{i}': url for i, url in enumerate(urls)}
+
+
+def _replica_engines():
+    engines = current_app.extensions['sqlalchemy'].engines
+    return [engine for key, engine in engines.items() if key and key.startswith('replica_')]
+
+
+def _wants_replica():
+    if not has_request_context() or g.get('_db_wrote'):
+        return False
+    route = g.get('_db_route')
+    if route is not None:
+        return route == 'replica'
+    if request.cookies.get(STICKY_COOKIE):
+        return False
+    return request.method in ('GET', 'HEAD')
+
+
+class RoutingSession(Session):
+    """按语句类型和请求路由在主库与副本之间选择连接"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if (bind is None and not self._flushing and clause is not None
+                and getattr(clause, 'is_select', False)
+                and getattr(clause, '_for_update_arg', None) is None
+                and _wants_replica()):
+            engines = _replica_engines()
+            if engines:
+                return random.choice(engines)
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def use_primary(f):
+    """该视图的读取全部走主库（读取结果必须是最新的，或视图本身会写库）"""
+
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        g._db_route = 'primary'
+        return f(*args, **kwargs)
+
+    return decorated_function
+
+
+def use_replica(f):
+    """该视图的读取走副本（用于只读的非 GET 接口）"""
+
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        g._db_route = 'replica'
+        return f(*args, **kwargs)
+
+    return decorated_function
+
+
+@contextmanager
+def primary():
+    """块内的读取走主库，用于回填跨请求缓存，避免把副本上的旧数据缓存下来"""
+    if not has_request_context():
+        yield
+        return
+    previous = g.get('_db_route')
+    g._db_route = 'primary'
+    try:
+        yield
+    finally:
+        g._db_route = previous
+
+
+def init_app(app, db):
+    """注册写库标记与 read-your-writes cookie"""
+
+    @event.listens_for(db.session, 'after_flush')
+    def mark_flushed(session, flush_context):
+        if has_request_context():
+            g._db_wrote = True
+
+    @event.listens_for(db.session, 'do_orm_execute')
+    def mark_executed(orm_execute_state):
+        # insert() / query.update() / query.delete() 等不经过 flush 的写入
+        if has_request_context() and not orm_execute_state.is_select:
+            g._db_wrote = True
+
+    @app.after_request
+    def set_sticky_cookie(response):
+        if g.get('_db_wrote') and app.config['DATABASE_REPLICA_URLS']:
+            response.set_cookie(STICKY_COOKIE, '1', max_age=app.config['DB_STICKY_SECONDS'], httponly=True)
+        return response
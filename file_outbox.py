@@ -0,0 +1,110 @@
+"""
+文件删除发件箱。
+
+删除数据时不再直接删文件：先把文件路径写入 file_deletion 表（与删除数据同一事务），提交后调用
+kick() 唤醒本进程的后台线程，按 FILE_DELETION_BATCH 条一批删除文件。事务回滚时发件箱记录一起回滚，
+数据库不会指向已被删掉的文件。文件已不存在视为成功；其他错误记录后按指数退避重试
+（RETRY_BASE_SECONDS × 2^已失败次数 之后），超过 MAX_ATTEMPTS 次放弃。
+进程退出时没来得及处理的记录由 `flask --app app process-file-deletions`（uWSGI cron）兜底。
+"""
+import os
+import threading
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert, literal_column, select
+
+from database import db
+from models import Comment, FileDeletion
+
+MAX_ATTEMPTS = 5
+RETRY_BASE_SECONDS = 60
+
+_resolve_path = None
+_wakeup = threading.Event()
+_worker_pid = None
+
+
+def enqueue(paths):
+    """记录待删除的文件（在调用方的事务中）"""
+    paths = [path for path in paths if path]
+    if paths:
+        db.session.execute(insert(FileDeletion).values([{'path': path, 'attempts': 0} for path in paths]))
+
+
+def enqueue_comment_voices(post_id):
+    """把博客下所有评论的语音文件记入发件箱（单条 INSERT ... SELECT）"""
+    db.session.execute(insert(FileDeletion).from_select(
+        ['path', 'attempts'],
+        select(Comment.voice_path, literal_column('0')).where(
+            Comment.post_id == post_id, Comment.voice_path.isnot(None))
+    ))
+
+
+def process(batch_size, log=None, after_id=0):
+    """处理一批 id 大于 after_id、已到重试时间的记录，返回 (本批取出的条数, 本批最大的 id)"""
+    now = datetime.utcnow()
+    rows = db.session.query(FileDeletion.id, FileDeletion.path, FileDeletion.attempts).filter(
+        FileDeletion.id > after_id,
+        (FileDeletion.next_attempt_at.is_(None)) | (FileDeletion.next_attempt_at <= now)
+    ).order_by(FileDeletion.id).limit(batch_size).all()
+    finished = []
+    for row_id, path, attempts in rows:
+        try:
+            os.remove(_resolve_path(path))
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            if attempts + 1 < MAX_ATTEMPTS:
+                FileDeletion.query.filter_by(id=row_id).update({
+                    'attempts': attempts + 1,
+                    'last_error': str(e)[:500],
+                    'next_attempt_at': now + timedelta(seconds=RETRY_BASE_SECONDS * 2 ** attempts),
+                }, synchronize_session=False)
+                continue
+            if log:
+                log(f'放弃删除文件 {path}（已重试 {MAX_ATTEMPTS} 次）: {e}')
+        finished.append(row_id)
+    if finished:
+        FileDeletion.query.filter(FileDeletion.id.in_(finished)).delete(synchronize_session=False)
+    db.session.commit()
+    return len(rows), rows[-1].id if rows else after_id
+
+
+def drain(batch_size, log=None):
+    """按 id 顺序把已到重试时间的记录各处理一次（本轮失败的不会在本轮再试），返回处理的条数"""
+    total, after_id = 0, 0
+    while True:
+        count, after_id = process(batch_size, log, after_id)
+        total += count
+        if count < batch_size:
+            return total
+
+
+def _run(app):
+    while True:
+        _wakeup.wait()
+        _wakeup.clear()
+        with app.app_context():
+            try:
+                drain(app.config['FILE_DELETION_BATCH'], app.logger.warning)
+            except Exception as e:
+                app.logger.error(f'处理文件删除发件箱失败: {e}')
+            finally:
+                db.session.remove()
+
+
+def kick():
+    """提交后调用：唤醒本进程的后台线程处理发件箱（fork 后的 worker 首次调用时启动线程）"""
+    global _worker_pid
+    from flask import current_app
+    if _worker_pid != os.getpid():
+        _worker_pid = os.getpid()
+        threading.Thread(target=_run, args=(current_app._get_current_object(),), daemon=True,
+                         name='file-outbox').start()
+    _wakeup.set()
+
+
+def init_app(app, resolve_path):
+    """resolve_path 把数据库中保存的相对路径转换为磁盘上的完整路径"""
+    global _resolve_path
+    _resolve_path = resolve_path
@@ -0,0 +1,91 @@
+"""
+好友关系图缓存。
+
+每个用户的全部好友关系（含待处理请求）以邻接表形式缓存在跨进程缓存中：
+    {对方用户 id: (friendship_id, status, 是否由我发起)}
+社交相关接口通过这里做好友判断，不再逐次查询 Friendship 表。
+好友关系发生变化（添加 / 接受 / 拒绝 / 删除）并提交后，需调用 invalidate() 失效双方的缓存。
+"""
+import cache
+import db_routing
+import metrics
+from database import db
+from models import Friendship
+
+GRAPH_TTL = 600  # 兜底过期时间（秒），正常情况下由 invalidate() 主动失效
+
+
+def _key(user_id):
+    return f'friend_graph:{user_id}'
+
+
+def _load_edges(user_id):
+    # 结果会被缓存并在好友关系变化后立即重新加载，必须读主库
+    with db_routing.primary():
+        rows = db.session.query(
+            Friendship.id, Friendship.requester_id, Friendship.receiver_id, Friendship.status
+        ).filter(
+            (Friendship.user_low_id == user_id) | (Friendship.user_high_id == user_id)
+        ).all()
+    edges = {}
+    for friendship_id, requester_id, receiver_id, status in rows:
+        other_id = receiver_id if requester_id == user_id else requester_id
+        edges[other_id] = (friendship_id, status, requester_id == user_id)
+    return edges
+
+
+def get_edges(user_id):
+    """返回用户的邻接表，未命中缓存时查询一次数据库并回填"""
+    edges = cache.get(_key(user_id))
+    metrics.cache_result('friend_graph', edges is not None)
+    if edges is None:
+        # 加载期间其他 worker 可能已提交变化并失效缓存，此时不回填，避免旧的邻接表被缓存 GRAPH_TTL 秒
+        generation = cache.generation(_key(user_id))
+        edges = _load_edges(user_id)
+        cache.put_if_current(_key(user_id), edges, generation, GRAPH_TTL)
+    return edges
+
+
+def get_friend_ids(user_id):
+    """已接受的好友 id 集合"""
+    return {other_id for other_id, (_, status, _) in get_edges(user_id).items() if status == 'accepted'}
+
+
+def get_pending_ids(user_id):
+    """返回 (我发出的待处理请求对方 id 集合, 我收到的待处理请求对方 id 集合)"""
+    sent, received = set(), set()
+    for other_id, (_, status, outgoing) in get_edges(user_id).items():
+        if status == 'pending':
+            (sent if outgoing else received).add(other_id)
+    return sent, received
+
+
+def are_friends(user_id_a, user_id_b):
+    """检查两用户是否是好友"""
+    edge = get_edges(user_id_a).get(user_id_b)
+    return edge is not None and edge[1] == 'accepted'
+
+
+def friends_among(user_id, candidate_ids):
+    """批量判断：返回 candidate_ids 中已是 user_id 好友的 id 集合"""
+    friend_ids = get_friend_ids(user_id)
+    return {uid for uid in candidate_ids if uid in friend_ids}
+
+
+def get_status(user_id, other_id):
+    """返回 (friendship_id, status)，没有关系时返回 (None, None)"""
+    edge = get_edges(user_id).get(other_id)
+    if edge is None:
+        return None, None
+    return edge[0], edge[1]
+
+
+def get_statuses(user_id, other_ids):
+    """批量获取关系状态：{对方 id: status 或 None}"""
+    edges = get_edges(user_id)
+    return {other_id: edges[other_id][1] if other_id in edges else None for other_id in other_ids}
+
+
+def invalidate(*user_ids):
+    """好友关系变化后失效相关用户的缓存"""
+    cache.invalidate(*[_key(user_id) for user_id in user_ids])
@@ -0,0 +1,229 @@
+"""
+应用指标（Prometheus 文本格式）。
+
+每个 worker 进程在内存中累计计数器和直方图，每隔 METRICS_FLUSH_SECONDS 秒把本进程的快照写入
+跨进程缓存（metrics:proc:<pid>-<随机后缀>，pid 被复用时也不会覆盖旧进程的快照）。/internal/metrics
+读取所有进程的快照后按序列相加输出，因此 uWSGI 的 4 个 worker 的数据都会计入。
+worker 重启（max-requests、harakiri）后，旧进程最后一次写入的快照在下次抓取时并入不过期的
+已退出进程汇总（metrics:retired），导出的 _total 等计数器不会倒退。判断进程是否退出依赖 pid，
+只适用于同一台机器上的 worker（uWSGI 的缓存本身也只在本机共享）。
+
+记录方式：
+    metrics.inc('blog_upload_bytes_total', size, kind='avatar')
+    metrics.observe('blog_coze_request_duration_seconds', seconds, endpoint='chat')
+    with metrics.timer('blog_image_processing_seconds'):
+        ...
+"""
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+from flask import current_app, g, request
+
+import cache
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+SNAPSHOT_TTL = 7 * 24 * 3600
+PROCS_KEY = 'metrics:procs'  # {快照标识: (pid, 启动时间)}
+RETIRED_KEY = 'metrics:retired'  # 已退出进程的计数之和 (counters, histograms)
+
+DESCRIPTIONS = {
+    'blog_http_requests_total': ('counter', '按视图、方法和状态码统计的请求数'),
+    'blog_http_request_duration_seconds': ('histogram', '各视图的请求耗时（流式响应只计到开始输出）'),
+    'blog_image_processing_seconds': ('histogram', '上传图片生成缩略图的耗时'),
+    'blog_upload_bytes_total': ('counter', '上传文件的累计字节数'),
+    'blog_coze_request_duration_seconds': ('histogram', 'Coze 上游各接口的调用耗时'),
+    'blog_coze_requests_total': ('counter', 'Coze 上游各接口的调用次数（按成功 / 失败）'),
+    'blog_cache_requests_total': ('counter', '各类缓存的命中 / 未命中次数'),
+    'blog_stream_errors_total': ('counter', '流式渲染的页面在开始输出后出错的次数'),
+    'blog_post_views_total': ('counter', '博客详情的浏览次数（已去重）'),
+}
+
+_lock = threading.Lock()
+_counters = {}    # (name, labels) -> value
+_histograms = {}  # (name, labels) -> [各桶计数..., 超出最大桶的计数, 总和, 次数]
+_last_flush = 0.0
+_instance = None  # (pid, 快照标识, 启动时间)，fork 后在子进程中重新生成
+
+
+def _labels(labels):
+    return tuple(sorted(labels.items()))
+
+
+def inc(name, value=1, **labels):
+    key = (name, _labels(labels))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def observe(name, value, **labels):
+    key = (name, _labels(labels))
+    with _lock:
+        series = _histograms.get(key)
+        if series is None:
+            series = _histograms[key] = [0] * (len(BUCKETS) + 3)
+        for i, bound in enumerate(BUCKETS):
+            if value <= bound:
+                series[i] += 1
+                break
+        else:
+            series[len(BUCKETS)] += 1
+        series[-2] += value
+        series[-1] += 1
+
+
+@contextmanager
+def timer(name, **labels):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - started, **labels)
+
+
+def cache_result(cache_name, hit):
+    """记录一次缓存查找的结果"""
+    inc('blog_cache_requests_total', cache=cache_name, result='hit' if hit else 'miss')
+
+
+def _current_instance():
+    global _instance
+    if _instance is None or _instance[0] != os.getpid():
+        _instance = (os.getpid(), f'{os.getpid()}-{uuid.uuid4().hex[:8]}', time.time())
+    return _instance
+
+
+def _snapshot_key(token):
+    return f'metrics:proc:{token}'
+
+
+def flush():
+    """把本进程的快照写入跨进程缓存"""
+    global _last_flush
+    with _lock:
+        snapshot = {'counters': dict(_counters), 'histograms': {k: list(v) for k, v in _histograms.items()}}
+    pid, token, started = _current_instance()
+    cache.put(_snapshot_key(token), snapshot, SNAPSHOT_TTL)
+    if token not in cache.get(PROCS_KEY, {}):
+        cache.update(PROCS_KEY, lambda procs: {**procs, token: (pid, started)}, {})
+    _last_flush = time.time()
+
+
+def maybe_flush():
+    if time.time() - _last_flush >= current_app.config['METRICS_FLUSH_SECONDS']:
+        flush()
+
+
+def _merge(counters, histograms, snapshot):
+    for key, value in snapshot['counters'].items():
+        counters[key] = counters.get(key, 0) + value
+    for key, series in snapshot['histograms'].items():
+        merged = histograms.setdefault(key, [0] * len(series))
+        for i, value in enumerate(series):
+            merged[i] += value
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _retired(procs):
+    """已退出的进程：pid 已不存在，或同一 pid 上登记了更晚启动的进程"""
+    latest = {}
+    for token, (pid, started) in procs.items():
+        if pid not in latest or started > procs[latest[pid]][1]:
+            latest[pid] = token
+    return {token for token, (pid, _) in procs.items() if latest[pid] != token or not _pid_alive(pid)}
+
+
+def _fold_retired(retired):
+    """在缓存锁内执行：把已退出进程的快照并入汇总，并从登记表中移除"""
+    procs = cache.get(PROCS_KEY, {})
+    tokens = _retired(procs)
+    if not tokens:
+        return retired
+    counters, histograms = retired
+    for token in tokens:
+        snapshot = cache.get(_snapshot_key(token))
+        if snapshot is not None:
+            _merge(counters, histograms, snapshot)
+        cache.delete(_snapshot_key(token))
+    cache.put(PROCS_KEY, {token: proc for token, proc in procs.items() if token not in tokens})
+    return counters, histograms
+
+
+def collect():
+    """合并所有进程的快照（含已退出进程的汇总），返回 (counters, histograms)"""
+    flush()
+    retired_counters, retired_histograms = cache.update(RETIRED_KEY, _fold_retired, ({}, {}))
+    counters = dict(retired_counters)
+    histograms = {key: list(series) for key, series in retired_histograms.items()}
+    for token in cache.get(PROCS_KEY, {}):
+        snapshot = cache.get(_snapshot_key(token))
+        if snapshot is not None:
+            _merge(counters, histograms, snapshot)
+    return counters, histograms
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in pairs) + '}'
+
+
+def render():
+    """输出 Prometheus 文本格式"""
+    counters, histograms = collect()
+    lines = []
+    for name, (kind, help_text) in DESCRIPTIONS.items():
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+        if kind == 'counter':
+            for (series_name, labels), value in sorted(counters.items()):
+                if series_name == name:
+                    lines.append(f'{name}{_format_labels(labels)} {value}')
+        else:
+            for (series_name, labels), series in sorted(histograms.items()):
+                if series_name != name:
+                    continue
+                cumulative = 0
+                for bound, count in zip(BUCKETS, series):
+                    cumulative += count
+                    lines.append(f'{name}_bucket{_format_labels(labels, [("le", bound)])} {cumulative}')
+                cumulative += series[len(BUCKETS)]
+                lines.append(f'{name}_bucket{_format_labels(labels, [("le", "+Inf")])} {cumulative}')
+                lines.append(f'{name}_sum{_format_labels(labels)} {series[-2]}')
+                lines.append(f'{name}_count{_format_labels(labels)} {series[-1]}')
+    return '\n'.join(lines) + '\n'
+
+
+def init_app(app):
+    """统计每个请求的视图、状态码与耗时"""
+
+    @app.before_request
+    def start_metrics_timer():
+        g._metrics_started = time.perf_counter()
+
+    @app.after_request
+    def record_request(response):
+        started = g.get('_metrics_started')
+        if started is not None:
+            endpoint = request.url_rule.endpoint if request.url_rule else '<unmatched>'
+            inc('blog_http_requests_total', endpoint=endpoint, method=request.method,
+                status=str(response.status_code))
+            observe('blog_http_request_duration_seconds', time.perf_counter() - started, endpoint=endpoint)
+            maybe_flush()
+        return response
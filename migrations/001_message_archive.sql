@@ -0,0 +1,22 @@
+-- ----------------------------
+-- 私信归档表：结构与 message 一致，沿用原消息 id
+-- 由 `flask --app app compact-messages` 定时把旧消息移入
+-- ----------------------------
+CREATE TABLE IF NOT EXISTS `message_archive`  (
+  `id` int NOT NULL,
+  `sender_id` int NOT NULL,
+  `receiver_id` int NOT NULL,
+  `content` text CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci NULL,
+  `image_path` varchar(500) CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci NULL DEFAULT NULL,
+  `thumb_path` varchar(500) CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci NULL DEFAULT NULL,
+  `forwarded_post_id` int NULL DEFAULT NULL,
+  `is_deleted_by_sender` tinyint(1) NULL DEFAULT 0,
+  `is_deleted_by_receiver` tinyint(1) NULL DEFAULT 0,
+  `created_at` datetime NULL DEFAULT NULL,
+  `is_read` tinyint(1) NOT NULL DEFAULT 0,
+  PRIMARY KEY (`id`) USING BTREE,
+  INDEX `ix_message_archive_pair`(`sender_id` ASC, `receiver_id` ASC, `id` ASC) USING BTREE,
+  CONSTRAINT `message_archive_ibfk_1` FOREIGN KEY (`sender_id`) REFERENCES `user` (`id`) ON DELETE RESTRICT ON UPDATE RESTRICT,
+  CONSTRAINT `message_archive_ibfk_2` FOREIGN KEY (`receiver_id`) REFERENCES `user` (`id`) ON DELETE RESTRICT ON UPDATE RESTRICT,
+  CONSTRAINT `message_archive_ibfk_3` FOREIGN KEY (`forwarded_post_id`) REFERENCES `post` (`id`) ON DELETE RESTRICT ON UPDATE RESTRICT
+) ENGINE = InnoDB CHARACTER SET = utf8mb4 COLLATE = utf8mb4_unicode_ci ROW_FORMAT = DYNAMIC;
@@ -0,0 +1,29 @@
+-- ----------------------------
+-- 好友关系改为按 (user_low_id, user_high_id) 规范化存储，每对用户只保留一行
+-- requester_id / receiver_id 保留，用于记录请求方向
+-- ----------------------------
+ALTER TABLE `friendship`
+  ADD COLUMN `user_low_id` int NULL DEFAULT NULL AFTER `id`,
+  ADD COLUMN `user_high_id` int NULL DEFAULT NULL AFTER `user_low_id`;
+
+UPDATE `friendship`
+SET `user_low_id` = LEAST(`requester_id`, `receiver_id`),
+    `user_high_id` = GREATEST(`requester_id`, `receiver_id`);
+
+-- 合并重复关系（包括方向相反的两行）：优先保留 accepted 的一行，其次保留 id 最小的一行
+DELETE f FROM `friendship` f
+JOIN `friendship` keep
+  ON keep.`user_low_id` = f.`user_low_id`
+ AND keep.`user_high_id` = f.`user_high_id`
+ AND (
+      (keep.`status` = 'accepted' AND f.`status` <> 'accepted')
+   OR ((keep.`status` = 'accepted') = (f.`status` = 'accepted') AND keep.`id` < f.`id`)
+ );
+
+ALTER TABLE `friendship`
+  MODIFY COLUMN `user_low_id` int NOT NULL,
+  MODIFY COLUMN `user_high_id` int NOT NULL,
+  ADD UNIQUE INDEX `uq_friendship_pair`(`user_low_id` ASC, `user_high_id` ASC) USING BTREE,
+  ADD INDEX `ix_friendship_user_high`(`user_high_id` ASC) USING BTREE,
+  ADD CONSTRAINT `friendship_low_fk` FOREIGN KEY (`user_low_id`) REFERENCES `user` (`id`) ON DELETE RESTRICT ON UPDATE RESTRICT,
+  ADD CONSTRAINT `friendship_high_fk` FOREIGN KEY (`user_high_id`) REFERENCES `user` (`id`) ON DELETE RESTRICT ON UPDATE RESTRICT;
@@ -0,0 +1,17 @@
+-- ----------------------------
+-- 好友动态时间线（写扩散）
+-- 建表后执行 `flask --app app rebuild-timelines` 根据现有好友关系回填
+-- ----------------------------
+CREATE TABLE IF NOT EXISTS `timeline_entry`  (
+  `user_id` int NOT NULL,
+  `post_id` int NOT NULL,
+  `author_id` int NOT NULL,
+  `post_date` datetime NOT NULL,
+  PRIMARY KEY (`user_id`, `post_id`) USING BTREE,
+  INDEX `ix_timeline_user_date`(`user_id` ASC, `post_date` ASC, `post_id` ASC) USING BTREE,
+  INDEX `ix_timeline_user_author`(`user_id` ASC, `author_id` ASC) USING BTREE,
+  INDEX `timeline_entry_ibfk_2`(`post_id` ASC) USING BTREE,
+  CONSTRAINT `timeline_entry_ibfk_1` FOREIGN KEY (`user_id`) REFERENCES `user` (`id`) ON DELETE CASCADE ON UPDATE RESTRICT,
+  CONSTRAINT `timeline_entry_ibfk_2` FOREIGN KEY (`post_id`) REFERENCES `post` (`id`) ON DELETE CASCADE ON UPDATE RESTRICT,
+  CONSTRAINT `timeline_entry_ibfk_3` FOREIGN KEY (`author_id`) REFERENCES `user` (`id`) ON DELETE CASCADE ON UPDATE RESTRICT
+) ENGINE = InnoDB CHARACTER SET = utf8mb4 COLLATE = utf8mb4_unicode_ci ROW_FORMAT = DYNAMIC;
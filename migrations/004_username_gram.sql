@@ -0,0 +1,11 @@
+-- ----------------------------
+-- 用户名 n-gram 搜索索引
+-- 建表后执行 `flask --app app rebuild-search-index` 为已有用户建立索引
+-- ----------------------------
+CREATE TABLE IF NOT EXISTS `username_gram`  (
+  `gram` varchar(2) CHARACTER SET utf8mb4 COLLATE utf8mb4_bin NOT NULL,
+  `user_id` int NOT NULL,
+  PRIMARY KEY (`gram`, `user_id`) USING BTREE,
+  INDEX `username_gram_ibfk_1`(`user_id` ASC) USING BTREE,
+  CONSTRAINT `username_gram_ibfk_1` FOREIGN KEY (`user_id`) REFERENCES `user` (`id`) ON DELETE CASCADE ON UPDATE RESTRICT
+) ENGINE = InnoDB CHARACTER SET = utf8mb4 COLLATE = utf8mb4_unicode_ci ROW_FORMAT = DYNAMIC;
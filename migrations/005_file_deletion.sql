@@ -0,0 +1,17 @@
+-- ----------------------------
+-- 文件删除发件箱：删除博客 / 评论时待删除的文件，提交后由后台线程批量删除
+-- 未处理完的记录由 `flask --app app process-file-deletions`（uWSGI cron）兜底
+-- ----------------------------
+CREATE TABLE IF NOT EXISTS `file_deletion`  (
+  `id` int NOT NULL AUTO_INCREMENT,
+  `path` varchar(500) CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci NOT NULL,
+  `attempts` int NOT NULL DEFAULT 0,
+  `last_error` varchar(500) CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci NULL DEFAULT NULL,
+  `created_at` datetime NULL DEFAULT NULL,
+  PRIMARY KEY (`id`) USING BTREE
+) ENGINE = InnoDB CHARACTER SET = utf8mb4 COLLATE = utf8mb4_unicode_ci ROW_FORMAT = DYNAMIC;
+
+-- 删除博客时评论依赖外键级联删除（oceanyu_blog.sql 中已是 ON DELETE CASCADE，这里保证旧库一致）
+ALTER TABLE `comment` DROP FOREIGN KEY `comment_ibfk_1`;
+ALTER TABLE `comment`
+  ADD CONSTRAINT `comment_ibfk_1` FOREIGN KEY (`post_id`) REFERENCES `post` (`id`) ON DELETE CASCADE ON UPDATE RESTRICT;
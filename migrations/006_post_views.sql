@@ -0,0 +1,8 @@
+-- ----------------------------
+-- 博客浏览数与热门排行
+-- 加列后执行 `flask --app app rebuild-hot-scores` 按发布时间为已有博客计算初始热度
+-- ----------------------------
+ALTER TABLE `post`
+  ADD COLUMN `view_count` int NOT NULL DEFAULT 0,
+  ADD COLUMN `hot_score` double NOT NULL DEFAULT 0,
+  ADD INDEX `ix_post_hot_score`(`hot_score` ASC, `date` ASC) USING BTREE;
@@ -0,0 +1,14 @@
+-- ----------------------------
+-- 评论回复楼（物化路径）
+-- path 为从顶层评论到自身的 id 序列（每段 10 位补零 + '/'），按字节比较以便按前缀做范围查询；
+-- 已有评论都是顶层评论，路径即自身 id
+-- ----------------------------
+ALTER TABLE `comment`
+  ADD COLUMN `parent_id` int NULL DEFAULT NULL,
+  ADD COLUMN `path` varchar(255) CHARACTER SET ascii COLLATE ascii_bin NOT NULL DEFAULT '',
+  ADD COLUMN `depth` int NOT NULL DEFAULT 0,
+  ADD COLUMN `reply_count` int NOT NULL DEFAULT 0,
+  ADD INDEX `ix_comment_post_path`(`post_id` ASC, `path` ASC) USING BTREE,
+  ADD CONSTRAINT `comment_ibfk_3` FOREIGN KEY (`parent_id`) REFERENCES `comment` (`id`) ON DELETE CASCADE ON UPDATE RESTRICT;
+
+UPDATE `comment` SET `path` = CONCAT(LPAD(`id`, 10, '0'), '/') WHERE `path` = '';
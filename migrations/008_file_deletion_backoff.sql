@@ -0,0 +1,6 @@
+-- ----------------------------
+-- 文件删除发件箱：删除失败的记录按指数退避重试，next_attempt_at 之前不再取出
+-- ----------------------------
+ALTER TABLE `file_deletion`
+  ADD COLUMN `next_attempt_at` datetime NULL DEFAULT NULL,
+  ADD INDEX `ix_file_deletion_next_attempt_at`(`next_attempt_at` ASC) USING BTREE;
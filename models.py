@@ -52,23 +52,39 @@ class User(db.Model):
 
 
 class Comment(db.Model):
+    __table_args__ = (
+        db.Index('ix_comment_post_path', 'post_id', 'path'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
-    post_id = db.Column(db.Integer, db.ForeignKey('post.id'), nullable=False)
+    post_id = db.Column(db.Integer, db.ForeignKey('post.id', ondelete='CASCADE'), nullable=False)
     content = db.Column(db.Text, nullable=False)
     author = db.Column(db.String(50), nullable=False)
     date = db.Column(db.DateTime, default=datetime.utcnow)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
     voice_path = db.Column(db.String(500), nullable=True)       # 语音文件路径
     voice_duration = db.Column(db.Integer, nullable=True)       # 语音时长（秒）
+    # 回复楼（见 comment_threads.py）：父评论、物化路径、深度（顶层为 0）、全部回复数
+    parent_id = db.Column(db.Integer, db.ForeignKey('comment.id', ondelete='CASCADE'), nullable=True)
+    path = db.Column(db.String(255), nullable=False, default='')
+    depth = db.Column(db.Integer, nullable=False, default=0)
+    reply_count = db.Column(db.Integer, nullable=False, default=0)
 
     # 建立与Post模型的关系
-    post = db.relationship('Post', backref=db.backref('comments', lazy=True, cascade='all, delete-orphan'))
+    # 删除博客时评论由数据库外键 ON DELETE CASCADE 删除，ORM 不再逐条加载
+    post = db.relationship('Post', backref=db.backref('comments', lazy=True, cascade='all, delete-orphan',
+                                                      passive_deletes=True))
 
     def __repr__(self):
         return f'<Comment {self.id}>'
 
 
 class Post(db.Model):
+    __table_args__ = (
+        # 与 post_views.hot_order() 的排序（hot_score DESC, date DESC）一致，热门列表按索引倒序读取，不做 filesort
+        db.Index('ix_post_hot_score', 'hot_score', 'date'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200), nullable=False)
     content = db.Column(db.Text, nullable=False)
@@ -78,6 +94,9 @@ class Post(db.Model):
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # 浏览数与按时间衰减的热度，由 post_views.py 批量写入
+    view_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    hot_score = db.Column(db.Float, nullable=False, default=0, server_default='0')
 
     @property
     def image_paths_json(self):
@@ -110,8 +129,19 @@ class Post(db.Model):
         return f'<Post {self.title}>'
 
 class Friendship(db.Model):
-    """好友关系表"""
+    """
+    好友关系表。
+    每对用户只有一行：以 (user_low_id, user_high_id) 为唯一键，任一方向的查找都是一次索引探测；
+    requester_id / receiver_id 记录请求的发起方向。
+    """
+    __table_args__ = (
+        db.UniqueConstraint('user_low_id', 'user_high_id', name='uq_friendship_pair'),
+        db.Index('ix_friendship_user_high', 'user_high_id'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
+    user_low_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)   # 两人中较小的用户 id
+    user_high_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)  # 两人中较大的用户 id
     requester_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     receiver_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     status = db.Column(db.Enum('pending', 'accepted', 'rejected'), default='pending', nullable=False)
@@ -121,6 +151,28 @@ class Friendship(db.Model):
     requester = db.relationship('User', foreign_keys=[requester_id], backref='sent_friend_requests')
     receiver = db.relationship('User', foreign_keys=[receiver_id], backref='received_friend_requests')
 
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        if self.requester_id is not None and self.receiver_id is not None:
+            self.set_direction(self.requester_id, self.receiver_id)
+
+    def set_direction(self, requester_id, receiver_id):
+        """设置请求方向，并同步规范化的 (user_low_id, user_high_id) 键"""
+        self.requester_id = requester_id
+        self.receiver_id = receiver_id
+        self.user_low_id, self.user_high_id = self.pair_key(requester_id, receiver_id)
+
+    @staticmethod
+    def pair_key(user_id_a, user_id_b):
+        """返回两用户规范化后的 (low, high) 键"""
+        return (user_id_a, user_id_b) if user_id_a < user_id_b else (user_id_b, user_id_a)
+
+    @classmethod
+    def between(cls, user_id_a, user_id_b):
+        """两用户之间关系的查询条件（命中唯一索引）"""
+        low, high = cls.pair_key(user_id_a, user_id_b)
+        return (cls.user_low_id == low) & (cls.user_high_id == high)
+
     def __repr__(self):
         return f'<Friendship {self.requester_id}->{self.receiver_id} [{self.status}]>'
 
@@ -143,4 +195,75 @@ class Message(db.Model):
     forwarded_post = db.relationship('Post', foreign_keys=[forwarded_post_id], backref='forwarded_messages')
 
     def __repr__(self):
-        return f'<Message {self.sender_id}->{self.receiver_id}>'
\ No newline at end of file
+        return f'<Message {self.sender_id}->{self.receiver_id}>'
+
+
+class MessageArchive(db.Model):
+    """私信归档表：保存超过保留期的旧消息，结构与 Message 一致并沿用原消息 id"""
+    __tablename__ = 'message_archive'
+    __table_args__ = (
+        db.Index('ix_message_archive_pair', 'sender_id', 'receiver_id', 'id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    sender_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    receiver_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    content = db.Column(db.Text, nullable=True)
+    image_path = db.Column(db.String(500), nullable=True)
+    thumb_path = db.Column(db.String(500), nullable=True)
+    forwarded_post_id = db.Column(db.Integer, db.ForeignKey('post.id'), nullable=True)
+    is_deleted_by_sender = db.Column(db.Boolean, default=False)
+    is_deleted_by_receiver = db.Column(db.Boolean, default=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    is_read = db.Column(db.Boolean, nullable=False, default=False)
+    forwarded_post = db.relationship('Post', foreign_keys=[forwarded_post_id])
+
+    def __repr__(self):
+        return f'<MessageArchive {self.sender_id}->{self.receiver_id}>'
+
+
+class TimelineEntry(db.Model):
+    """好友动态时间线（写扩散）：每个用户能看到的每篇好友博客各一行，按 (post_date, post_id) 倒序读取"""
+    __tablename__ = 'timeline_entry'
+    __table_args__ = (
+        db.Index('ix_timeline_user_date', 'user_id', 'post_date', 'post_id'),
+        db.Index('ix_timeline_user_author', 'user_id', 'author_id'),
+    )
+
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), primary_key=True)  # 时间线所属用户
+    post_id = db.Column(db.Integer, db.ForeignKey('post.id', ondelete='CASCADE'), primary_key=True)
+    author_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), nullable=False)
+    post_date = db.Column(db.DateTime, nullable=False)  # 冗余 Post.date，用于 keyset 分页
+
+    def __repr__(self):
+        return f'<TimelineEntry {self.user_id}:{self.post_id}>'
+
+
+class UsernameGram(db.Model):
+    """用户名 n-gram 索引（单字 + 双字），用于用户名的子串搜索，避免前导通配符 LIKE 全表扫描"""
+    __tablename__ = 'username_gram'
+
+    gram = db.Column(db.String(2), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), primary_key=True)
+
+    def __repr__(self):
+        return f'<UsernameGram {self.gram}:{self.user_id}>'
+
+
+class FileDeletion(db.Model):
+    """
+    待删除文件的发件箱。
+    删除博客 / 评论时把要删的文件路径写入这里，与删除数据同一事务提交；
+    提交后由 file_outbox 的后台线程批量删除文件，失败的按指数退避在 next_attempt_at 之后重试。
+    """
+    __tablename__ = 'file_deletion'
+
+    id = db.Column(db.Integer, primary_key=True)
+    path = db.Column(db.String(500), nullable=False)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    last_error = db.Column(db.String(500), nullable=True)
+    next_attempt_at = db.Column(db.DateTime, nullable=True, index=True)  # 为空表示立即处理
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<FileDeletion {self.path}>'
@@ -0,0 +1,150 @@
+"""
+博客浏览计数与热门排行。
+
+浏览（打开博客详情时前端 sendBeacon 到 /post/<id>/view）先累计在本进程内存中，由本进程的后台线程
+每隔 VIEW_FLUSH_SECONDS 秒合并写入（之后没有新的浏览也会按时写入）：一批博客一条 SELECT ... FOR UPDATE
+加一条批量 UPDATE，不会每次浏览都更新一次 post 行。同一访客（登录用户或 IP）VIEW_DEDUPE_SECONDS 秒内
+重复打开只计一次。worker 正常退出时写入剩余的计数，异常退出最多丢失一个周期的浏览数。
+
+热度按时间衰减：每次浏览的权重每过 HOT_HALF_LIFE_HOURS 小时减半，hot_score 是全部浏览
+（外加发布时的一次）折算到同一时间基准后的权重之和的对数：
+    hot_score = ln Σ exp(k · (t_i - EPOCH))，k = ln2 / 半衰期
+所有博客的权重随时间按同一比例衰减，不改变相对顺序，因此只需在新增浏览时累加，不用定期重算；
+按 hot_score 的索引倒序即为当前的热门排行。修改半衰期后需执行
+`flask --app app rebuild-hot-scores` 重算（按发布时间和已有浏览数近似）。
+"""
+import atexit
+import math
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+from flask import current_app, request, session
+from sqlalchemy import bindparam, select, update
+
+import cache
+import metrics
+from database import db
+from models import Post
+
+EPOCH = datetime(2024, 1, 1)
+
+_lock = threading.Lock()
+_pending = {}  # post_id -> [浏览次数, 这些浏览权重之和的对数]
+_flusher_pid = None
+
+
+def _rate():
+    return math.log(2) / (current_app.config['HOT_HALF_LIFE_HOURS'] * 3600)
+
+
+def _log_add(a, b):
+    """ln(e^a + e^b)，不会溢出"""
+    if a is None:
+        return b
+    high, low = (a, b) if a >= b else (b, a)
+    return high + math.log1p(math.exp(low - high))
+
+
+def score_at(when):
+    """when 时刻一次浏览的对数权重；也是刚发布的博客的 hot_score"""
+    return _rate() * (when - EPOCH).total_seconds()
+
+
+def record(post_id):
+    """记录一次浏览；同一访客短时间内重复打开不重复计数"""
+    visitor = session.get('user_id') or request.remote_addr
+    if not cache.add(f'post_view:{post_id}:{visitor}', 1, ttl=current_app.config['VIEW_DEDUPE_SECONDS']):
+        return
+    weight = score_at(datetime.utcnow() + timedelta(hours=8))  # 与博客发布时间一样使用北京时间
+    with _lock:
+        entry = _pending.get(post_id)
+        if entry is None:
+            _pending[post_id] = [1, weight]
+        else:
+            entry[0] += 1
+            entry[1] = _log_add(entry[1], weight)
+    metrics.inc('blog_post_views_total')
+    _ensure_flusher()
+
+
+def flush():
+    """把本进程累计的浏览写入数据库，返回写入的博客数"""
+    with _lock:
+        pending = dict(_pending)
+        _pending.clear()
+    if not pending:
+        return 0
+    try:
+        with db.engine.begin() as conn:
+            # 行锁保证多个进程同时写入同一篇博客时不会丢失更新；按 id 顺序加锁避免死锁
+            rows = conn.execute(select(Post.id, Post.hot_score).where(Post.id.in_(sorted(pending)))
+                                .order_by(Post.id).with_for_update()).all()
+            params = [{'post_id': post_id, 'views': pending[post_id][0],
+                       'score': _log_add(score, pending[post_id][1])} for post_id, score in rows]
+            if params:
+                conn.execute(update(Post).where(Post.id == bindparam('post_id')).values(
+                    view_count=Post.view_count + bindparam('views'), hot_score=bindparam('score')), params)
+    except Exception:
+        # 写入失败时放回缓冲区，下个周期重试
+        with _lock:
+            for post_id, (views, weight) in pending.items():
+                entry = _pending.setdefault(post_id, [0, None])
+                entry[0] += views
+                entry[1] = _log_add(entry[1], weight)
+        raise
+    return len(params)
+
+
+def _run(app):
+    while True:
+        time.sleep(app.config['VIEW_FLUSH_SECONDS'])
+        with app.app_context():
+            try:
+                flush()
+            except Exception as e:
+                app.logger.error(f'写入浏览计数失败: {e}')
+
+
+def _ensure_flusher():
+    """启动本进程定时写入的后台线程（fork 出的 worker 首次记录浏览时启动）"""
+    global _flusher_pid
+    if _flusher_pid == os.getpid():
+        return
+    with _lock:
+        if _flusher_pid != os.getpid():
+            _flusher_pid = os.getpid()
+            threading.Thread(target=_run, args=(current_app._get_current_object(),), daemon=True,
+                             name='post-views-flush').start()
+
+
+def hot_order():
+    """热门排行的排序条件（hot_score 相同时按发布时间）"""
+    return Post.hot_score.desc(), Post.date.desc()
+
+
+def rebuild(batch_size=500):
+    """按发布时间和已有浏览数重算全部博客的 hot_score（近似为全部浏览发生在发布时），返回博客数"""
+    count, last_id = 0, 0
+    while True:
+        rows = db.session.execute(select(Post.id, Post.date, Post.view_count).where(Post.id > last_id)
+                                  .order_by(Post.id).limit(batch_size)).all()
+        if not rows:
+            return count
+        db.session.execute(update(Post), [{'id': post_id, 'hot_score': score_at(date) + math.log1p(views or 0)}
+                                          for post_id, date, views in rows])
+        db.session.commit()
+        count += len(rows)
+        last_id = rows[-1].id
+
+
+def init_app(app):
+    def flush_on_exit():
+        with app.app_context():
+            try:
+                flush()
+            except Exception as e:
+                app.logger.error(f'退出时写入浏览计数失败: {e}')
+
+    atexit.register(flush_on_exit)
@@ -0,0 +1,110 @@
+"""
+预加载提示（Link 头与 103 Early Hints）。
+
+首页、个人主页和好友动态页的响应带上 Link 头，让浏览器在解析 HTML 之前就开始下载：
+    - 页面 <head> 中通过 asset_url() 引用的样式表（rel=preload; as=style）；
+    - PRELOAD_FONTS 中列出的字体；
+    - 本页前 PRELOAD_THUMBNAILS 篇带图博客的首张缩略图（fetchpriority=low，点开博客时直接从缓存显示）。
+计算结果按路由、路径参数和影响本页博客的查询参数（页码、排序、游标；好友动态页另按用户）缓存
+PRELOAD_CACHE_TTL 秒；其他查询参数不参与键，随意附加的参数不会占满缓存，搜索结果不缓存。
+命中时在 before_request 中就已得到，服务器支持 Early Hints（environ['wsgi.early_hints']）时
+立即发出 103，此时视图还没开始查询；不支持时（uWSGI）只在最终响应中带 Link 头，由前面的 CDN / 反向代理按需转换为 103。
+"""
+from flask import current_app, g, request, session
+
+import cache
+import metrics
+
+# endpoint -> (结果是否因用户而异, 参与缓存键的查询参数)
+ENDPOINTS = {
+    'index': (False, ('page', 'sort')),
+    'user_profile': (False, ()),
+    'friend_posts': (True, ('cursor',)),
+}
+# 带这些参数（搜索）时不缓存：取值几乎不重复，缓存只会挤掉常用页面
+UNCACHED_ARGS = ('search_title', 'search_date')
+
+_thumb_path = None
+
+
+def _key():
+    """本次请求的缓存键；不缓存时返回 None"""
+    per_user, params = ENDPOINTS[request.endpoint]
+    if any(request.args.get(name) for name in UNCACHED_ARGS):
+        return None
+    user = session.get('user_id') if per_user else ''
+    view_args = ','.join(f'{k}={v}' for k, v in sorted((request.view_args or {}).items()))
+    query = '&'.join(f'{name}={request.args.get(name, "")}' for name in params)
+    return f'preload:{request.endpoint}:{user}:{view_args}:{query}'
+
+
+def use_posts(posts):
+    """视图取到本页博客后调用；缓存未命中时用来计算缩略图"""
+    g._preload_posts = posts
+
+
+def _thumbnails(posts, limit):
+    """前 limit 篇带图博客各自第一张图的缩略图地址"""
+    urls = []
+    for post in posts:
+        if len(urls) >= limit:
+            break
+        images = post.image_paths
+        if images:
+            orig_path = images[0] if isinstance(images[0], str) else images[0].get('orig', '')
+            if orig_path:
+                urls.append('/' + _thumb_path(orig_path))
+    return urls
+
+
+def build_links():
+    """根据本次渲染引用的样式表和本页博客生成 Link 头的值"""
+    links = [f'<{url}>; rel=preload; as=style' for url in g.get('_asset_urls', []) if url.endswith('.css')]
+    links += [f'<{url}>; rel=preload; as=font; type="font/woff2"; crossorigin'
+              for url in current_app.config['PRELOAD_FONTS']]
+    limit = current_app.config['PRELOAD_THUMBNAILS']
+    if limit:
+        links += [f'<{url}>; rel=preload; as=image; fetchpriority=low'
+                  for url in _thumbnails(g.get('_preload_posts') or [], limit)]
+    return ', '.join(links)
+
+
+def _send_early_hints(links):
+    send = request.environ.get('wsgi.early_hints')
+    if callable(send):
+        send([('Link', links)])
+
+
+def init_app(app, thumb_path):
+    """thumb_path 根据原图路径返回缩略图路径"""
+    global _thumb_path
+    _thumb_path = thumb_path
+
+    @app.before_request
+    def load_cached_links():
+        if request.method != 'GET' or request.endpoint not in ENDPOINTS:
+            return
+        key = _key()
+        if key is None:
+            return
+        links = cache.get(key)
+        metrics.cache_result('preload', links is not None)
+        if links is not None:
+            g._preload_links = links
+            if links:
+                _send_early_hints(links)
+
+    @app.after_request
+    def add_link_header(response):
+        if (request.method != 'GET' or request.endpoint not in ENDPOINTS
+                or response.status_code != 200 or response.mimetype != 'text/html'):
+            return response
+        links = g.get('_preload_links')
+        if links is None:
+            links = build_links()
+            key = _key()
+            if key is not None:
+                cache.put(key, links, ttl=app.config['PRELOAD_CACHE_TTL'])
+        if links:
+            response.headers.add('Link', links)
+        return response
@@ -0,0 +1,166 @@
+"""
+管理员按需剖析单个请求。
+
+管理员在请求上加 ?_profile=1 或请求头 X-Profile: 1 时，该请求同时运行两种剖析器
+（同一时间只剖析一个请求，其余请求照常处理）：
+    - cProfile（确定性）：保存为 .prof，可用 snakeviz / pstats 查看，也可在 /admin/profiles 查看前若干行；
+    - 采样剖析：后台线程每隔 PROFILE_SAMPLE_INTERVAL 秒采集一次请求线程的调用栈，
+      保存为 collapsed stack 格式（.collapsed），可直接交给 flamegraph.pl / speedscope 生成火焰图。
+文件保存在 PROFILE_DIR 下，只保留最近 PROFILE_KEEP 份。剖析从 before_request 开始，
+到 after_request 结束，覆盖视图函数、ORM 查询与模板渲染；被剖析的请求不以流式输出
+（streaming.render 改为一次渲染完），模板渲染全部计入。
+"""
+import cProfile
+import io
+import os
+import pstats
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+from flask import current_app, g, request, session
+
+import user_cache
+
+
+class StackSampler(threading.Thread):
+    """定时采集目标线程的调用栈，统计为 collapsed stack"""
+
+    def __init__(self, thread_id, interval):
+        super().__init__(daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            names = []
+            while frame is not None:
+                code = frame.f_code
+                names.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})')
+                frame = frame.f_back
+            self.stacks[';'.join(reversed(names))] += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+    def collapsed(self):
+        return ''.join(f'{stack} {count}\n' for stack, count in self.stacks.most_common())
+
+
+def _requested():
+    return request.args.get('_profile') == '1' or request.headers.get('X-Profile') == '1'
+
+
+def _is_admin():
+    user_id = session.get('user_id')
+    user = user_cache.get(user_id) if user_id else None
+    return user is not None and user.is_admin
+
+
+def profile_dir():
+    return os.path.join(current_app.root_path, current_app.config['PROFILE_DIR'])
+
+
+def _save(profile, sampler, elapsed_ms):
+    directory = profile_dir()
+    os.makedirs(directory, exist_ok=True)
+    endpoint = re.sub(r'[^A-Za-z0-9_]', '_', request.endpoint or 'unmatched')
+    name = f"{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}_{endpoint}_{int(elapsed_ms)}ms"
+    profile.dump_stats(os.path.join(directory, f'{name}.prof'))
+    with open(os.path.join(directory, f'{name}.collapsed'), 'w', encoding='utf-8') as f:
+        f.write(sampler.collapsed())
+    with open(os.path.join(directory, f'{name}.txt'), 'w', encoding='utf-8') as f:
+        f.write(f'{request.method} {request.full_path}\n')
+
+    # 只保留最近 PROFILE_KEEP 份
+    for old in list_profiles()[current_app.config['PROFILE_KEEP']:]:
+        for ext in ('.prof', '.collapsed', '.txt'):
+            path = os.path.join(directory, old['name'] + ext)
+            if os.path.exists(path):
+                os.remove(path)
+    return name
+
+
+def list_profiles():
+    """最近的剖析结果，按时间倒序"""
+    directory = profile_dir()
+    if not os.path.isdir(directory):
+        return []
+    profiles = []
+    for filename in sorted(os.listdir(directory), reverse=True):
+        if not filename.endswith('.prof'):
+            continue
+        name = filename[:-len('.prof')]
+        request_line = ''
+        info_path = os.path.join(directory, f'{name}.txt')
+        if os.path.exists(info_path):
+            with open(info_path, encoding='utf-8') as f:
+                request_line = f.readline().strip()
+        profiles.append({
+            'name': name,
+            'request': request_line,
+            'created_at': datetime.strptime(name[:22], '%Y%m%d-%H%M%S-%f'),
+            'elapsed_ms': int(name.rsplit('_', 1)[1][:-2]),
+        })
+    return profiles
+
+
+def summary(name, limit=40):
+    """按累计耗时排序的 pstats 文本"""
+    out = io.StringIO()
+    stats = pstats.Stats(os.path.join(profile_dir(), f'{name}.prof'), stream=out)
+    stats.strip_dirs().sort_stats('cumulative').print_stats(limit)
+    return out.getvalue()
+
+
+_active = threading.Lock()  # Python 3.12 起同一时间只能有一个 cProfile 在运行
+
+
+def active():
+    """当前请求是否正在被剖析"""
+    return g.get('_profiler') is not None
+
+
+def _stop():
+    state = g.pop('_profiler', None)
+    if state is None:
+        return None
+    profile, sampler, started = state
+    profile.disable()
+    sampler.stop()
+    _active.release()
+    return profile, sampler, (time.perf_counter() - started) * 1000
+
+
+def init_app(app):
+
+    @app.before_request
+    def start_profiler():
+        if not _requested() or not _is_admin() or not _active.acquire(blocking=False):
+            return
+        profile = cProfile.Profile()
+        sampler = StackSampler(threading.get_ident(), app.config['PROFILE_SAMPLE_INTERVAL'])
+        g._profiler = (profile, sampler, time.perf_counter())
+        sampler.start()
+        profile.enable()
+
+    @app.after_request
+    def save_profile(response):
+        result = _stop()
+        if result is not None:
+            response.headers['X-Profile-Name'] = _save(*result)
+        return response
+
+    @app.teardown_request
+    def discard_profile(exc):
+        # after_request 未执行（请求中途出错）时也要停止剖析并释放锁
+        _stop()
@@ -0,0 +1,73 @@
+"""
+AI 聊天常见问题的回复缓存。
+
+只缓存首轮消息（没有 conversation_id）的回复：访客反复问的往往是同几个关于博客的问题，
+命中时直接返回缓存的回复，不再让 Coze 生成（只创建一个写入这轮问答的对话，供后续多轮使用）。
+缓存键为规范化后消息文本的摘要，
+存放在独立的 uWSGI 缓存 ai_replies 中（config.ini，写满后按 LRU 淘汰），所有 worker 共享。
+命中 / 未命中次数记在主缓存中，见 get_stats()。
+"""
+import hashlib
+import re
+import unicodedata
+
+from flask import current_app
+
+import cache
+import metrics
+
+CACHE = 'ai_replies'
+MAX_ITEMS = 500  # 与 config.ini 中 ai_replies 的 items 一致，仅用于非 uWSGI 环境
+HITS_KEY = 'reply_cache:hits'
+MISSES_KEY = 'reply_cache:misses'
+
+_TRAILING_PUNCTUATION = '?？!！。.，,~～ '
+
+cache.configure(CACHE, MAX_ITEMS)
+
+
+def normalize(message):
+    """全角转半角、忽略大小写、合并空白并去掉句尾标点，让同一个问题的不同写法命中同一条缓存"""
+    text = unicodedata.normalize('NFKC', message).casefold()
+    text = re.sub(r'\s+', ' ', text).strip()
+    return text.rstrip(_TRAILING_PUNCTUATION)
+
+
+def _key(message):
+    return 'reply:' + hashlib.md5(normalize(message).encode('utf-8')).hexdigest()
+
+
+def cacheable(message, conversation_id):
+    """只缓存首轮的短消息；长消息几乎不会重复，不值得占用缓存"""
+    config = current_app.config
+    return (config['AI_REPLY_CACHE_TTL'] > 0 and not conversation_id
+            and 0 < len(normalize(message)) <= config['AI_REPLY_CACHE_MAX_LENGTH'])
+
+
+def get(message):
+    """返回缓存的回复，未命中返回 None"""
+    reply = cache.get(_key(message), cache=CACHE)
+    cache.incr(HITS_KEY if reply is not None else MISSES_KEY)
+    metrics.cache_result('ai_replies', reply is not None)
+    return reply
+
+
+def put(message, reply):
+    """缓存回复；超过 ai_replies 缓存块大小（4KB）的回复在 uWSGI 下会写入失败，直接忽略"""
+    if reply:
+        cache.put(_key(message), reply, current_app.config['AI_REPLY_CACHE_TTL'], cache=CACHE)
+
+
+def purge():
+    """清空全部缓存的回复（调整智能体设定后使用）"""
+    cache.clear(CACHE)
+
+
+def get_stats():
+    hits = cache.get(HITS_KEY, 0)
+    misses = cache.get(MISSES_KEY, 0)
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_rate': round(hits / (hits + misses), 3) if hits + misses else None,
+    }
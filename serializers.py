@@ -0,0 +1,172 @@
+"""
+JSON 接口的序列化。
+
+- 查询：消息、评论、博客列表接口只查询需要的列（with_entities），作者、转发的博客等关联数据
+  在同一条语句中外联取得，返回轻量的 Row，不再构造 ORM 对象、也不再逐条懒加载关系；
+- 转换：message() / comment() / post() 把 Row 转换为前端使用的 dict，时间格式在这里统一；
+- 编码：安装了 orjson 时 jsonify 通过它编码（直接输出 UTF-8 字节，中文不再转义为 \\uXXXX），
+  否则使用 Flask 默认的标准库 json。两者对 datetime、Decimal 等类型的处理保持一致。
+"""
+import json
+
+from flask.json.provider import DefaultJSONProvider
+from sqlalchemy import func
+
+from models import Comment, Post, User
+
+try:
+    import orjson
+except ImportError:  # 使用标准库 json
+    orjson = None
+
+_thumb_path = None
+
+
+# ========== 编码 ==========
+
+class JSONProvider(DefaultJSONProvider):
+    """有 orjson 时用它编码；调试模式下（缩进输出）和没有 orjson 时沿用标准库"""
+
+    def _orjson_option(self):
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME  # datetime 交给 default，与标准库一致
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        return option
+
+    def _use_orjson(self):
+        return orjson is not None and (self.compact or (self.compact is None and not self._app.debug))
+
+    def dumps(self, obj, **kwargs):
+        if orjson is None or kwargs:
+            return super().dumps(obj, **kwargs)
+        return orjson.dumps(obj, default=self.default, option=self._orjson_option()).decode('utf-8')
+
+    def response(self, *args, **kwargs):
+        if not self._use_orjson():
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        body = orjson.dumps(obj, default=self.default, option=self._orjson_option() | orjson.OPT_APPEND_NEWLINE)
+        return self._app.response_class(body, mimetype=self.mimetype)
+
+
+# ========== 私信 ==========
+
+def message_columns(model):
+    """消息（热表或归档表）序列化需要的列，转发的博客只取标题、前 100 字和图片"""
+    return (
+        model.id, model.sender_id, model.content, model.image_path, model.thumb_path, model.created_at,
+        Post.id.label('post_id'), Post.title.label('post_title'),
+        func.substr(Post.content, 1, 100).label('post_excerpt'), Post.image_path.label('post_images'),
+    )
+
+
+def project_messages(query, model):
+    """把 model 的查询改为只查询 message_columns，并外联转发的博客"""
+    return query.outerjoin(Post, Post.id == model.forwarded_post_id).with_entities(*message_columns(model))
+
+
+def _minute(value):
+    return value.strftime('%Y-%m-%d %H:%M')
+
+
+def _first_image(image_path):
+    """博客 image_path（JSON 数组）中的第一张图，与 Post.image_paths 一样容忍损坏的数据"""
+    try:
+        images = json.loads(image_path) if image_path else None
+    except (json.JSONDecodeError, TypeError):
+        return None
+    return images[0] if images else None
+
+
+def message(row):
+    """把 project_messages 查出的行转换为前端使用的 dict"""
+    full = _minute(row.created_at)
+    item = {
+        'id': row.id,
+        'sender_id': row.sender_id,
+        'content': row.content,
+        'image_thumb': f'/static/{row.thumb_path}' if row.thumb_path else None,
+        'image_orig': f'/static/{row.image_path}' if row.image_path else None,
+        'forwarded_post': None,
+        'created_at': full[11:],
+        'created_at_full': full,
+    }
+    if row.post_id:
+        first_image = _first_image(row.post_images)
+        item['forwarded_post'] = {
+            'id': row.post_id,
+            'title': row.post_title,
+            'content': row.post_excerpt,
+            'thumb': f'/static/{_thumb_path(first_image)}' if first_image else None,
+        }
+    return item
+
+
+# ========== 评论 ==========
+
+COMMENT_COLUMNS = (
+    Comment.id, Comment.content, Comment.author, Comment.date, Comment.user_id,
+    Comment.voice_path, Comment.voice_duration,
+    Comment.parent_id, Comment.path, Comment.depth, Comment.reply_count,
+    User.id.label('author_id'), User.avatar_path.label('author_avatar'), User.role.label('author_role'),
+)
+
+
+def project_comments(query):
+    """把评论查询改为只查询 COMMENT_COLUMNS，并外联作者"""
+    return query.outerjoin(User, User.id == Comment.user_id).with_entities(*COMMENT_COLUMNS)
+
+
+def comment(row, can_edit=None):
+    """把 project_comments 查出的行转换为 dict；can_edit 为 None 时不输出该字段"""
+    item = {
+        'id': row.id,
+        'content': row.content,
+        'author': row.author,
+        'date': _minute(row.date),
+        'author_avatar': row.author_avatar,
+        'author_id': row.author_id,
+        'is_admin': row.author_role == 'admin',
+        'voice_path': row.voice_path,
+        'voice_duration': row.voice_duration,
+        'parent_id': row.parent_id,
+        'depth': row.depth,
+        'reply_count': row.reply_count,
+    }
+    if can_edit is not None:
+        item['can_edit'] = can_edit
+    return item
+
+
+# ========== 博客 ==========
+
+POST_COLUMNS = (
+    Post.id, Post.title, Post.content, Post.tags, Post.date, Post.image_path, Post.user_id,
+    User.username.label('author_name'),
+)
+
+
+def project_posts(query):
+    """把博客查询改为只查询 POST_COLUMNS，并外联作者"""
+    return query.outerjoin(User, User.id == Post.user_id).with_entities(*POST_COLUMNS)
+
+
+def post(row, can_edit):
+    """把 project_posts 查出的行转换为 /api/posts 使用的 dict"""
+    return {
+        'id': row.id,
+        'title': row.title,
+        'content': row.content,
+        'tags': row.tags,
+        'date': row.date.strftime('%Y-%m-%d'),
+        'image_paths_json': row.image_path or '[]',
+        'author': row.author_name if row.author_name is not None else row.tags,
+        'can_edit': can_edit,
+    }
+
+
+def init_app(app, thumb_path):
+    """thumb_path 根据原图路径返回缩略图路径"""
+    global _thumb_path
+    _thumb_path = thumb_path
+    app.json = JSONProvider(app)
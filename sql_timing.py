@@ -0,0 +1,135 @@
+"""
+按请求统计 SQL 查询。
+
+通过 SQLAlchemy 的 before/after_cursor_execute 事件（对主库和所有副本生效）记录每个请求的
+查询次数、数据库总耗时和最慢的几条语句：
+    - 响应头 Server-Timing：db（查询次数与耗时）和 app（请求总耗时），浏览器开发者工具中可直接查看；
+    - 每个请求一行 JSON 日志（logger 名为 sql_timing，SQL_LOG_REQUESTS 开启时），便于按路由汇总；
+    - 单条语句耗时超过 SQL_SLOW_QUERY_MS 毫秒时记录语句（WARNING）。参数值可能含密码哈希、私信内容和
+      会话数据，从不写入日志；SQL_LOG_PARAMETER_TYPES 开启时只附带参数个数与类型。
+不在请求上下文中（CLI、定时任务）执行的语句只做慢查询检测。
+on_request_finished() 注册的回调在每个请求结束时（流式响应在输出完毕后）收到与日志相同的统计。
+流式响应（streaming.py）的响应头在渲染完成前就已发出，Server-Timing 改用 db-first-byte / app-first-byte，
+只表示第一段输出前的查询与耗时；日志在响应结束后输出，包含全部查询。
+"""
+import json
+import logging
+import time
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+SLOWEST_KEPT = 3  # 每个请求保留的最慢语句条数
+MAX_LOGGED_LENGTH = 1000  # 日志中语句的最大长度
+
+logger = logging.getLogger('sql_timing')
+_listeners = []
+
+
+def _truncate(text):
+    return text if len(text) <= MAX_LOGGED_LENGTH else text[:MAX_LOGGED_LENGTH] + '...'
+
+
+def _parameter_types(parameters, executemany):
+    """参数的个数与类型名（executemany 时取第一组并附带组数），不含参数值"""
+    rows = None
+    if executemany:
+        rows = len(parameters)
+        parameters = parameters[0] if parameters else ()
+    values = parameters.values() if isinstance(parameters, dict) else (parameters or ())
+    described = {'count': len(values), 'types': [type(value).__name__ for value in values]}
+    if rows is not None:
+        described['rows'] = rows
+    return described
+
+
+def on_request_finished(callback):
+    """注册回调，每个请求结束时以统计 dict（queries、db_ms、ms 等）调用，在处理请求的线程中执行"""
+    _listeners.append(callback)
+
+
+def init_app(app):
+    if not logger.handlers:
+        handler = logging.StreamHandler()  # uWSGI 下写入 logto 指定的日志文件
+        handler.setFormatter(logging.Formatter('[%(asctime)s] %(levelname)s %(name)s: %(message)s'))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+
+    @event.listens_for(Engine, 'before_cursor_execute')
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('_query_started', []).append(time.perf_counter())
+
+    @event.listens_for(Engine, 'after_cursor_execute')
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed_ms = (time.perf_counter() - conn.info['_query_started'].pop()) * 1000
+
+        if elapsed_ms >= app.config['SQL_SLOW_QUERY_MS']:
+            entry = {
+                'event': 'slow_query',
+                'path': request.path if has_request_context() else None,
+                'ms': round(elapsed_ms, 1),
+                'statement': _truncate(' '.join(statement.split())),
+            }
+            if app.config['SQL_LOG_PARAMETER_TYPES']:
+                entry['parameters'] = _parameter_types(parameters, executemany)
+            logger.warning(json.dumps(entry, ensure_ascii=False))
+
+        if has_request_context():
+            stats = g.setdefault('_sql_stats', {'count': 0, 'ms': 0.0, 'slowest': []})
+            stats['count'] += 1
+            stats['ms'] += elapsed_ms
+            slowest = stats['slowest']
+            if len(slowest) < SLOWEST_KEPT or elapsed_ms > slowest[-1][0]:
+                slowest.append((elapsed_ms, statement))
+                slowest.sort(key=lambda item: item[0], reverse=True)
+                del slowest[SLOWEST_KEPT:]
+
+    @app.before_request
+    def start_request_timer():
+        g._request_started = time.perf_counter()
+
+    @app.after_request
+    def emit_sql_timing(response):
+        started = g.get('_request_started')
+        if started is None:
+            return response
+        total_ms = (time.perf_counter() - started) * 1000
+        # 流式响应在返回后还会继续查询，共用同一个 stats 以便结束时记录完整的统计
+        stats = g.setdefault('_sql_stats', {'count': 0, 'ms': 0.0, 'slowest': []})
+
+        # 流式响应此时只渲染了第一段，标明为首字节前的统计，避免被当作整个请求的耗时
+        suffix = '-first-byte' if response.is_streamed else ''
+        response.headers.add(
+            'Server-Timing',
+            f'db{suffix};dur={stats["ms"]:.1f};desc="{stats["count"]} queries", app{suffix};dur={total_ms:.1f}',
+        )
+        if (app.config['SQL_LOG_REQUESTS'] or _listeners) and not request.path.startswith('/static/'):
+            entry = {
+                'event': 'request',
+                'method': request.method,
+                'endpoint': request.endpoint,
+                'path': request.path,
+                'status': response.status_code,
+            }
+            if response.is_streamed:
+                entry['streamed'] = True
+                response.call_on_close(lambda: _finish_request(app, entry, started, stats))
+            else:
+                _finish_request(app, entry, started, stats)
+        return response
+
+
+def _finish_request(app, entry, started, stats):
+    entry.update({
+        'ms': round((time.perf_counter() - started) * 1000, 1),
+        'queries': stats['count'],
+        'db_ms': round(stats['ms'], 1),
+        'slowest': [{'ms': round(ms, 1), 'statement': _truncate(' '.join(statement.split()))}
+                    for ms, statement in stats['slowest']],
+    })
+    for callback in _listeners:
+        callback(entry)
+    if app.config['SQL_LOG_REQUESTS']:
+        logger.info(json.dumps(entry, ensure_ascii=False))
@@ -0,0 +1,57 @@
+let selectedFiles = [];
+
+function previewImages(input) {
+    const files = Array.from(input.files);
+    const previewContainer = document.getElementById('imagePreview');
+
+    selectedFiles = files;
+    previewContainer.innerHTML = '';
+
+    files.forEach((file, index) => {
+        if (file.type.startsWith('image/')) {
+            const reader = new FileReader();
+            reader.onload = function(e) {
+                const previewItem = document.createElement('div');
+                previewItem.className = 'preview-item';
+                previewItem.innerHTML = `
+                    <img src="${e.target.result}" alt="预览图片 ${index + 1}">
+                    <button type="button" class="remove-btn" onclick="removeImage(${index})" title="删除图片">×</button>
+                `;
+                previewContainer.appendChild(previewItem);
+            };
+            reader.readAsDataURL(file);
+        }
+    });
+}
+
+function removeImage(index) {
+    selectedFiles.splice(index, 1);
+    updateFileInput();
+    refreshPreview();
+}
+
+function updateFileInput() {
+    const input = document.getElementById('images');
+    const dt = new DataTransfer();
+    selectedFiles.forEach(file => dt.items.add(file));
+    input.files = dt.files;
+}
+
+function refreshPreview() {
+    const previewContainer = document.getElementById('imagePreview');
+    previewContainer.innerHTML = '';
+
+    selectedFiles.forEach((file, index) => {
+        const reader = new FileReader();
+        reader.onload = function(e) {
+            const previewItem = document.createElement('div');
+            previewItem.className = 'preview-item';
+            previewItem.innerHTML = `
+                <img src="${e.target.result}" alt="预览图片 ${index + 1}">
+                <button type="button" class="remove-btn" onclick="removeImage(${index})" title="删除图片">×</button>
+            `;
+            previewContainer.appendChild(previewItem);
+        };
+        reader.readAsDataURL(file);
+    });
+}
@@ -0,0 +1,102 @@
+document.addEventListener('DOMContentLoaded', function() {
+    const flashMessage = document.getElementById('flash-message');
+    if (flashMessage) {
+        setTimeout(function() {
+            flashMessage.style.opacity = '0';
+            setTimeout(function() {
+                flashMessage.style.display = 'none';
+            }, 500);
+        }, 3000);
+    }
+});
+
+// 同步两个日期输入框的值
+document.addEventListener('DOMContentLoaded', function() {
+    const dateInputs = document.querySelectorAll('input[name="search_date"]');
+
+    dateInputs.forEach(input => {
+        input.addEventListener('change', function() {
+            dateInputs.forEach(otherInput => {
+                if (otherInput !== this) {
+                    otherInput.value = this.value;
+                }
+            });
+        });
+    });
+
+    if (dateInputs.length > 0 && dateInputs[0].value) {
+        dateInputs.forEach(input => {
+            input.value = dateInputs[0].value;
+        });
+    }
+});
+
+// 记录一次博客浏览（用于热门排行），不影响页面
+function recordPostView(postId) {
+    const url = `/post/${parseInt(postId)}/view`;
+    if (navigator.sendBeacon) {
+        navigator.sendBeacon(url);
+    } else {
+        fetch(url, { method: 'POST', keepalive: true }).catch(() => {});
+    }
+}
+
+// ========== 评论回复 ==========
+// 各页面定义 renderComment(comment) 渲染单条评论、openCommentModal(...) 打开评论框，这里只处理回复楼
+
+// 回复前的“回复 @某人”
+function renderCommentReplyTo(comment) {
+    return comment.reply_to ? `<span class="comment-reply-to">回复 @${comment.reply_to}</span>` : '';
+}
+
+// 评论下的“回复”按钮
+function renderCommentReplyButton(comment) {
+    return `<button class="comment-reply-btn" data-author="${comment.author}" onclick="replyComment(${comment.id}, this.dataset.author)">回复</button>`;
+}
+
+// 顶层评论下的回复（接口只返回前几条，其余点击后加载）
+function renderCommentReplies(thread) {
+    const replies = thread.replies || [];
+    if (!replies.length) return '';
+    const more = thread.reply_count > replies.length
+        ? `<button class="comment-replies-more" onclick="expandCommentThread(${thread.id})">查看全部 ${thread.reply_count} 条回复</button>`
+        : '';
+    return `<div class="comment-replies" id="commentReplies-${thread.id}">${replies.map(renderComment).join('')}${more}</div>`;
+}
+
+function expandCommentThread(commentId) {
+    fetch(`/get_comment_thread/${parseInt(commentId)}`)
+        .then(res => res.json())
+        .then(data => {
+            const container = document.getElementById(`commentReplies-${commentId}`);
+            if (data.success && container) container.innerHTML = data.comment.replies.map(renderComment).join('');
+        })
+        .catch(err => console.error('加载回复失败:', err));
+}
+
+// 评论列表分页：接口每次返回一页顶层评论，next_cursor 不为空时在末尾显示“加载更多评论”
+function renderMoreComments(postId, nextCursor) {
+    return nextCursor
+        ? `<button class="comment-replies-more" onclick="loadMoreComments(${parseInt(postId)}, ${parseInt(nextCursor)}, this)">加载更多评论</button>`
+        : '';
+}
+
+function loadMoreComments(postId, before, button) {
+    button.disabled = true;
+    fetch(`/get_comments/${postId}?before=${before}`)
+        .then(res => res.json())
+        .then(data => {
+            const html = data.comments.map(thread => renderComment(thread) + renderCommentReplies(thread)).join('');
+            button.insertAdjacentHTML('beforebegin', html + renderMoreComments(postId, data.next_cursor));
+            button.remove();
+        })
+        .catch(err => {
+            console.error('加载评论失败:', err);
+            button.disabled = false;
+        });
+}
+
+function replyComment(commentId, author) {
+    if (!currentPostId) return;
+    openCommentModal(currentPostId, '', null, '', commentId, author);
+}
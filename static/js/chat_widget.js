@@ -0,0 +1,710 @@
+(function () {
+    // =============================================
+    //  全局状态
+    // =============================================
+    let chatOpen          = false;
+    let chatLoading       = false;
+    let chatConversationId = null;
+    let chatSeeding       = null;  // 缓存回复后在后台新建对话的轮询，下一条消息发送前等它结束
+
+    const userName    = window._userName    || '访客';
+    const avatarPath  = window._userAvatarPath || null;
+
+    // AI 名称
+    const aiName = userName + '（盗or倒版）';
+
+    // =============================================
+    //  旋转180°处理
+    // =============================================
+    function rotateImage(srcUrl, canvasEl, callback) {
+        const dpr = window.devicePixelRatio || 1;
+        const displayW = canvasEl.width;   // CSS 显示尺寸（由调用方设置）
+        const displayH = canvasEl.height;
+
+        // 把 canvas 实际像素放大为 dpr 倍，CSS 尺寸保持不变，消除模糊
+        canvasEl.width  = displayW * dpr;
+        canvasEl.height = displayH * dpr;
+        canvasEl.style.width  = displayW + 'px';
+        canvasEl.style.height = displayH + 'px';
+
+        const ctx = canvasEl.getContext('2d');
+        ctx.scale(dpr, dpr);
+
+        const img = new Image();
+        img.crossOrigin = 'anonymous';
+        img.onload = function () {
+            ctx.clearRect(0, 0, displayW, displayH);
+            ctx.save();
+            ctx.translate(displayW / 2, displayH / 2);
+            ctx.rotate(Math.PI); // 180度
+            ctx.drawImage(img, -displayW / 2, -displayH / 2, displayW, displayH);
+            ctx.restore();
+
+            canvasEl.style.display = 'block';
+            const fallback = document.getElementById('chatFabFallback');
+            if (fallback) fallback.style.display = 'none';
+
+            if (callback) callback(canvasEl);
+        };
+        img.onerror = function () {
+            console.log('头像加载失败，使用fallback');
+        };
+        img.src = srcUrl;
+    }
+
+    // 为聊天窗口头部生成旋转头像
+    function buildHeaderRotatedAvatar(srcUrl) {
+        const headerAvatar = document.getElementById('chatHeaderAvatar');
+
+        const c = document.createElement('canvas');
+        c.width  = 40;
+        c.height = 40;
+        c.style.cssText = 'width:40px;height:40px;border-radius:50%;';
+
+        rotateImage(srcUrl, c, function () {
+            headerAvatar.innerHTML = '';
+            headerAvatar.appendChild(c);
+        });
+    }
+
+    // 生成消息气泡用的旋转头像（34×34）- 同步返回占位，异步更新
+    function makeMsgRotatedCanvas(srcUrl, callback) {
+        // 立即创建占位元素
+        const placeholder = document.createElement('div');
+        placeholder.className = 'msg-avatar ai-avatar';
+        placeholder.textContent = '🙃';
+        placeholder.style.cssText = 'display:flex;align-items:center;justify-content:center;font-size:1rem;width:34px;height:34px;border-radius:50%;flex-shrink:0;';
+
+        // 立即返回占位符
+        callback(placeholder);
+
+        // 异步加载真实头像
+        const c = document.createElement('canvas');
+        c.width  = 34;
+        c.height = 34;
+        c.className = 'msg-avatar ai-avatar';
+        c.style.cssText = 'border-radius:50%;flex-shrink:0;width:34px;height:34px;';
+
+        rotateImage(srcUrl, c, function () {
+            // 如果占位符还在DOM中，则替换
+            if (placeholder.parentNode) {
+                placeholder.parentNode.replaceChild(c, placeholder);
+            }
+        });
+    }
+
+    // =============================================
+    //  初始化旋转头像
+    // =============================================
+    function initRotatedAvatars() {
+        if (!avatarPath) return;
+
+        // FAB 按钮
+        const fabCanvas = document.getElementById('chatFabCanvas');
+        if (fabCanvas) rotateImage(avatarPath, fabCanvas);
+
+        // 头部头像
+        buildHeaderRotatedAvatar(avatarPath);
+
+        // 更新头部名字
+        const nameEl = document.getElementById('chatHeaderName');
+        if (nameEl) nameEl.textContent = aiName;
+    }
+
+    // =============================================
+    //  打字机效果
+    // =============================================
+    function typewriter(el, text, speed, onDone) {
+        speed = speed || 28;
+        let i = 0;
+        el.textContent = '';
+        const timer = setInterval(function () {
+            if (i < text.length) {
+                const ch = text[i];
+                if (ch === '\n') {
+                    el.appendChild(document.createElement('br'));
+                } else {
+                    el.appendChild(document.createTextNode(ch));
+                }
+                i++;
+                scrollChatToBottom();
+            } else {
+                clearInterval(timer);
+                if (onDone) onDone();
+            }
+        }, speed);
+    }
+
+    // =============================================
+    //  获取当前时间字符串
+    // =============================================
+    function getNowTime() {
+        const d = new Date();
+        return d.getHours().toString().padStart(2, '0') + ':' +
+               d.getMinutes().toString().padStart(2, '0');
+    }
+
+    // =============================================
+    //  滚动到底部
+    // =============================================
+    function scrollChatToBottom() {
+        const msgs = document.getElementById('chatMessages');
+        if (msgs) msgs.scrollTop = msgs.scrollHeight;
+    }
+
+    // =============================================
+    //  构建 AI 头像节点（同步返回占位，异步更新）
+    // =============================================
+    function buildAiAvatarNode(callback) {
+        // 立即创建占位元素
+        const placeholder = document.createElement('div');
+        placeholder.className = 'msg-avatar ai-avatar';
+        placeholder.textContent = '🙃';
+        placeholder.style.cssText = 'display:flex;align-items:center;justify-content:center;font-size:1rem;width:34px;height:34px;border-radius:50%;flex-shrink:0;';
+
+        // 立即返回占位符
+        callback(placeholder);
+
+        // 异步加载真实头像
+        if (avatarPath) {
+            makeMsgRotatedCanvas(avatarPath, function(realAvatar) {
+                // 如果占位符还在DOM中，则替换
+                if (placeholder.parentNode) {
+                    placeholder.parentNode.replaceChild(realAvatar, placeholder);
+                }
+            });
+        }
+    }
+
+    // =============================================
+    //  构建用户头像节点（同步返回占位，异步更新）
+    // =============================================
+    function buildUserAvatarNode(callback) {
+        // 立即创建占位元素
+        const placeholder = document.createElement('div');
+        placeholder.className = 'msg-avatar user-avatar';
+        placeholder.textContent = userName ? userName[0] : '我';
+        placeholder.style.cssText = 'display:flex;align-items:center;justify-content:center;font-size:1rem;width:34px;height:34px;border-radius:50%;flex-shrink:0;';
+
+        // 立即返回占位符
+        callback(placeholder);
+
+        // 异步加载真实头像
+        if (avatarPath) {
+            const img = new Image();
+            img.onload = function() {
+                const realAvatar = document.createElement('div');
+                realAvatar.className = 'msg-avatar user-avatar';
+                realAvatar.style.cssText = 'width:34px;height:34px;border-radius:50%;overflow:hidden;flex-shrink:0;';
+
+                const imgElement = document.createElement('img');
+                imgElement.src = avatarPath;
+                imgElement.style.cssText = 'width:100%;height:100%;object-fit:cover;';
+                realAvatar.appendChild(imgElement);
+
+                if (placeholder.parentNode) {
+                    placeholder.parentNode.replaceChild(realAvatar, placeholder);
+                }
+            };
+            img.onerror = function() {
+                // 加载失败时保持占位符即可
+            };
+            img.src = avatarPath;
+        }
+    }
+
+    // =============================================
+    //  添加 AI 气泡
+    // =============================================
+    function appendAiBubble(callback) {
+        buildAiAvatarNode(function (avatarNode) {
+            const container = document.getElementById('chatMessages');
+            const row    = document.createElement('div');
+            row.className = 'chat-msg ai-msg';
+
+            const bubble = document.createElement('div');
+            bubble.className = 'msg-bubble ai-bubble';
+
+            const timeEl = document.createElement('span');
+            timeEl.className = 'msg-time';
+            timeEl.textContent = getNowTime();
+
+            const p = document.createElement('p');
+            bubble.appendChild(p);
+            bubble.appendChild(timeEl);
+
+            row.appendChild(avatarNode);
+            row.appendChild(bubble);
+            container.appendChild(row);
+            scrollChatToBottom();
+
+            if (callback) callback(p);
+        });
+    }
+
+    // =============================================
+    //  添加用户消息
+    // =============================================
+    function appendUserMessage(text) {
+        buildUserAvatarNode(function (avatarNode) {
+            const container = document.getElementById('chatMessages');
+            const row    = document.createElement('div');
+            row.className = 'chat-msg user-msg';
+
+            const bubble = document.createElement('div');
+            bubble.className = 'msg-bubble user-bubble';
+
+            const p = document.createElement('p');
+            text.split('\n').forEach(function (line, idx) {
+                if (idx > 0) p.appendChild(document.createElement('br'));
+                p.appendChild(document.createTextNode(line));
+            });
+
+            const timeEl = document.createElement('span');
+            timeEl.className = 'msg-time';
+            timeEl.textContent = getNowTime();
+
+            bubble.appendChild(p);
+            bubble.appendChild(timeEl);
+
+            row.appendChild(bubble);
+            row.appendChild(avatarNode);
+            container.appendChild(row);
+            scrollChatToBottom();
+        });
+    }
+
+    // =============================================
+    //  显示「思考中」气泡
+    // =============================================
+    function showThinking() {
+        // 先移除可能存在的旧思考气泡
+        hideThinking();
+
+        buildAiAvatarNode(function (avatarNode) {
+            const container = document.getElementById('chatMessages');
+            const row = document.createElement('div');
+            row.className = 'chat-msg ai-msg';
+            row.id = 'thinkingBubble';
+
+            const bubble = document.createElement('div');
+            bubble.className = 'msg-bubble ai-bubble thinking-bubble';
+            bubble.innerHTML = '<div class="thinking-dots"><span></span><span></span><span></span></div>';
+
+            row.appendChild(avatarNode);
+            row.appendChild(bubble);
+            container.appendChild(row);
+            scrollChatToBottom();
+        });
+    }
+
+    function hideThinking() {
+        const el = document.getElementById('thinkingBubble');
+        if (el) el.remove();
+    }
+
+    // =============================================
+    //  欢迎语
+    // =============================================
+    function showWelcomeMessage() {
+        const welcomeText = `你好 ${userName}，我是盗or倒版${userName}，很高兴和你聊天。`;
+        appendAiBubble(function (p) {
+            typewriter(p, welcomeText, 45);
+        });
+    }
+
+    // =============================================
+    //  清空并重置对话
+    // =============================================
+    function clearAndResetChat() {
+        document.getElementById('chatMessages').innerHTML = '';
+        chatConversationId = null;
+        chatSeeding = null;
+        showWelcomeMessage();
+    }
+    window.clearAndResetChat = clearAndResetChat;
+
+    // =============================================
+    //  FAB 拖拽逻辑
+    // =============================================
+    (function initDrag() {
+        const fab = document.getElementById('chatFab');
+        const WIN_W = 360;
+        const WIN_H = 520;
+        const FAB_SIZE = 62;
+        const MARGIN = 12;
+
+        let dragging = false;
+        let startX, startY, origLeft, origTop;
+        let fabLeft = null;
+        let fabTop  = null;
+
+        function getInitialPos() {
+            const vw = window.innerWidth;
+            const vh = window.innerHeight;
+            return {
+                left: vw - FAB_SIZE - 32,
+                top:  vh - FAB_SIZE - 32
+            };
+        }
+
+        function clampFab(left, top) {
+            const vw = window.innerWidth;
+            const vh = window.innerHeight;
+            left = Math.max(MARGIN, Math.min(left, vw - FAB_SIZE - MARGIN));
+            top  = Math.max(MARGIN, Math.min(top,  vh - FAB_SIZE - MARGIN));
+            return { left, top };
+        }
+
+        function applyFabPos(left, top) {
+            fab.style.right  = 'auto';
+            fab.style.bottom = 'auto';
+            fab.style.left   = left + 'px';
+            fab.style.top    = top  + 'px';
+            fabLeft = left;
+            fabTop  = top;
+        }
+
+        function getWindowPos(fabL, fabT) {
+            const vw = window.innerWidth;
+            const vh = window.innerHeight;
+            const GAP = 10;
+
+            let wLeft = fabL + FAB_SIZE / 2 - WIN_W + 16;
+            let wTop  = fabT - WIN_H - GAP;
+
+            wLeft = Math.max(MARGIN, Math.min(wLeft, vw - WIN_W - MARGIN));
+            if (wTop < MARGIN) {
+                wTop = fabT + FAB_SIZE + GAP;
+            }
+            if (wTop + WIN_H > vh - MARGIN) {
+                wTop = Math.max(MARGIN, vh - WIN_H - MARGIN);
+            }
+
+            return { left: wLeft, top: wTop };
+        }
+
+        function updateWindowPos() {
+            if (fabLeft === null) return;
+            const win = document.getElementById('chatWindow');
+            const pos = getWindowPos(fabLeft, fabTop);
+            win.style.right  = 'auto';
+            win.style.bottom = 'auto';
+            win.style.left   = pos.left + 'px';
+            win.style.top    = pos.top  + 'px';
+        }
+
+        function onPointerDown(e) {
+            if (e.type === 'mousedown' && e.button !== 0) return;
+
+            if (fabLeft === null) {
+                const pos = getInitialPos();
+                fabLeft = pos.left;
+                fabTop  = pos.top;
+                applyFabPos(fabLeft, fabTop);
+            }
+
+            const clientX = e.touches ? e.touches[0].clientX : e.clientX;
+            const clientY = e.touches ? e.touches[0].clientY : e.clientY;
+
+            dragging = false;
+            startX   = clientX;
+            startY   = clientY;
+            origLeft = fabLeft;
+            origTop  = fabTop;
+
+            fab._pointerMoved = false;
+
+            document.addEventListener('mousemove', onPointerMove);
+            document.addEventListener('mouseup',   onPointerUp);
+            document.addEventListener('touchmove', onPointerMove, { passive: false });
+            document.addEventListener('touchend',  onPointerUp);
+        }
+
+        function onPointerMove(e) {
+            const clientX = e.touches ? e.touches[0].clientX : e.clientX;
+            const clientY = e.touches ? e.touches[0].clientY : e.clientY;
+            const dx = clientX - startX;
+            const dy = clientY - startY;
+
+            if (!dragging && Math.sqrt(dx*dx + dy*dy) < 5) return;
+
+            dragging = true;
+            fab._pointerMoved = true;
+            if (e.cancelable) e.preventDefault();
+
+            const clamped = clampFab(origLeft + dx, origTop + dy);
+            applyFabPos(clamped.left, clamped.top);
+
+            if (chatOpen) updateWindowPos();
+        }
+
+        function onPointerUp(e) {
+            document.removeEventListener('mousemove', onPointerMove);
+            document.removeEventListener('mouseup',   onPointerUp);
+            document.removeEventListener('touchmove', onPointerMove);
+            document.removeEventListener('touchend',  onPointerUp);
+
+            if (!dragging) {
+                toggleChatWindow();
+            } else {
+                const vw = window.innerWidth;
+                const midX = fabLeft + FAB_SIZE / 2;
+                const snapLeft = midX < vw / 2 ? MARGIN : vw - FAB_SIZE - MARGIN;
+
+                fab.style.transition = 'left 0.3s cubic-bezier(.34,1.4,.64,1), top 0.2s ease';
+                applyFabPos(snapLeft, fabTop);
+                if (chatOpen) {
+                    setTimeout(updateWindowPos, 320);
+                }
+                setTimeout(function () {
+                    fab.style.transition = '';
+                }, 400);
+            }
+
+            dragging = false;
+        }
+
+        fab.addEventListener('mousedown',  onPointerDown);
+        fab.addEventListener('touchstart', onPointerDown, { passive: true });
+        fab.removeAttribute('onclick');
+
+        window.addEventListener('resize', function () {
+            if (fabLeft !== null) {
+                const clamped = clampFab(fabLeft, fabTop);
+                applyFabPos(clamped.left, clamped.top);
+                if (chatOpen) updateWindowPos();
+            }
+        });
+
+        window._chatUpdateWindowPos = updateWindowPos;
+    })();
+
+    // =============================================
+    //  切换聊天窗口
+    // =============================================
+    window.toggleChatWindow = function () {
+        chatOpen = !chatOpen;
+        const win     = document.getElementById('chatWindow');
+        const fab     = document.getElementById('chatFab');
+        const overlay = document.getElementById('chatOverlay');
+
+        if (chatOpen) {
+            if (window._chatUpdateWindowPos) window._chatUpdateWindowPos();
+
+            document.getElementById('chatMessages').innerHTML = '';
+            chatConversationId = null;
+            showWelcomeMessage();
+
+            win.classList.add('chat-window--open');
+            fab.style.opacity = '0';
+            fab.style.pointerEvents = 'none';
+            fab.style.visibility = 'hidden';
+
+            overlay.classList.add('chat-overlay--show');
+
+            setTimeout(function () {
+                document.getElementById('chatInput').focus();
+            }, 300);
+        } else {
+            win.classList.remove('chat-window--open');
+            fab.style.opacity = '';
+            fab.style.pointerEvents = '';
+            fab.style.visibility = '';
+
+            overlay.classList.remove('chat-overlay--show');
+        }
+    };
+
+    // =============================================
+    //  键盘：Enter 发送
+    // =============================================
+    window.handleChatKeydown = function (e) {
+        if (e.key === 'Enter' && !e.shiftKey) {
+            e.preventDefault();
+            sendChatMessage();
+        }
+    };
+
+    // =============================================
+    //  输入框自动高度
+    // =============================================
+    window.autoResizeChatInput = function (el) {
+        el.style.height = 'auto';
+        el.style.height = Math.min(el.scrollHeight, 120) + 'px';
+    };
+
+    // =============================================
+    //  状态栏文字
+    // =============================================
+    function sleep(ms) {
+        return new Promise(function (resolve) { setTimeout(resolve, ms); });
+    }
+
+    // 轮询 seed 任务，取回包含缓存问答的新对话 id；最多等约 10 秒，失败时下一轮开启新对话
+    async function seedConversation(jobId) {
+        for (let i = 0; i < 20; i++) {
+            await sleep(500);
+            try {
+                const job = await (await fetch(`/chat_api/${jobId}`)).json();
+                if (!job.success || job.status === 'error') return;
+                if (job.status === 'done') {
+                    if (chatSeeding !== null && job.conversation_id) chatConversationId = job.conversation_id;
+                    return;
+                }
+            } catch (err) {
+                return;
+            }
+        }
+    }
+
+    function setStatus(html) {
+        const el = document.getElementById('chatStatus');
+        if (el) el.innerHTML = html;
+    }
+
+    // =============================================
+    //  发送消息
+    // =============================================
+    window.sendChatMessage = async function () {
+        if (chatLoading) return;
+
+        const input = document.getElementById('chatInput');
+        const text  = input.value.trim();
+        if (!text) return;
+
+        input.value = '';
+        input.style.height = 'auto';
+
+        // 立即禁用发送按钮，防止重复提交
+        chatLoading = true;
+        document.getElementById('chatSendBtn').disabled = true;
+        document.getElementById('chatSendBtn').style.opacity = '0.5';
+        setStatus('<span class="status-dot thinking"></span> 思考中...');
+
+        // 添加用户消息
+        appendUserMessage(text);
+
+        if (chatSeeding) {
+            await chatSeeding;
+            chatSeeding = null;
+        }
+
+        // 显示思考气泡（内部会先清理旧的）
+        showThinking();
+
+        // 逐段显示回复：收到第一段时移除思考气泡并创建 AI 气泡，之后逐段追加
+        let bubbleP  = null;
+        let fullText = '';
+        let errorMsg = null;
+
+        function renderReply() {
+            if (!bubbleP) return;
+            bubbleP.textContent = '';
+            fullText.split('\n').forEach(function (line, idx) {
+                if (idx > 0) bubbleP.appendChild(document.createElement('br'));
+                bubbleP.appendChild(document.createTextNode(line));
+            });
+            scrollChatToBottom();
+        }
+
+        function ensureBubble() {
+            if (bubbleP !== null) return;
+            bubbleP = false;  // 头像异步加载期间先占位，避免重复创建
+            hideThinking();
+            appendAiBubble(function (p) {
+                bubbleP = p;
+                renderReply();
+            });
+        }
+
+        try {
+            const resp = await fetch('/chat_api', {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify({
+                    message: text,
+                    conversation_id: chatConversationId
+                })
+            });
+            const data = await resp.json();
+
+            if (!data.success) {
+                errorMsg = data.error || '未知错误';
+            } else if (!data.job_id) {
+                // 常见问题直接返回缓存的完整回复，对话在后台新建
+                fullText = data.reply || '';
+                if (data.seed_job_id) chatSeeding = seedConversation(data.seed_job_id);
+            } else {
+                // 回复在后台生成：轮询取回新增的文本，有新内容时加快、没有时逐步放慢
+                let offset = 0;
+                let delay  = 200;
+                while (true) {
+                    await sleep(delay);
+                    const pollResp = await fetch(`/chat_api/${data.job_id}?offset=${offset}`);
+                    const job = await pollResp.json();
+                    if (!job.success) {
+                        errorMsg = job.error || '未知错误';
+                        break;
+                    }
+                    if (job.conversation_id) chatConversationId = job.conversation_id;
+                    if (job.delta) {
+                        fullText += job.delta;
+                        offset = job.offset;
+                        ensureBubble();
+                        renderReply();
+                        delay = 200;
+                    } else {
+                        delay = Math.min(delay * 1.5, 1500);
+                    }
+                    if (job.status === 'error') {
+                        errorMsg = job.error || '未知错误';
+                        break;
+                    }
+                    if (job.status === 'done') break;
+                }
+            }
+
+            if (errorMsg && !fullText) {
+                hideThinking();
+                appendAiBubble(function (p) {
+                    typewriter(p, '抱歉，出了点问题：' + errorMsg);
+                });
+            } else if (!fullText) {
+                hideThinking();
+                appendAiBubble(function (p) {
+                    typewriter(p, '（空回复）');
+                });
+            } else {
+                ensureBubble();
+                renderReply();
+            }
+        } catch (err) {
+            // 确保在错误时也移除思考气泡
+            hideThinking();
+            appendAiBubble(function (p) {
+                typewriter(p, '网络错误，请稍后重试 😢');
+            });
+        } finally {
+            chatLoading = false;
+            document.getElementById('chatSendBtn').disabled = false;
+            document.getElementById('chatSendBtn').style.opacity = '1';
+            setStatus('<span class="status-dot"></span> 在线');
+
+            // 延迟一点点再获取焦点，避免与点击事件冲突
+            setTimeout(() => {
+                document.getElementById('chatInput').focus();
+            }, 50);
+        }
+    };
+
+    // =============================================
+    //  页面加载完成后初始化旋转头像
+    // =============================================
+    if (document.readyState === 'loading') {
+        document.addEventListener('DOMContentLoaded', initRotatedAvatars);
+    } else {
+        initRotatedAvatars();
+    }
+
+})();
@@ -0,0 +1,92 @@
+let searchTimer = null;
+
+function debounceSearch() {
+  const q = document.getElementById('userSearchInput').value.trim();
+  document.getElementById('clearSearchBtn').style.display = q ? 'block' : 'none';
+  clearTimeout(searchTimer);
+  if (!q) { document.getElementById('searchResults').innerHTML = ''; return; }
+  searchTimer = setTimeout(() => searchUsers(q), 400);
+}
+
+async function searchUsers(q) {
+  const resp = await fetch(`/search_users?q=${encodeURIComponent(q)}`);
+  const data = await resp.json();
+  const el = document.getElementById('searchResults');
+  if (!data.users.length) { el.innerHTML = '<p style="color:#ccc;font-size:0.85rem;text-align:center;padding:8px">没有找到用户</p>'; return; }
+  el.innerHTML = data.users.map(u => `
+    <div class="contact-item" id="search-user-${u.id}">
+      <a href="/user/${u.id}" class="contact-avatar-link">
+        <div class="contact-avatar">
+          ${u.avatar ? `<img src="${u.avatar}" alt="">` : `<span>${u.username[0]}</span>`}
+        </div>
+      </a>
+      <div class="contact-info">
+        <span class="contact-name">${u.username}</span>
+        <span class="contact-bio">${u.bio || ''}</span>
+      </div>
+      <div class="contact-actions">
+        ${getAddBtn(u)}
+      </div>
+    </div>
+  `).join('');
+}
+
+function getAddBtn(u) {
+  if (u.friendship_status === 'accepted') return '<span class="btn-pending">已是好友</span>';
+  if (u.friendship_status === 'pending') return '<span class="btn-pending">已发送</span>';
+  return `<button class="btn-add" onclick="addFriend(${u.id}, this)">添加</button>`;
+}
+
+async function addFriend(userId, btn) {
+  const resp = await fetch(`/add_friend/${userId}`, { method: 'POST' });
+  const data = await resp.json();
+  if (data.success) {
+    btn.textContent = '已发送'; btn.className = 'btn-pending'; btn.disabled = true;
+    showToast('好友请求已发送 💕');
+  } else { showToast(data.error); }
+}
+
+async function acceptFriend(friendshipId) {
+  const resp = await fetch(`/accept_friend/${friendshipId}`, { method: 'POST' });
+  const data = await resp.json();
+  if (data.success) {
+    const el = document.getElementById(`req-${friendshipId}`);
+    if (el) el.remove();
+    showToast(data.message + ' 🌸');
+    setTimeout(() => location.reload(), 1200);
+  }
+}
+
+async function rejectFriend(friendshipId) {
+  const resp = await fetch(`/reject_friend/${friendshipId}`, { method: 'POST' });
+  const data = await resp.json();
+  if (data.success) {
+    const el = document.getElementById(`req-${friendshipId}`);
+    if (el) { el.style.opacity = '0'; setTimeout(() => el.remove(), 300); }
+  }
+}
+
+async function removeFriend(userId, username) {
+  if (!confirm(`确认删除好友 ${username}？`)) return;
+  const resp = await fetch(`/remove_friend/${userId}`, { method: 'POST' });
+  const data = await resp.json();
+  if (data.success) {
+    const el = document.getElementById(`friend-${userId}`);
+    if (el) { el.style.opacity = '0'; setTimeout(() => el.remove(), 300); }
+    showToast('已删除好友');
+  }
+}
+
+function clearSearch() {
+  document.getElementById('userSearchInput').value = '';
+  document.getElementById('searchResults').innerHTML = '';
+  document.getElementById('clearSearchBtn').style.display = 'none';
+}
+
+function showToast(msg) {
+  const t = document.createElement('div');
+  t.textContent = msg;
+  t.style.cssText = 'position:fixed;bottom:90px;left:50%;transform:translateX(-50%);background:rgba(255,182,193,0.95);color:white;padding:10px 20px;border-radius:20px;font-size:0.9rem;z-index:9999;box-shadow:0 4px 15px rgba(255,182,193,0.4)';
+  document.body.appendChild(t);
+  setTimeout(() => t.remove(), 2500);
+}
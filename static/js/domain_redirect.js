@@ -0,0 +1,57 @@
+// 倒计时秒数 - 改为10秒
+let countdown = 10;
+const countdownElement = document.getElementById('countdown');
+const newDomain = 'https://www.oceanyublog.top';
+
+// 倒计时
+const timer = setInterval(() => {
+    countdown--;
+    countdownElement.textContent = countdown;
+
+    if (countdown <= 0) {
+        clearInterval(timer);
+        window.location.href = newDomain;
+    }
+}, 1000);
+
+// 手动跳转
+document.getElementById('manualJumpBtn').addEventListener('click', function(e) {
+    e.preventDefault();
+    clearInterval(timer);
+    window.location.href = newDomain;
+});
+
+// 留在当前页面
+function stayHere() {
+    clearInterval(timer);
+    countdownElement.parentElement.style.display = 'none';
+
+    // 移除可能已存在的消息
+    const oldMessage = document.querySelector('.stay-message');
+    if (oldMessage) oldMessage.remove();
+
+    // 创建一个新的提示消息
+    const message = document.createElement('div');
+    message.className = 'stay-message';
+    message.innerHTML = '🌸 您选择了留在旧域名<br>但请注意旧域名可能随时停止服务<br>建议您收藏新域名：<br><strong>www.oceanyublog.top</strong>';
+
+    document.querySelector('.buttons').after(message);
+
+    // 修改按钮状态
+    const stayBtn = document.querySelector('.btn-secondary');
+    if (stayBtn) {
+        stayBtn.disabled = true;
+        stayBtn.style.opacity = '0.5';
+        stayBtn.style.cursor = 'not-allowed';
+    }
+}
+
+// 禁止 iframe 嵌套
+if (window.top !== window.self) {
+    window.top.location = window.self.location;
+}
+
+// 添加页面进入动画
+document.addEventListener('DOMContentLoaded', function() {
+    document.body.classList.add('loaded');
+});
@@ -0,0 +1,388 @@
+let currentImages = [];
+let currentImageIndex = 0;
+let currentDeletePostId = null;
+let currentPostId = null;
+let currentCommentId = null;
+let mediaRecorder = null;
+let audioChunks = [];
+let recordingStartTime = null;
+let recordingTimer = null;
+let recordedBlob = null;
+let recordedDuration = 0;
+let previewAudio = null;
+let currentVoicePath = null;
+let currentVoiceDuration = 0;
+let currentBubbleAudio = null;
+let currentBubbleId = null;
+let audioContext = null;
+let recordingStream = null;
+let pcmChunks = [];
+let sampleRate = 44100;
+
+function getThumbPath(origPath) {
+    if (!origPath) return origPath;
+    const basename = origPath.split('/').pop();
+    if (basename.startsWith('orig_')) {
+        const uid = basename.replace(/^orig_/, '').replace(/\.[^.]+$/, '');
+        const dir = origPath.substring(0, origPath.lastIndexOf('/'));
+        return dir + '/thumb_' + uid + '.webp';
+    }
+    return origPath;
+}
+
+function fetchAuthorInfo(authorId, authorName, authorInfoElement) {
+    fetch(`/get_user_info/${authorId}`)
+        .then(res => res.json())
+        .then(data => {
+            let avatarHtml = data.avatar_path
+                ? `<div class="comment-avatar" style="margin-right:8px;"><img src="/${data.avatar_path}" alt="头像" style="width:28px;height:28px;border-radius:50%;object-fit:cover;"></div>`
+                : `<div class="comment-avatar" style="margin-right:8px;"><span class="comment-avatar-text" style="display:flex;align-items:center;justify-content:center;width:28px;height:28px;background:linear-gradient(135deg,#FDC2CC,#FFF1F3);border-radius:50%;color:white;font-weight:bold;">${authorName[0]}</span></div>`;
+            const adminIcon = data.is_admin ? `<img src="/static/img/dav.png" alt="大V" style="height:1.2em;width:auto;vertical-align:middle;margin-left:4px;" onerror="this.style.display='none'">` : '';
+            authorInfoElement.innerHTML = `<div style="display:flex;align-items:center;gap:6px;width:100%;">${avatarHtml}<a href="/user/${authorId}" style="color:#FDC2CC;text-decoration:none;font-size:0.9rem;display:flex;align-items:center;">${authorName}${adminIcon}</a></div>`;
+            authorInfoElement.style.display = 'flex';
+            authorInfoElement.style.alignItems = 'center';
+        })
+        .catch(() => {
+            authorInfoElement.innerHTML = `<a href="/user/${authorId}" style="color:#FDC2CC;text-decoration:none;font-size:0.9rem;">👤 ${authorName}</a>`;
+            authorInfoElement.style.display = 'flex';
+        });
+}
+
+function openPostModal(postId, title, content, imagePaths, tags, date, author, authorId, thumbPaths) {
+    recordPostView(postId);
+    document.getElementById('modalTitle').textContent = title;
+    document.getElementById('modalContent').textContent = content;
+    document.getElementById('modalDate').innerHTML = '<img src="/static/img/calendar.png" alt="日历" style="width:1.2em;height:1.2em;vertical-align:middle;" onerror="this.style.display=\'none\'"> ' + date;
+    const authorInfo = document.getElementById('modalAuthorInfo');
+    if (author && authorId) { fetchAuthorInfo(authorId, author, authorInfo); } else { authorInfo.style.display = 'none'; }
+    const tagsContainer = document.getElementById('modalTags');
+    tagsContainer.innerHTML = '';
+    if (tags) {
+        tags.split(',').forEach(tag => {
+            if (tag.trim()) { const el = document.createElement('span'); el.className = 'tag'; el.textContent = tag.trim(); tagsContainer.appendChild(el); }
+        });
+    }
+    currentImages = [];
+    if (imagePaths) {
+        if (Array.isArray(imagePaths)) currentImages = imagePaths;
+        else if (typeof imagePaths === 'string') { try { currentImages = JSON.parse(imagePaths); } catch(e) { currentImages = []; } }
+    }
+    const thumbsToUse = (thumbPaths && Array.isArray(thumbPaths) && thumbPaths.length === currentImages.length) ? thumbPaths : currentImages.map(p => getThumbPath(p));
+    const imageGrid = document.getElementById('imageGrid');
+    imageGrid.innerHTML = '';
+    if (currentImages.length > 0) {
+        const displayCount = Math.min(currentImages.length, 9);
+        const showMore = currentImages.length > 9;
+        for (let i = 0; i < displayCount; i++) {
+            const img = document.createElement('img');
+            img.src = '/' + thumbsToUse[i]; img.alt = `图片 ${i+1}`; img.loading = 'lazy';
+            const container = document.createElement('div');
+            container.style.cssText = 'position:relative;display:inline-block;width:100%;height:100%;';
+            if (i === 8 && showMore) {
+                const overlay = document.createElement('div');
+                overlay.style.cssText = 'position:absolute;top:0;left:0;width:100%;height:100%;background:rgba(0,0,0,0.5);display:flex;align-items:center;justify-content:center;color:white;font-size:24px;border-radius:8px;';
+                overlay.textContent = `+${currentImages.length - 9}`;
+                img.style.cssText = 'width:100%;height:100%;object-fit:cover;';
+                container.appendChild(img); container.appendChild(overlay);
+            } else { img.style.cssText = 'width:100%;height:100%;object-fit:cover;'; container.appendChild(img); }
+            container.onclick = () => openImagePreview(i);
+            imageGrid.appendChild(container);
+        }
+    } else { imageGrid.innerHTML = '<p class="no-images">暂无图片</p>'; }
+    document.getElementById('postModal').style.display = 'block';
+    document.body.style.overflow = 'hidden';
+}
+
+function openPostModalSafe(element) {
+    try {
+        const postData = JSON.parse(element.dataset.post);
+        if (!postData || !postData.id) throw new Error('文章数据无效');
+        currentPostId = parseInt(postData.id);
+        const thumbPaths = (postData.images || []).map(p => getThumbPath(p));
+        openPostModal(postData.id, postData.title, postData.content, postData.images, postData.tags, postData.date, postData.author, postData.author_id, thumbPaths);
+        loadComments(currentPostId);
+    } catch(e) { console.error('解析文章数据失败:', e); alert('无法打开文章详情，请刷新页面重试'); }
+}
+
+function closePostModal() { document.getElementById('postModal').style.display = 'none'; document.body.style.overflow = 'auto'; }
+
+function openImagePreview(index) {
+    currentImageIndex = index;
+    document.getElementById('previewImage').src = '/' + getThumbPath(currentImages[index]);
+    document.getElementById('imagePreview').style.display = 'block';
+    document.getElementById('imageCounter').textContent = `${index+1} / ${currentImages.length}`;
+    updateNavButtons();
+}
+function closeImagePreview() { document.getElementById('imagePreview').style.display = 'none'; }
+function prevImage() {
+    if (currentImageIndex > 0) { currentImageIndex--; document.getElementById('previewImage').src = '/' + getThumbPath(currentImages[currentImageIndex]); document.getElementById('imageCounter').textContent = `${currentImageIndex+1} / ${currentImages.length}`; updateNavButtons(); }
+}
+function nextImage() {
+    if (currentImageIndex < currentImages.length - 1) { currentImageIndex++; document.getElementById('previewImage').src = '/' + getThumbPath(currentImages[currentImageIndex]); document.getElementById('imageCounter').textContent = `${currentImageIndex+1} / ${currentImages.length}`; updateNavButtons(); }
+}
+function updateNavButtons() {
+    document.getElementById('prevBtn').style.opacity = currentImageIndex === 0 ? '0.3' : '1';
+    document.getElementById('nextBtn').style.opacity = currentImageIndex === currentImages.length - 1 ? '0.3' : '1';
+}
+
+function editPost(postId) { window.location.href = `/edit_post/${postId}`; }
+function deletePost(postId, postTitle) {
+    currentDeletePostId = postId;
+    document.getElementById('deleteMessage').textContent = `确定要删除《${postTitle}》吗？此操作无法撤销。`;
+    document.getElementById('deleteModal').style.display = 'block';
+    document.body.style.overflow = 'hidden';
+    document.getElementById('confirmDeleteBtn').onclick = function() {
+        fetch(`/delete_post/${postId}`, { method: 'POST' }).then(res => res.json()).then(data => {
+            if (data.success) { closeDeleteModal(); location.reload(); } else showMessage(data.message || '删除失败', 'error');
+        }).catch(() => showMessage('删除失败，请重试', 'error'));
+    };
+}
+function closeDeleteModal() { document.getElementById('deleteModal').style.display = 'none'; document.body.style.overflow = 'auto'; }
+
+function openCommentModal(postId, postTitle, commentId = null, content = '', parentId = null, replyTo = '') {
+    if (!postId || isNaN(postId)) return;
+    currentPostId = parseInt(postId); currentCommentId = commentId;
+    document.getElementById('commentPostId').value = currentPostId;
+    document.getElementById('commentId').value = commentId || '';
+    document.getElementById('commentParentId').value = parentId || '';
+    document.getElementById('commentContent').value = content;
+    document.getElementById('commentModalTitle').textContent = commentId ? '编辑评论' : (parentId ? `回复 @${replyTo}` : `为《${postTitle}》添加评论`);
+    document.getElementById('commentModal').style.display = 'block';
+    document.body.style.overflow = 'hidden';
+}
+function closeCommentModal() {
+    resetVoiceState();
+    document.getElementById('commentModal').style.display = 'none';
+    document.body.style.overflow = 'auto';
+    currentCommentId = null;
+    document.getElementById('commentForm').reset();
+}
+
+// 渲染单条评论（顶层评论或回复）
+function renderComment(comment) {
+    let avatarHtml = comment.author_avatar
+        ? `<div class="comment-avatar"><img src="/${comment.author_avatar}" alt="头像"></div>`
+        : `<div class="comment-avatar"><span class="comment-avatar-text">${comment.author ? comment.author[0] : '?'}</span></div>`;
+    const adminIcon = comment.is_admin ? `<img src="/static/img/dav.png" alt="大V" style="height:1.5em;width:auto;vertical-align:middle;margin-left:2px;" onerror="this.style.display='none'">` : '';
+    let actionsHtml = '';
+    if (comment.can_edit) {
+        actionsHtml = comment.voice_path
+            ? `<div class="comment-actions"><button class="comment-delete-btn" onclick="deleteComment(${comment.id})">🗑️ 删除</button></div>`
+            : `<div class="comment-actions"><button class="comment-edit-btn" onclick="editComment(${comment.id}, \`${comment.content.replace(/`/g, '\\`')}\`)">✏️ 编辑</button><button class="comment-delete-btn" onclick="deleteComment(${comment.id})">🗑️ 删除</button></div>`;
+    }
+    let authorHtml = comment.author_id
+        ? `<a href="/user/${comment.author_id}" style="color:#FDC2CC;text-decoration:none;" class="comment-author">${comment.author}${adminIcon}</a>`
+        : `<span class="comment-author">${comment.author}${adminIcon}</span>`;
+    return `<div class="comment-item${comment.depth ? ' comment-reply' : ''}"><div class="comment-header"><div style="display:flex;align-items:center;gap:6px;">${avatarHtml}${authorHtml}${renderCommentReplyTo(comment)}<span class="comment-date">${comment.date}</span></div>${actionsHtml}</div><div class="comment-content">${comment.voice_path ? renderVoiceBubble(comment.voice_path, comment.voice_duration || 0, comment.id) : comment.content}</div>${renderCommentReplyButton(comment)}</div>`;
+}
+
+function loadComments(postId) {
+    if (!postId || isNaN(postId)) return;
+    fetch(`/get_comments/${parseInt(postId)}`).then(res => res.json()).then(data => {
+        const commentsList = document.getElementById('commentsList');
+        document.getElementById('commentCount').textContent = data.count;
+        if (data.comments.length === 0) {
+            commentsList.innerHTML = '<div class="no-comments">暂无评论！</div>';
+        } else {
+            commentsList.innerHTML = data.comments.map(thread => renderComment(thread) + renderCommentReplies(thread)).join('') + renderMoreComments(postId, data.next_cursor);
+        }
+    }).catch(() => {
+        const commentsList = document.getElementById('commentsList');
+        if (commentsList) commentsList.innerHTML = '<div class="no-comments" style="color:#dc3545;">加载评论失败</div>';
+    });
+}
+
+function editComment(commentId, content) { if (!currentPostId) return; openCommentModal(currentPostId, '', commentId, content); }
+function deleteComment(commentId) {
+    if (!currentPostId || !confirm('确定要删除这条评论吗？')) return;
+    fetch(`/delete_comment/${commentId}`, { method: 'POST', headers: {'Content-Type': 'application/json'} })
+        .then(res => res.json()).then(data => {
+            if (data.success) { loadComments(currentPostId); showMessage('评论删除成功！', 'success'); }
+            else showMessage('删除失败: ' + data.message, 'error');
+        }).catch(() => showMessage('删除失败，请重试', 'error'));
+}
+
+document.getElementById('commentForm').addEventListener('submit', async function(e) {
+    e.preventDefault();
+    const formData = new FormData(this);
+    const postId = parseInt(formData.get('post_id'));
+    if (!postId || isNaN(postId)) { showMessage('文章信息错误', 'error'); return; }
+    const commentId = formData.get('comment_id');
+    const url = commentId ? `/edit_comment/${commentId}` : '/add_comment';
+    const isEdit = !!commentId;
+    let voicePath = null, voiceDuration = null;
+    let textContent = formData.get('content').trim();
+    if (recordedBlob) {
+        const vForm = new FormData(); vForm.append('voice', recordedBlob, 'voice.wav'); vForm.append('duration', recordedDuration);
+        try {
+            const res = await fetch('/upload_voice', { method: 'POST', body: vForm });
+            const vData = await res.json();
+            if (!vData.success) { showMessage('语音上传失败: ' + vData.message, 'error'); return; }
+            voicePath = vData.voice_path; voiceDuration = vData.duration;
+            if (!textContent) textContent = '[语音评论]';
+        } catch(err) { showMessage('语音上传失败，请重试', 'error'); return; }
+    } else { if (!textContent) { showMessage('评论内容不能为空', 'warning'); return; } }
+    fetch(url, { method: 'POST', headers: {'Content-Type': 'application/json'}, body: JSON.stringify({ post_id: postId, parent_id: formData.get('parent_id') || null, content: textContent, voice_path: voicePath, voice_duration: voiceDuration }) })
+        .then(res => res.json()).then(data => {
+            if (data.success) { closeCommentModal(); loadComments(currentPostId); showMessage(isEdit ? '评论编辑成功！' : '评论添加成功！', 'success'); }
+            else showMessage(data.message || '操作失败', 'error');
+        }).catch(() => showMessage('提交失败，请重试', 'error'));
+});
+
+function showMessage(message, type = 'success') {
+    const toast = document.getElementById('messageToast');
+    document.getElementById('messageText').textContent = message;
+    toast.className = `message-toast ${type}`; toast.style.display = 'block';
+    setTimeout(() => { toast.style.display = 'none'; }, 3000);
+}
+
+document.addEventListener('keydown', function(e) {
+    if (document.getElementById('imagePreview').style.display === 'block') {
+        if (e.key === 'ArrowLeft') prevImage(); else if (e.key === 'ArrowRight') nextImage(); else if (e.key === 'Escape') closeImagePreview();
+    } else if (document.getElementById('postModal').style.display === 'block') { if (e.key === 'Escape') closePostModal(); }
+    else if (document.getElementById('deleteModal').style.display === 'block') { if (e.key === 'Escape') closeDeleteModal(); }
+    else if (document.getElementById('commentModal').style.display === 'block') { if (e.key === 'Escape') closeCommentModal(); }
+});
+window.onclick = function(event) {
+    if (event.target === document.getElementById('postModal')) closePostModal();
+    else if (event.target === document.getElementById('imagePreview')) closeImagePreview();
+    else if (event.target === document.getElementById('deleteModal')) closeDeleteModal();
+    else if (event.target === document.getElementById('commentModal')) closeCommentModal();
+};
+
+document.addEventListener('touchstart', function(e) {
+    var btn = e.target && (e.target.id === 'voiceRecordBtn' ? e.target : (e.target.closest && e.target.closest('#voiceRecordBtn')));
+    if (btn) { e.preventDefault(); startRecording(); }
+}, { passive: false, capture: true });
+document.addEventListener('mouseup', function() { stopRecording(); });
+document.addEventListener('mouseleave', function() { stopRecording(); });
+document.addEventListener('contextmenu', function(e) { if (e.target && e.target.id === 'voiceRecordBtn') e.preventDefault(); });
+
+function startRecording() {
+    if (audioContext) return;
+    audioContext = 'pending'; clearVoiceRecording();
+    var isSecure = location.protocol === 'https:' || location.hostname === 'localhost' || location.hostname === '127.0.0.1';
+    if (!isSecure) { audioContext = null; document.getElementById('voiceRecordStatus').textContent = '⚠️ 语音功能需要 HTTPS 环境'; return; }
+    if (!navigator.mediaDevices || !navigator.mediaDevices.getUserMedia) { audioContext = null; document.getElementById('voiceRecordStatus').textContent = '⚠️ 当前浏览器不支持录音'; return; }
+    function doRecord(stream) {
+        if (audioContext !== 'pending') return;
+        recordingStream = stream;
+        var ACtor = window.AudioContext || window.webkitAudioContext; var ctx = new ACtor();
+        audioContext = ctx; sampleRate = ctx.sampleRate;
+        var source = ctx.createMediaStreamSource(stream); var processor = ctx.createScriptProcessor(4096, 1, 1);
+        pcmChunks = [];
+        processor.onaudioprocess = function(ev) { pcmChunks.push(new Float32Array(ev.inputBuffer.getChannelData(0))); };
+        source.connect(processor); processor.connect(ctx.destination);
+        ctx._processor = processor; ctx._source = source;
+        recordingStartTime = Date.now();
+        var btn = document.getElementById('voiceRecordBtn'); if (btn) btn.classList.add('recording');
+        document.getElementById('voiceRecordStatus').textContent = '🔴 录音中...';
+        recordingTimer = setInterval(function() {
+            var sec = Math.round((Date.now() - recordingStartTime) / 1000);
+            document.getElementById('voiceRecordStatus').textContent = '🔴 录音中... ' + sec + 's';
+            if (sec >= 60) stopRecording();
+        }, 500);
+    }
+    document.getElementById('voiceRecordStatus').textContent = '🎙️ 请求麦克风权限...';
+    navigator.mediaDevices.getUserMedia({ audio: true, video: false })
+        .then(function(stream) { if (audioContext !== 'pending') { stream.getTracks().forEach(t => t.stop()); return; } doRecord(stream); })
+        .catch(function(err) {
+            audioContext = null;
+            var msg = err.name === 'NotAllowedError' ? '请允许麦克风权限后重试' : err.name === 'NotFoundError' ? '未检测到麦克风设备' : '麦克风错误：' + err.message;
+            document.getElementById('voiceRecordStatus').textContent = '⚠️ ' + msg;
+        });
+}
+
+function stopRecording() {
+    if (audioContext === 'pending') { audioContext = null; return; }
+    if (!audioContext || !recordingStream) return;
+    if (recordingStartTime && Date.now() - recordingStartTime < 300) { clearRecordingResources(); return; }
+    var ctx = audioContext, chunks = pcmChunks, sr = sampleRate, startTime = recordingStartTime;
+    clearRecordingResources();
+    recordedDuration = Math.round((Date.now() - startTime) / 1000) || 1;
+    var totalLen = 0; for (var i = 0; i < chunks.length; i++) totalLen += chunks[i].length;
+    if (totalLen === 0) { document.getElementById('voiceRecordStatus').textContent = '⚠️ 录音太短，请重试'; return; }
+    var merged = new Float32Array(totalLen), offset = 0;
+    for (var i = 0; i < chunks.length; i++) { merged.set(chunks[i], offset); offset += chunks[i].length; }
+    recordedBlob = encodeWAV(merged, sr);
+    document.getElementById('voiceRecordStatus').textContent = '';
+    submitVoiceComment();
+}
+
+function clearRecordingResources() {
+    if (audioContext && audioContext !== 'pending') {
+        try { if (audioContext._processor) audioContext._processor.onaudioprocess = null; if (audioContext._source) audioContext._source.disconnect(); if (audioContext._processor) audioContext._processor.disconnect(); audioContext.close().catch(function(){}); } catch(e) {}
+    }
+    audioContext = null;
+    if (recordingStream) { recordingStream.getTracks().forEach(t => t.stop()); recordingStream = null; }
+    pcmChunks = []; clearInterval(recordingTimer);
+    var btn = document.getElementById('voiceRecordBtn'); if (btn) btn.classList.remove('recording');
+    recordingStartTime = null;
+}
+
+function resetVoiceState() { clearVoiceRecording(); clearRecordingResources(); if (mediaRecorder && mediaRecorder.state !== 'inactive') mediaRecorder.stop(); clearInterval(recordingTimer); }
+
+function clearVoiceRecording() {
+    recordedBlob = null; recordedDuration = 0; currentVoicePath = null; currentVoiceDuration = 0;
+    if (previewAudio) { previewAudio.pause(); previewAudio = null; }
+    var preview = document.getElementById('voicePreview'); if (preview) { preview.style.display = 'none'; preview.innerHTML = ''; }
+    var status = document.getElementById('voiceRecordStatus'); if (status) status.textContent = '';
+}
+
+function encodeWAV(samples, sr) {
+    var buf = new ArrayBuffer(44 + samples.length * 2), view = new DataView(buf);
+    function ws(off, str) { for (var i = 0; i < str.length; i++) view.setUint8(off + i, str.charCodeAt(i)); }
+    ws(0,'RIFF'); view.setUint32(4, 36 + samples.length * 2, true); ws(8,'WAVE'); ws(12,'fmt ');
+    view.setUint32(16,16,true); view.setUint16(20,1,true); view.setUint16(22,1,true);
+    view.setUint32(24,sr,true); view.setUint32(28,sr*2,true); view.setUint16(32,2,true); view.setUint16(34,16,true);
+    ws(36,'data'); view.setUint32(40, samples.length * 2, true);
+    var idx = 44;
+    for (var s = 0; s < samples.length; s++) {
+        var v = samples[s] < -1 ? -1 : samples[s] > 1 ? 1 : samples[s];
+        view.setInt16(idx, v < 0 ? v * 0x8000 : v * 0x7FFF, true); idx += 2;
+    }
+    return new Blob([buf], { type: 'audio/wav' });
+}
+
+function submitVoiceComment() {
+    var postId = parseInt(document.getElementById('commentPostId').value);
+    if (!postId || isNaN(postId)) { showMessage('请先打开评论框', 'error'); clearRecordingResources(); return; }
+    if (!recordedBlob) { showMessage('没有录音内容', 'error'); clearRecordingResources(); return; }
+    document.getElementById('voiceRecordStatus').textContent = '上传中...';
+    var vForm = new FormData(); vForm.append('voice', recordedBlob, 'voice.wav'); vForm.append('duration', recordedDuration);
+    fetch('/upload_voice', { method: 'POST', body: vForm })
+        .then(res => res.json()).then(vData => {
+            if (!vData.success) { showMessage('语音上传失败: ' + vData.message, 'error'); clearRecordingResources(); return; }
+            return fetch('/add_comment', { method: 'POST', headers: {'Content-Type': 'application/json'}, body: JSON.stringify({ post_id: postId, parent_id: document.getElementById('commentParentId').value || null, content: '[语音评论]', voice_path: vData.voice_path, voice_duration: vData.duration }) });
+        }).then(res => res.json()).then(data => {
+            if (data.success) { clearRecordingResources(); clearVoiceRecording(); closeCommentModal(); loadComments(currentPostId); showMessage('语音评论发送成功！', 'success'); }
+            else { showMessage(data.message || '提交失败', 'error'); document.getElementById('voiceRecordStatus').textContent = ''; clearRecordingResources(); }
+        }).catch(() => { showMessage('提交失败，请重试', 'error'); document.getElementById('voiceRecordStatus').textContent = ''; clearRecordingResources(); });
+}
+
+function renderVoiceBubble(voicePath, duration, commentId) {
+    return `<div class="voice-bubble" id="vbubble-${commentId}" onclick="playVoiceBubble('/${voicePath}', ${commentId})"><div class="voice-bubble-play">▶</div><div class="voice-wave"><span></span><span></span><span></span><span></span><span></span><span></span></div><span class="voice-bubble-duration">${duration || 0}"</span></div>`;
+}
+
+function playVoiceBubble(url, commentId) {
+    if (currentBubbleAudio && !currentBubbleAudio.paused) {
+        currentBubbleAudio.pause(); currentBubbleAudio.currentTime = 0;
+        const oldBubble = document.getElementById('vbubble-' + currentBubbleId);
+        if (oldBubble) { oldBubble.classList.remove('playing'); oldBubble.querySelector('.voice-bubble-play').textContent = '▶'; }
+        if (currentBubbleId === commentId) { currentBubbleAudio = null; currentBubbleId = null; return; }
+    }
+    const bubble = document.getElementById('vbubble-' + commentId);
+    const audio = new Audio(url); currentBubbleAudio = audio; currentBubbleId = commentId; audio.play();
+    if (bubble) { bubble.classList.add('playing'); bubble.querySelector('.voice-bubble-play').textContent = '⏸'; }
+    audio.onended = () => {
+        if (bubble) { bubble.classList.remove('playing'); bubble.querySelector('.voice-bubble-play').textContent = '▶'; }
+        currentBubbleAudio = null; currentBubbleId = null;
+    };
+}
+
+(function() {
+    const isMobile = /Android|webOS|iPhone|iPad|iPod|BlackBerry|IEMobile|Opera Mini/i.test(navigator.userAgent) || window.innerWidth <= 768;
+    if (isMobile) document.body.classList.add('mobile-device');
+    document.addEventListener('DOMContentLoaded', () => { document.body.classList.add('loaded'); });
+    window.addEventListener('load', () => { setTimeout(() => { document.body.classList.add('fully-loaded'); }, 100); });
+})();
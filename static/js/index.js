@@ -0,0 +1,897 @@
+        let currentImages = [];   // 原图路径（用于全屏预览/下载）
+        let currentThumbs = [];   // 缩略图路径（用于网格展示）
+        let currentImageIndex = 0;
+        let currentDeletePostId = null;
+        let currentPostId = null;
+        let currentCommentId = null;
+        // ===== 语音评论变量 =====
+        let mediaRecorder = null;
+        let audioChunks = [];
+        let recordingStartTime = null;
+        let recordingTimer = null;
+        let recordedBlob = null;
+        let recordedDuration = 0;
+        let previewAudio = null;
+        let currentVoicePath = null;
+        let currentVoiceDuration = 0;
+
+        let currentBubbleAudio = null;
+        let currentBubbleId = null;
+        let audioContext = null;
+        let recordingStream = null;
+        let pcmChunks = [];
+        let sampleRate = 44100;
+
+        function jumpToPage() {
+            const input = document.getElementById('jumpPageInput');
+            const page = parseInt(input.value);
+            const maxPage = parseInt(input.max);
+            if (page && page >= 1 && page <= maxPage) {
+                const urlParams = new URLSearchParams(window.location.search);
+                urlParams.set('page', page);
+                window.location.href = `${window.location.pathname}?${urlParams.toString()}`;
+            } else {
+                alert(`请输入1到${maxPage}之间的页码`);
+                input.focus();
+            }
+        }
+
+        document.addEventListener('DOMContentLoaded', function() {
+            const jumpInput = document.getElementById('jumpPageInput');
+            if (jumpInput) {
+                jumpInput.addEventListener('keypress', function(e) {
+                    if (e.key === 'Enter') jumpToPage();
+                });
+            }
+        });
+        function fetchAuthorInfo(authorId, authorName, authorInfoElement) {
+    fetch(`/get_user_info/${authorId}`)
+        .then(res => res.json())
+        .then(data => {
+            if (data.success) {
+                // 创建头像HTML
+                let avatarHtml = '';
+                if (data.avatar_path) {
+                    avatarHtml = `<div class="comment-avatar" style="margin-right: 8px;"><img src="/${data.avatar_path}" alt="头像" style="width:28px;height:28px;min-width:28px;min-height:28px;border-radius:50%;object-fit:cover;display:block;"></div>`;
+                } else {
+                    avatarHtml = `<div class="comment-avatar" style="margin-right: 8px; width:28px; height:28px; min-width:28px; min-height:28px;"><span class="comment-avatar-text" style="display: flex; align-items: center; justify-content: center; width: 28px; height: 28px; background: linear-gradient(135deg, #FDC2CC, #FFF1F3); border-radius: 50%; color: white; font-weight: bold;">${authorName[0]}</span></div>`;
+                }
+
+                // 管理员图标
+                const adminIconHtml = data.is_admin
+                    ? `<img src="/static/img/dav.png" alt="大V" style="height: 1.2em; width: auto; vertical-align: middle; margin-left: 4px; display: inline-block;" onerror="this.style.display='none'">`
+                    : '';
+
+                // 更新authorInfo内容
+                authorInfoElement.innerHTML = `
+                    <div style="display: flex; align-items: center; gap: 6px; width: 100%;">
+                        ${avatarHtml}
+                        <a href="/user/${authorId}" style="color:#FDC2CC; text-decoration:none; font-size:0.9rem; display: flex; align-items: center;">
+                            ${authorName}${adminIconHtml}
+                        </a>
+                    </div>
+                `;
+                authorInfoElement.style.display = 'flex';
+                authorInfoElement.style.alignItems = 'center';
+                authorInfoElement.style.gap = '6px';
+            } else {
+                // 降级显示：只显示名字
+                authorInfoElement.innerHTML = `<a href="/user/${authorId}" style="color:#FDC2CC; text-decoration:none; font-size:0.9rem;">👤 ${authorName}</a>`;
+                authorInfoElement.style.display = 'flex';
+                authorInfoElement.style.alignItems = 'center';
+                authorInfoElement.style.gap = '6px';
+            }
+        })
+        .catch(err => {
+            console.error('获取作者信息失败:', err);
+            // 降级显示
+            authorInfoElement.innerHTML = `<a href="/user/${authorId}" style="color:#FDC2CC; text-decoration:none; font-size:0.9rem;">👤 ${authorName}</a>`;
+            authorInfoElement.style.display = 'flex';
+            authorInfoElement.style.alignItems = 'center';
+            authorInfoElement.style.gap = '6px';
+        });
+}
+        /**
+         * 根据原图路径推算缩略图路径（JS端）。
+         * 新格式：orig_<uid>.ext → thumb_<uid>.webp
+         * 旧格式：无缩略图，返回原路径
+         */
+        function getThumbPath(origPath) {
+            if (!origPath) return origPath;
+            const basename = origPath.split('/').pop();
+            if (basename.startsWith('orig_')) {
+                const uid = basename.replace(/^orig_/, '').replace(/\.[^.]+$/, '');
+                const dir = origPath.substring(0, origPath.lastIndexOf('/'));
+                return dir + '/thumb_' + uid + '.webp';
+            }
+            return origPath; // 旧数据 fallback
+        }
+
+        function openPostModal(postId, title, content, imagePaths, tags, date, author, authorId, thumbPaths) {
+            recordPostView(postId);
+            document.getElementById('modalTitle').textContent = title;
+            document.getElementById('modalContent').textContent = content;
+            document.getElementById('modalDate').innerHTML =
+                '<img src="/static/img/calendar.png" alt="日历" style="width: 1.2em; height: 1.2em; vertical-align: middle;" onerror="this.style.display=\'none\'"> ' + date;
+
+            // 显示作者信息 - 修改为包含头像和管理员图标
+            const authorInfo = document.getElementById('modalAuthorInfo');
+            if (author && authorId) {
+                // 获取作者头像（需要从后端获取）
+                fetchAuthorInfo(authorId, author, authorInfo);
+            } else {
+                authorInfo.style.display = 'none';
+            }
+
+            const tagsContainer = document.getElementById('modalTags');
+            tagsContainer.innerHTML = '';
+            if (tags) {
+                tags.split(',').forEach(tag => {
+                    if (tag.trim()) {
+                        const tagElement = document.createElement('span');
+                        tagElement.className = 'tag';
+                        tagElement.textContent = tag.trim();
+                        tagsContainer.appendChild(tagElement);
+                    }
+                });
+            }
+
+            // 解析原图路径
+            currentImages = [];
+            if (imagePaths) {
+                if (Array.isArray(imagePaths)) {
+                    currentImages = imagePaths;
+                } else if (typeof imagePaths === 'string') {
+                    try { currentImages = JSON.parse(imagePaths); } catch (e) { currentImages = []; }
+                }
+            }
+
+            // 解析缩略图路径（无则 fallback 到原图）
+            currentThumbs = [];
+            if (thumbPaths && Array.isArray(thumbPaths) && thumbPaths.length === currentImages.length) {
+                currentThumbs = thumbPaths;
+            } else {
+                // 如果没有传入缩略图，则根据原图路径生成
+                currentThumbs = currentImages.map(imgPath => {
+                    // 调用后端的 thumb_path 过滤器逻辑
+                    return getThumbPath(imgPath);
+                });
+            }
+
+            const imageGrid = document.getElementById('imageGrid');
+            imageGrid.innerHTML = '';
+
+            if (currentImages.length > 0) {
+                const displayCount = Math.min(currentImages.length, 9);
+                const showMore = currentImages.length > 9;
+                for (let i = 0; i < displayCount; i++) {
+                    const img = document.createElement('img');
+                    // 使用缩略图路径（关键修改）
+                    img.src = '/' + currentThumbs[i];
+                    img.alt = `图片 ${i + 1}`;
+                    img.loading = 'lazy';
+
+                    const container = document.createElement('div');
+                    container.style.cssText = 'position:relative;display:inline-block;width:100%;height:100%;';
+
+                    if (i === 8 && showMore) {
+                        const overlay = document.createElement('div');
+                        overlay.style.cssText = 'position:absolute;top:0;left:0;width:100%;height:100%;background:rgba(0,0,0,0.5);display:flex;align-items:center;justify-content:center;color:white;font-size:24px;border-radius:8px;';
+                        overlay.textContent = `+${currentImages.length - 9}`;
+                        img.style.cssText = 'width:100%;height:100%;object-fit:cover;';
+                        container.appendChild(img);
+                        container.appendChild(overlay);
+                    } else {
+                        img.style.cssText = 'width:100%;height:100%;object-fit:cover;';
+                        container.appendChild(img);
+                    }
+
+                    container.onclick = () => openImagePreview(i);
+                    imageGrid.appendChild(container);
+                }
+            } else {
+                imageGrid.innerHTML = '<p class="no-images">暂无图片</p>';
+            }
+
+            document.getElementById('postModal').style.display = 'block';
+            document.body.style.overflow = 'hidden';
+        }
+        function getThumbPath(origPath) {
+            if (!origPath) return origPath;
+            const basename = origPath.split('/').pop();
+            if (basename.startsWith('orig_')) {
+                const uid = basename.replace(/^orig_/, '').replace(/\.[^.]+$/, '');
+                const dir = origPath.substring(0, origPath.lastIndexOf('/'));
+                return dir + '/thumb_' + uid + '.webp';
+            }
+            return origPath;
+        }
+        function closePostModal() {
+            document.getElementById('postModal').style.display = 'none';
+            document.body.style.overflow = 'auto';
+        }
+
+        function openImagePreview(index) {
+            currentImageIndex = index;
+            const origPath = currentImages[index];
+            // 大图预览：仍用压缩图（已足够清晰），原图保留给下载
+            document.getElementById('previewImage').src = '/' + getThumbPath(origPath);
+            document.getElementById('previewImage').dataset.orig = origPath;
+            document.getElementById('imagePreview').style.display = 'block';
+            document.getElementById('imageCounter').textContent = `${index + 1} / ${currentImages.length}`;
+            // 更新下载按钮
+            const dlBtn = document.getElementById('downloadOrigBtn');
+            if (dlBtn) dlBtn.href = '/download_image/' + origPath;
+            updateNavButtons();
+        }
+
+        function closeImagePreview() {
+            document.getElementById('imagePreview').style.display = 'none';
+        }
+
+        function prevImage() {
+            if (currentImageIndex > 0) {
+                currentImageIndex--;
+                const origPath = currentImages[currentImageIndex];
+                document.getElementById('previewImage').src = '/' + getThumbPath(origPath);
+                document.getElementById('previewImage').dataset.orig = origPath;
+                document.getElementById('imageCounter').textContent = `${currentImageIndex + 1} / ${currentImages.length}`;
+                const dlBtn = document.getElementById('downloadOrigBtn');
+                if (dlBtn) dlBtn.href = '/download_image/' + origPath;
+                updateNavButtons();
+            }
+        }
+
+        function nextImage() {
+            if (currentImageIndex < currentImages.length - 1) {
+                currentImageIndex++;
+                const origPath = currentImages[currentImageIndex];
+                document.getElementById('previewImage').src = '/' + getThumbPath(origPath);
+                document.getElementById('previewImage').dataset.orig = origPath;
+                document.getElementById('imageCounter').textContent = `${currentImageIndex + 1} / ${currentImages.length}`;
+                const dlBtn = document.getElementById('downloadOrigBtn');
+                if (dlBtn) dlBtn.href = '/download_image/' + origPath;
+                updateNavButtons();
+            }
+        }
+
+        function updateNavButtons() {
+            document.getElementById('prevBtn').style.opacity = currentImageIndex === 0 ? '0.3' : '1';
+            document.getElementById('nextBtn').style.opacity = currentImageIndex === currentImages.length - 1 ? '0.3' : '1';
+        }
+
+        function editPost(postId) {
+            window.location.href = `/edit_post/${postId}`;
+        }
+
+        function deletePost(postId, postTitle) {
+            currentDeletePostId = postId;
+            document.getElementById('deleteMessage').textContent = `确定要删除《${postTitle}》吗？此操作无法撤销。`;
+            document.getElementById('deleteModal').style.display = 'block';
+            document.body.style.overflow = 'hidden';
+            document.getElementById('confirmDeleteBtn').onclick = function() {
+                fetch(`/delete_post/${postId}`, { method: 'POST' })
+                    .then(res => res.json())
+                    .then(data => {
+                        if (data.success) {
+                            closeDeleteModal();
+                            location.reload();
+                        } else {
+                            showMessage(data.message || '删除失败', 'error');
+                        }
+                    })
+                    .catch(() => showMessage('删除失败，请重试', 'error'));
+            };
+        }
+
+        function closeDeleteModal() {
+            document.getElementById('deleteModal').style.display = 'none';
+            document.body.style.overflow = 'auto';
+        }
+        function openCommentModal(postId, postTitle, commentId = null, content = '', parentId = null, replyTo = '') {
+            if (!postId || isNaN(postId)) { return; }
+            currentPostId = parseInt(postId);
+            currentCommentId = commentId;
+
+            document.getElementById('commentPostId').value = currentPostId;
+            document.getElementById('commentId').value = commentId || '';
+            document.getElementById('commentParentId').value = parentId || '';
+            document.getElementById('commentContent').value = content;
+
+            const title = commentId ? '编辑评论' : (parentId ? `回复 @${replyTo}` : `为《${postTitle}》添加评论`);
+            document.getElementById('commentModalTitle').textContent = title;
+
+            document.getElementById('commentModal').style.display = 'block';
+            document.body.style.overflow = 'hidden';
+            // 移除 initMic() 调用
+        }
+        function closeCommentModal() {
+            resetVoiceState(); // 这个函数已经会调用 clearVoiceRecording() 和 clearRecordingResources()
+            document.getElementById('commentModal').style.display = 'none';
+            document.body.style.overflow = 'auto';
+            currentCommentId = null;
+            document.getElementById('commentForm').reset();
+        }
+
+
+        // 渲染单条评论（顶层评论或回复）
+        function renderComment(comment) {
+            // 头像 HTML
+            let avatarHtml = '';
+            if (comment.author_avatar) {
+                avatarHtml = `<div class="comment-avatar"><img src="/${comment.author_avatar}" alt="头像"></div>`;
+            } else {
+                avatarHtml = `<div class="comment-avatar"><span class="comment-avatar-text">${comment.author ? comment.author[0] : '?'}</span></div>`;
+            }
+
+            // 判断是否为管理员 - 假设后端返回的comment对象中有is_admin字段
+            const isAdmin = comment.is_admin || false;
+
+            const adminIconHtml = isAdmin
+            ? `<img src="/static/img/dav.png" alt="大V" style="height: 1.5em; width: auto; vertical-align: middle; margin-left: 2px; display: inline-block;position: relative; top: -2px;" onerror="this.style.display='none'" class="admin-icon">`
+            : '';
+
+            // 编辑/删除按钮（仅当can_edit为true）
+            let actionsHtml = '';
+            if (comment.can_edit) {
+                // 判断是否为语音评论
+                const isVoiceComment = comment.voice_path ? true : false;
+
+                if (isVoiceComment) {
+                    // 语音评论只显示删除按钮
+                    actionsHtml = `
+                        <div class="comment-actions" style="display:flex; flex-direction:column; gap:4px;">
+                            <button class="comment-delete-btn" onclick="deleteComment(${comment.id})">🗑️ 删除</button>
+                        </div>`;
+                } else {
+                    // 文字评论显示编辑和删除按钮
+                    actionsHtml = `
+                        <div class="comment-actions" style="display:flex; flex-direction:column; gap:4px;">
+                            <button class="comment-edit-btn" onclick="editComment(${comment.id}, \`${comment.content.replace(/`/g, '\\`')}\`)">✏️ 编辑</button>
+                            <button class="comment-delete-btn" onclick="deleteComment(${comment.id})">🗑️ 删除</button>
+                        </div>`;
+                }
+            }
+
+            // 作者链接（带管理员图标）
+            let authorHtml = comment.author_id
+                ? `<a href="/user/${comment.author_id}" style="color:#FDC2CC;text-decoration:none;" class="comment-author">${comment.author}${adminIconHtml}</a>`
+                : `<span class="comment-author">${comment.author}${adminIconHtml}</span>`;
+
+            return `
+                <div class="comment-item${comment.depth ? ' comment-reply' : ''}">
+                    <div class="comment-header">
+                        <div style="display:flex;align-items:center;gap:6px;">
+                            ${avatarHtml}
+                            ${authorHtml}
+                            ${renderCommentReplyTo(comment)}
+                            <span class="comment-date">${comment.date}</span>
+                        </div>
+                        ${actionsHtml}
+                    </div>
+                    <div class="comment-content">
+                        ${comment.voice_path ? renderVoiceBubble(comment.voice_path, comment.voice_duration || 0, comment.id) : comment.content}
+                    </div>
+                    ${renderCommentReplyButton(comment)}
+                </div>`;
+        }
+
+        function loadComments(postId) {
+            if (!postId || isNaN(postId)) return;
+            const numericPostId = parseInt(postId);
+            fetch(`/get_comments/${numericPostId}`)
+                .then(res => res.json())
+                .then(data => {
+                    const commentsList = document.getElementById('commentsList');
+                    const commentCount = document.getElementById('commentCount');
+                    commentCount.textContent = data.count;
+
+                    if (data.comments.length === 0) {
+                        commentsList.innerHTML = '<div class="no-comments">暂无评论！</div>';
+                    } else {
+                        commentsList.innerHTML = data.comments.map(thread => renderComment(thread) + renderCommentReplies(thread)).join('') + renderMoreComments(postId, data.next_cursor);
+                    }
+                })
+                .catch(err => {
+                    console.error('加载评论失败:', err);
+                    const commentsList = document.getElementById('commentsList');
+                    if (commentsList) commentsList.innerHTML = '<div class="no-comments" style="color:#dc3545;">加载评论失败</div>';
+                });
+        }
+
+        function editComment(commentId, content) {
+            if (!currentPostId) return;
+            openCommentModal(currentPostId, '', commentId, content);
+        }
+
+        function deleteComment(commentId) {
+            if (!currentPostId) return;
+            if (confirm('确定要删除这条评论吗？')) {
+                fetch(`/delete_comment/${commentId}`, {
+                    method: 'POST',
+                    headers: { 'Content-Type': 'application/json' }
+                })
+                .then(res => res.json())
+                .then(data => {
+                    if (data.success) {
+                        loadComments(currentPostId);
+                        showMessage('评论删除成功！', 'success');
+                    } else {
+                        showMessage('删除失败: ' + data.message, 'error');
+                    }
+                })
+                .catch(() => showMessage('删除失败，请重试', 'error'));
+            }
+        }
+
+        document.getElementById('commentForm').addEventListener('submit', async function(e) {
+            e.preventDefault();
+            const formData = new FormData(this);
+            const postId = parseInt(formData.get('post_id'));
+            if (!postId || isNaN(postId)) { showMessage('文章信息错误', 'error'); return; }
+
+            const commentId = formData.get('comment_id');
+            const url = commentId ? `/edit_comment/${commentId}` : '/add_comment';
+            const isEdit = !!commentId;
+
+            let voicePath = null;
+            let voiceDuration = null;
+            let textContent = formData.get('content').trim();
+
+            // 有录音则先上传语音
+            if (recordedBlob) {
+                const vForm = new FormData();
+                vForm.append('voice', recordedBlob, 'voice.wav');
+                vForm.append('duration', recordedDuration);
+                try {
+                    const res = await fetch('/upload_voice', { method: 'POST', body: vForm });
+                    const vData = await res.json();
+                    if (!vData.success) {
+                        showMessage('语音上传失败: ' + vData.message, 'error');
+                        clearRecordingResources();
+                        return;
+                    }
+                    voicePath = vData.voice_path;
+                    voiceDuration = vData.duration;
+                    if (!textContent) textContent = '[语音评论]';
+                } catch(err) {
+                    showMessage('语音上传失败，请重试', 'error');
+                    clearRecordingResources();
+                    return;
+                }
+            } else {
+                if (!textContent) { showMessage('评论内容不能为空', 'warning'); return; }
+            }
+
+            const data = { post_id: postId, parent_id: formData.get('parent_id') || null, content: textContent, voice_path: voicePath, voice_duration: voiceDuration };
+
+            fetch(url, {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify(data)
+            })
+            .then(res => res.json())
+            .then(data => {
+                if (data.success) {
+                    // 成功发送后，释放录音资源
+                    clearRecordingResources();
+                    clearVoiceRecording();
+
+                    closeCommentModal();
+                    loadComments(currentPostId);
+                    showMessage(isEdit ? '评论编辑成功！' : '评论添加成功！', 'success');
+                } else {
+                    showMessage(data.message || '操作失败', 'error');
+                    clearRecordingResources();
+                }
+            })
+            .catch(() => {
+                showMessage('提交失败，请重试', 'error');
+                clearRecordingResources();
+            });
+        });
+
+
+        function showMessage(message, type = 'success') {
+            const toast = document.getElementById('messageToast');
+            const messageText = document.getElementById('messageText');
+            messageText.textContent = message;
+            toast.className = `message-toast ${type}`;
+            toast.style.display = 'block';
+            setTimeout(() => { toast.style.display = 'none'; }, 3000);
+        }
+
+        function openPostModalSafe(element) {
+            try {
+                const postData = JSON.parse(element.dataset.post);
+                if (!postData || !postData.id) throw new Error('文章数据无效');
+                currentPostId = parseInt(postData.id);
+
+                // 生成缩略图路径列表
+                const thumbPaths = (postData.images || []).map(imgPath => getThumbPath(imgPath));
+
+                openPostModal(
+                    postData.id,
+                    postData.title,
+                    postData.content,
+                    postData.images,
+                    postData.tags,
+                    postData.date,
+                    postData.author,
+                    postData.author_id,
+                    thumbPaths  // 传递缩略图路径
+                );
+                loadComments(currentPostId);
+            } catch (e) {
+                console.error('解析文章数据失败:', e);
+                alert('无法打开文章详情，请刷新页面重试');
+            }
+        }
+
+        document.addEventListener('keydown', function(e) {
+            if (document.getElementById('imagePreview').style.display === 'block') {
+                if (e.key === 'ArrowLeft') prevImage();
+                else if (e.key === 'ArrowRight') nextImage();
+                else if (e.key === 'Escape') closeImagePreview();
+            } else if (document.getElementById('postModal').style.display === 'block') {
+                if (e.key === 'Escape') closePostModal();
+            } else if (document.getElementById('deleteModal').style.display === 'block') {
+                if (e.key === 'Escape') closeDeleteModal();
+            } else if (document.getElementById('commentModal').style.display === 'block') {
+                if (e.key === 'Escape') closeCommentModal();
+            }
+        });
+
+        window.onclick = function(event) {
+            const modal = document.getElementById('postModal');
+            const preview = document.getElementById('imagePreview');
+            const deleteModal = document.getElementById('deleteModal');
+            const commentModal = document.getElementById('commentModal');
+            if (event.target === modal) closePostModal();
+            else if (event.target === preview) closeImagePreview();
+            else if (event.target === deleteModal) closeDeleteModal();
+            else if (event.target === commentModal) closeCommentModal();
+        }
+
+        // 页面加载优化
+        (function() {
+            const isMobile = /Android|webOS|iPhone|iPad|iPod|BlackBerry|IEMobile|Opera Mini/i.test(navigator.userAgent) || window.innerWidth <= 768;
+            if (isMobile) document.body.classList.add('mobile-device');
+            document.addEventListener('DOMContentLoaded', () => { document.body.classList.add('loaded'); });
+            window.addEventListener('load', () => { setTimeout(() => { document.body.classList.add('fully-loaded'); }, 100); });
+        })();
+
+
+    // ===== 语音评论功能 =====
+
+    // 预先获取的麦克风 stream（复用，避免每次点击都走异步授权流程）
+    var micStream = null;
+
+    // 打开评论弹窗时调用，提前申请麦克风权限
+    function initMic() {
+        if (micStream && micStream.active) return;
+        var isSecure = location.protocol === 'https:' || location.hostname === 'localhost' || location.hostname === '127.0.0.1';
+        if (!isSecure || !navigator.mediaDevices) return;
+        navigator.mediaDevices.getUserMedia({ audio: true, video: false }).then(function(stream) {
+            micStream = stream;
+        }).catch(function() {});
+    }
+
+    // Touch 设备 touchstart 需要 passive:false 才能 preventDefault（阻止点击系统菜单）
+    document.addEventListener('touchstart', function(e) {
+        var btn = e.target && (e.target.id === 'voiceRecordBtn' ? e.target : (e.target.closest && e.target.closest('#voiceRecordBtn')));
+        if (btn) {
+            e.preventDefault();
+            startRecording();
+        }
+    }, { passive: false, capture: true });
+    // mouseup 挂在 document，防止鼠标拖出按钮后停不下来
+    document.addEventListener('mouseup', function() { stopRecording(); });
+    document.addEventListener('contextmenu', function(e) {
+        if (e.target && e.target.id === 'voiceRecordBtn') e.preventDefault();
+    });
+
+    function startRecording() {
+    // 防止重复触发
+    if (audioContext) return;
+
+    // 用特殊占位值标记"正在启动"
+    audioContext = 'pending';
+    clearVoiceRecording();
+
+    var isSecure = location.protocol === 'https:' || location.hostname === 'localhost' || location.hostname === '127.0.0.1';
+    if (!isSecure) {
+        audioContext = null;
+        document.getElementById('voiceRecordStatus').textContent = '⚠️ 语音功能需要 HTTPS 环境';
+        return;
+    }
+    if (!navigator.mediaDevices || !navigator.mediaDevices.getUserMedia) {
+        audioContext = null;
+        document.getElementById('voiceRecordStatus').textContent = '⚠️ 当前浏览器不支持录音';
+        return;
+    }
+
+
+    function doRecord(stream) {
+        // stopRecording 已经把 audioContext 从 'pending' 清为 null，说明用户已松手，放弃
+        if (audioContext !== 'pending') return;
+
+        recordingStream = stream;
+        var ACtor = window.AudioContext || window.webkitAudioContext;
+        var ctx = new ACtor();
+        audioContext = ctx;
+        sampleRate = ctx.sampleRate;
+
+        var source = ctx.createMediaStreamSource(stream);
+        var processor = ctx.createScriptProcessor(4096, 1, 1);
+        pcmChunks = [];
+        processor.onaudioprocess = function(ev) {
+            pcmChunks.push(new Float32Array(ev.inputBuffer.getChannelData(0)));
+        };
+        source.connect(processor);
+        processor.connect(ctx.destination);
+        ctx._processor = processor;
+        ctx._source = source;
+
+        recordingStartTime = Date.now();
+        var btn = document.getElementById('voiceRecordBtn');
+        if (btn) btn.classList.add('recording');
+        document.getElementById('voiceRecordStatus').textContent = '🔴 录音中...';
+        recordingTimer = setInterval(function() {
+            var sec = Math.round((Date.now() - recordingStartTime) / 1000);
+            document.getElementById('voiceRecordStatus').textContent = '🔴 录音中... ' + sec + 's';
+            if (sec >= 60) stopRecording();
+        }, 500);
+    }
+
+    // 每次点击时都重新请求麦克风权限
+    document.getElementById('voiceRecordStatus').textContent = '🎙️ 请求麦克风权限...';
+    navigator.mediaDevices.getUserMedia({ audio: true, video: false })
+        .then(function(stream) {
+            // 检查是否还在 pending 状态（用户是否还按着按钮）
+            if (audioContext !== 'pending') {
+                // 用户已经松手，关闭 stream
+                stream.getTracks().forEach(track => track.stop());
+                return;
+            }
+            doRecord(stream);
+        })
+        .catch(function(err) {
+            audioContext = null;
+            var msg = err.name === 'NotAllowedError' ? '请允许麦克风权限后重试'
+                    : err.name === 'NotFoundError'   ? '未检测到麦克风设备'
+                    : '麦克风错误：' + err.message;
+            document.getElementById('voiceRecordStatus').textContent = '⚠️ ' + msg;
+        });
+}
+
+function stopRecording() {
+    // 若还在 pending 阶段，清掉占位让 doRecord 检测到后退出
+    if (audioContext === 'pending') {
+        audioContext = null;
+        return;
+    }
+    if (!audioContext || !recordingStream) return;
+
+    // 最短录音 300ms，防止 touchstart/touchend 同帧触发误停
+    if (recordingStartTime && Date.now() - recordingStartTime < 300) {
+        // 录音太短，清理资源
+        clearRecordingResources();
+        return;
+    }
+
+    var ctx = audioContext;
+    var chunks = pcmChunks;
+    var sr = sampleRate;
+    var startTime = recordingStartTime;
+
+    // 清理录音相关资源
+    clearRecordingResources();
+
+    recordedDuration = Math.round((Date.now() - startTime) / 1000) || 1;
+
+    var totalLen = 0;
+    for (var i = 0; i < chunks.length; i++) totalLen += chunks[i].length;
+    if (totalLen === 0) {
+        document.getElementById('voiceRecordStatus').textContent = '⚠️ 录音太短，请重试';
+        return;
+    }
+    var merged = new Float32Array(totalLen);
+    var offset = 0;
+    for (var i = 0; i < chunks.length; i++) { merged.set(chunks[i], offset); offset += chunks[i].length; }
+    recordedBlob = encodeWAV(merged, sr);
+    document.getElementById('voiceRecordStatus').textContent = '';
+
+    // 自动提交语音评论
+    submitVoiceComment();
+}
+function clearRecordingResources() {
+    if (audioContext) {
+        try {
+            if (audioContext._processor) audioContext._processor.onaudioprocess = null;
+            if (audioContext._source) audioContext._source.disconnect();
+            if (audioContext._processor) audioContext._processor.disconnect();
+            audioContext.close().catch(function(){});
+        } catch(e2) {}
+        audioContext = null;
+    }
+
+    if (recordingStream) {
+        recordingStream.getTracks().forEach(track => track.stop());
+        recordingStream = null;
+    }
+
+    pcmChunks = [];
+    clearInterval(recordingTimer);
+
+    var btn = document.getElementById('voiceRecordBtn');
+    if (btn) btn.classList.remove('recording');
+
+    // 清除录音开始时间
+    recordingStartTime = null;
+}
+
+
+    function resetVoiceState() {
+        clearVoiceRecording();
+        clearRecordingResources(); // 确保释放麦克风资源
+        if (mediaRecorder && mediaRecorder.state !== 'inactive') mediaRecorder.stop();
+        clearInterval(recordingTimer);
+    }
+    function encodeWAV(samples, sr) {
+        var buf = new ArrayBuffer(44 + samples.length * 2);
+        var view = new DataView(buf);
+        function ws(off, str) { for (var i = 0; i < str.length; i++) view.setUint8(off + i, str.charCodeAt(i)); }
+        ws(0, 'RIFF');
+        view.setUint32(4, 36 + samples.length * 2, true);
+        ws(8, 'WAVE'); ws(12, 'fmt ');
+        view.setUint32(16, 16, true);
+        view.setUint16(20, 1, true);   // PCM
+        view.setUint16(22, 1, true);   // mono
+        view.setUint32(24, sr, true);
+        view.setUint32(28, sr * 2, true);
+        view.setUint16(32, 2, true);
+        view.setUint16(34, 16, true);
+        ws(36, 'data');
+        view.setUint32(40, samples.length * 2, true);
+        var idx = 44;
+        for (var s = 0; s < samples.length; s++) {
+            var v = samples[s] < -1 ? -1 : samples[s] > 1 ? 1 : samples[s];
+            view.setInt16(idx, v < 0 ? v * 0x8000 : v * 0x7FFF, true);
+            idx += 2;
+        }
+        return new Blob([buf], { type: 'audio/wav' });
+    }
+
+    function showVoicePreview(blob, duration) {
+        const url = URL.createObjectURL(blob);
+        previewAudio = new Audio(url);
+        currentVoiceDuration = duration;
+        const preview = document.getElementById('voicePreview');
+        preview.style.display = 'flex';
+        preview.innerHTML = `
+            <button type="button" class="voice-preview-play" id="previewPlayBtn" onclick="togglePreviewPlay()">▶</button>
+            <span class="voice-preview-duration">${duration}"</span>
+            <button type="button" class="voice-preview-del" onclick="clearVoiceRecording()" title="重录">✕</button>`;
+        previewAudio.onended = () => {
+            const pb = document.getElementById('previewPlayBtn');
+            if (pb) pb.textContent = '▶';
+        };
+    }
+
+    function togglePreviewPlay() {
+        if (!previewAudio) return;
+        if (previewAudio.paused) {
+            previewAudio.play();
+            document.getElementById('previewPlayBtn').textContent = '⏸';
+        } else {
+            previewAudio.pause();
+            previewAudio.currentTime = 0;
+            document.getElementById('previewPlayBtn').textContent = '▶';
+        }
+    }
+
+    function clearVoiceRecording() {
+        recordedBlob = null; recordedDuration = 0; currentVoicePath = null; currentVoiceDuration = 0;
+        if (previewAudio) { previewAudio.pause(); previewAudio = null; }
+        var preview = document.getElementById('voicePreview');
+        if (preview) { preview.style.display = 'none'; preview.innerHTML = ''; }
+        var status = document.getElementById('voiceRecordStatus');
+        if (status) status.textContent = '';
+    }
+
+    function submitVoiceComment() {
+    var postId = parseInt(document.getElementById('commentPostId').value);
+    if (!postId || isNaN(postId)) {
+        showMessage('请先打开评论框', 'error');
+        clearRecordingResources();
+        return;
+    }
+    if (!recordedBlob) {
+        showMessage('没有录音内容', 'error');
+        clearRecordingResources();
+        return;
+    }
+
+    document.getElementById('voiceRecordStatus').textContent = '上传中...';
+
+    var vForm = new FormData();
+    vForm.append('voice', recordedBlob, 'voice.wav');
+    vForm.append('duration', recordedDuration);
+
+    fetch('/upload_voice', { method: 'POST', body: vForm })
+    .then(function(res) { return res.json(); })
+    .then(function(vData) {
+        if (!vData.success) {
+            showMessage('语音上传失败: ' + vData.message, 'error');
+            clearRecordingResources();
+            return;
+        }
+        var data = {
+            post_id: postId,
+            parent_id: document.getElementById('commentParentId').value || null,
+            content: '[语音评论]',
+            voice_path: vData.voice_path,
+            voice_duration: vData.duration
+        };
+        return fetch('/add_comment', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify(data)
+        });
+    })
+    .then(function(res) { return res.json(); })
+    .then(function(data) {
+        if (data.success) {
+            // 成功发送后，确保释放所有录音资源
+            clearRecordingResources();
+            clearVoiceRecording();
+
+            closeCommentModal();
+            loadComments(currentPostId);
+            showMessage('语音评论发送成功！', 'success');
+        } else {
+            showMessage(data.message || '提交失败', 'error');
+            document.getElementById('voiceRecordStatus').textContent = '';
+            clearRecordingResources();
+        }
+    })
+    .catch(function(err) {
+        showMessage('提交失败，请重试', 'error');
+        document.getElementById('voiceRecordStatus').textContent = '';
+        clearRecordingResources();
+    });
+}
+
+    function renderVoiceBubble(voicePath, duration, commentId) {
+        return `<div class="voice-bubble" id="vbubble-${commentId}" onclick="playVoiceBubble('/${voicePath}', ${commentId})">
+            <div class="voice-bubble-play">▶</div>
+            <div class="voice-wave"><span></span><span></span><span></span><span></span><span></span><span></span></div>
+            <span class="voice-bubble-duration">${duration || 0}"</span>
+        </div>`;
+    }
+
+    function playVoiceBubble(url, commentId) {
+        if (currentBubbleAudio && !currentBubbleAudio.paused) {
+            currentBubbleAudio.pause();
+            currentBubbleAudio.currentTime = 0;
+            const oldBubble = document.getElementById('vbubble-' + currentBubbleId);
+            if (oldBubble) { oldBubble.classList.remove('playing'); oldBubble.querySelector('.voice-bubble-play').textContent = '▶'; }
+            if (currentBubbleId === commentId) { currentBubbleAudio = null; currentBubbleId = null; return; }
+        }
+        const bubble = document.getElementById('vbubble-' + commentId);
+        const audio = new Audio(url);
+        currentBubbleAudio = audio; currentBubbleId = commentId;
+        audio.play();
+        if (bubble) { bubble.classList.add('playing'); bubble.querySelector('.voice-bubble-play').textContent = '⏸'; }
+        audio.onended = () => {
+            if (bubble) { bubble.classList.remove('playing'); bubble.querySelector('.voice-bubble-play').textContent = '▶'; }
+            currentBubbleAudio = null; currentBubbleId = null;
+        };
+    }
+
+    function resetVoiceState() {
+        clearVoiceRecording();
+        if (mediaRecorder && mediaRecorder.state !== 'inactive') mediaRecorder.stop();
+        clearInterval(recordingTimer);
+    }
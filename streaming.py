@@ -0,0 +1,93 @@
+"""
+流式模板渲染。
+
+render() 边渲染边发送：模板中 {{ stream_flush() }} 所在位置（基础模板的导航和提示信息之后、
+列表页每几张博客卡片之后）把已渲染的内容作为一段发出，积累超过 STREAM_CHUNK_SIZE 字节时也会发出。
+浏览器先收到 <head> 和页面骨架，可以提前下载样式、脚本和首屏缩略图。
+
+错误处理：
+- 第一段（到第一个 stream_flush 为止）在视图函数内渲染，出错时照常进入 Flask 的错误处理，返回错误页；
+- 之后的错误发生时状态码和响应头已经发出，只能记录日志、回滚会话，并在页面末尾输出一条提示后结束。
+提示信息（flash）在开始输出前读取，避免响应头发出后再修改 session。
+被剖析的请求（profiler.py）改为一次渲染完整页面，剖析在 after_request 结束，流式输出会漏掉大部分模板渲染。
+
+Flask 在视图返回后、开始输出前就会执行 teardown，Flask-SQLAlchemy 借此关闭数据库会话，
+模板中懒加载的关系（post.author_user 等）会因对象脱离会话而失败。因此第一段渲染完后把当前会话
+移出 db.session 的作用域，teardown 只会清理之后新建的会话；输出期间由 stream_with_context 恢复请求上下文，
+懒加载仍使用原来的会话。输出结束（上下文再次弹出）时，本模块的 teardown 看到 g._stream_open 已清除，
+关闭这个会话；响应正文从未被读取（HEAD 请求）时在响应关闭时关闭。
+"""
+from flask import Response, current_app, g, get_flashed_messages, render_template, stream_with_context
+from markupsafe import Markup
+
+import metrics
+import profiler
+from database import db
+
+FLUSH_MARKER = '<!-- flush -->'
+ERROR_NOTICE = '<div class="alert alert-error">页面加载中断，请刷新重试</div>'
+
+
+def stream_flush():
+    """模板中的分段点；非流式渲染时不输出任何内容"""
+    return Markup(FLUSH_MARKER) if g.get('_streaming') else ''
+
+
+def _chunks(pieces, chunk_size):
+    buffer, size = [], 0
+    for piece in pieces:
+        buffer.append(piece)
+        size += len(piece)
+        if FLUSH_MARKER in piece or size >= chunk_size:
+            yield ''.join(buffer).replace(FLUSH_MARKER, '')
+            buffer, size = [], 0
+    if buffer:
+        yield ''.join(buffer).replace(FLUSH_MARKER, '')
+
+
+def render(template_name, **context):
+    """以流式响应渲染模板，参数与 render_template 相同"""
+    if profiler.active():
+        return render_template(template_name, **context)
+    app = current_app._get_current_object()
+    template = app.jinja_env.get_or_select_template(template_name)
+    app.update_template_context(context)
+    get_flashed_messages(with_categories=True)  # 在发出响应头前从 session 取出
+    g._streaming = True
+
+    chunks = _chunks(template.generate(context), app.config['STREAM_CHUNK_SIZE'])
+    first = next(chunks, '')  # 出错时直接抛出，由错误处理返回错误页
+    session = g._stream_session = db.session()
+    db.session.registry.clear()  # 移出作用域，视图返回后的 teardown 不会关闭它
+    g._stream_open = True
+
+    def generate():
+        try:
+            yield first
+            yield from chunks
+        except Exception:
+            app.logger.exception(f'流式渲染 {template_name} 中途出错')
+            metrics.inc('blog_stream_errors_total', template=template_name)
+            session.rollback()
+            yield ERROR_NOTICE
+        finally:
+            g._stream_open = False
+
+    response = Response(stream_with_context(generate()), mimetype='text/html')
+    response.headers['X-Accel-Buffering'] = 'no'  # 禁止 nginx 缓冲，分段及时送达浏览器
+    response.call_on_close(session.close)  # 可重复调用，输出结束时已关闭则无操作
+    return response
+
+
+def _close_stream_session(exc):
+    """输出结束后关闭流式渲染使用的会话；输出期间（视图返回后的那次 teardown）不处理"""
+    if g.get('_stream_open'):
+        return
+    session = g.pop('_stream_session', None)
+    if session is not None:
+        session.close()
+
+
+def init_app(app):
+    app.add_template_global(stream_flush)
+    app.teardown_appcontext(_close_stream_session)
@@ -0,0 +1,177 @@
+"""
+好友动态时间线（写扩散 + 读扩散兜底）。
+
+发布博客时把 (post_id, post_date) 写入每位好友的 timeline_entry，好友动态页只需按
+(post_date, post_id) 对自己的时间线做 keyset 分页。好友数超过 TIMELINE_FANOUT_LIMIT 的作者
+发文不写扩散，读取时再从 Post 表按同样的 keyset 条件合并进来。
+加好友时回填双方最近的博客，删好友时清理双方时间线中对方的条目。
+好友数因此跨过 TIMELINE_FANOUT_LIMIT 的作者，同时调整其全部好友的时间线：变为高扇出时清理已写入的条目
+（改由读取时合并），回落时回填最近的博客，并失效这些好友的高扇出作者缓存。
+"""
+from collections import Counter
+from datetime import datetime
+
+from flask import current_app
+from sqlalchemy import func, insert, literal, select
+from sqlalchemy.orm import joinedload
+
+import cache
+import db_routing
+import friend_graph
+from database import db
+from models import Friendship, Post, TimelineEntry
+
+HIGH_FANOUT_TTL = 600  # 好友中高扇出作者集合的缓存时间（秒）
+
+
+def encode_cursor(post_date, post_id):
+    return f"{post_date.strftime('%Y%m%d%H%M%S%f')}-{post_id}"
+
+
+def decode_cursor(cursor):
+    """解析分页游标，返回 (post_date, post_id)，非法游标返回 None"""
+    try:
+        date_part, id_part = cursor.split('-')
+        return datetime.strptime(date_part, '%Y%m%d%H%M%S%f'), int(id_part)
+    except (AttributeError, ValueError):
+        return None
+
+
+def _is_high_fanout(friend_count):
+    return friend_count > current_app.config['TIMELINE_FANOUT_LIMIT']
+
+
+def _high_fanout_key(user_id):
+    return f'timeline:high_fanout:{user_id}'
+
+
+def _high_fanout_friend_ids(user_id):
+    """用户的好友中，发文不写扩散（好友数过多）的作者 id 集合"""
+    key = _high_fanout_key(user_id)
+    ids = cache.get(key)
+    if ids is None:
+        friend_ids = friend_graph.get_friend_ids(user_id)
+        counts = Counter()
+        if friend_ids:
+            # 结果会被缓存，副本的延迟会一直保留到过期，必须读主库
+            with db_routing.primary():
+                for column in (Friendship.user_low_id, Friendship.user_high_id):
+                    counts.update(dict(db.session.query(column, func.count()).filter(
+                        column.in_(friend_ids),
+                        Friendship.status == 'accepted'
+                    ).group_by(column).all()))
+        ids = {uid for uid, count in counts.items() if _is_high_fanout(count)}
+        cache.put(key, ids, HIGH_FANOUT_TTL)
+    return ids
+
+
+def _before(date_column, id_column, before):
+    """keyset 条件：(date, id) < before"""
+    before_date, before_id = before
+    return (date_column < before_date) | ((date_column == before_date) & (id_column < before_id))
+
+
+def fan_out_post(post):
+    """把新博客写入作者每位好友的时间线（需在 post 已 flush 拿到 id 后、提交前调用）"""
+    friend_ids = friend_graph.get_friend_ids(post.user_id)
+    if not friend_ids or _is_high_fanout(len(friend_ids)):
+        return 0
+    db.session.execute(insert(TimelineEntry).values([{
+        'user_id': friend_id,
+        'post_id': post.id,
+        'author_id': post.user_id,
+        'post_date': post.date,
+    } for friend_id in friend_ids]))
+    return len(friend_ids)
+
+
+def prune(user_id, author_id):
+    """从 user 的时间线中移除 author 的全部博客"""
+    TimelineEntry.query.filter_by(user_id=user_id, author_id=author_id).delete(synchronize_session=False)
+
+
+def backfill(user_id, author_id):
+    """把 author 最近的博客回填进 user 的时间线；高扇出作者由读取时合并，无需回填"""
+    prune(user_id, author_id)
+    if _is_high_fanout(len(friend_graph.get_friend_ids(author_id))):
+        return
+    recent = select(
+        literal(user_id), Post.id, Post.user_id, Post.date
+    ).where(Post.user_id == author_id).order_by(Post.date.desc()).limit(
+        current_app.config['TIMELINE_BACKFILL'])
+    db.session.execute(insert(TimelineEntry).from_select(
+        ['user_id', 'post_id', 'author_id', 'post_date'], recent))
+
+
+def _rebalance(author_id, previous_count):
+    """作者的好友数由 previous_count 变化后跨过 TIMELINE_FANOUT_LIMIT 时，调整其全部好友的时间线"""
+    friend_ids = friend_graph.get_friend_ids(author_id)
+    is_high = _is_high_fanout(len(friend_ids))
+    if is_high == _is_high_fanout(previous_count):
+        return
+    if is_high:
+        # 改为读取时合并，已写入的条目不再需要
+        TimelineEntry.query.filter_by(author_id=author_id).delete(synchronize_session=False)
+    else:
+        for friend_id in friend_ids:
+            backfill(friend_id, author_id)
+    cache.delete(*[_high_fanout_key(friend_id) for friend_id in friend_ids])
+
+
+def on_friendship_added(user_id_a, user_id_b):
+    """成为好友后互相回填时间线（需在关系提交、friend_graph 失效之后调用）"""
+    backfill(user_id_a, user_id_b)
+    backfill(user_id_b, user_id_a)
+    for user_id in (user_id_a, user_id_b):
+        _rebalance(user_id, len(friend_graph.get_friend_ids(user_id)) - 1)
+    cache.delete(_high_fanout_key(user_id_a), _high_fanout_key(user_id_b))
+
+
+def on_friendship_removed(user_id_a, user_id_b):
+    """解除好友后互相清理时间线（需在关系提交、friend_graph 失效之后调用）"""
+    prune(user_id_a, user_id_b)
+    prune(user_id_b, user_id_a)
+    for user_id in (user_id_a, user_id_b):
+        _rebalance(user_id, len(friend_graph.get_friend_ids(user_id)) + 1)
+    cache.delete(_high_fanout_key(user_id_a), _high_fanout_key(user_id_b))
+
+
+def read_timeline(user_id, cursor=None, limit=9):
+    """
+    按 keyset 读取一页好友动态。
+    返回 (posts, next_cursor)，没有下一页时 next_cursor 为 None。
+    """
+    before = decode_cursor(cursor) if cursor else None
+
+    query = db.session.query(TimelineEntry.post_id, TimelineEntry.post_date).filter(
+        TimelineEntry.user_id == user_id)
+    if before:
+        query = query.filter(_before(TimelineEntry.post_date, TimelineEntry.post_id, before))
+    rows = query.order_by(TimelineEntry.post_date.desc(), TimelineEntry.post_id.desc()).limit(limit + 1).all()
+
+    # 读扩散兜底：高扇出好友的博客直接从 Post 表按同样的 keyset 条件读取后合并
+    high_fanout_ids = _high_fanout_friend_ids(user_id)
+    if high_fanout_ids:
+        query = db.session.query(Post.id, Post.date).filter(Post.user_id.in_(high_fanout_ids))
+        if before:
+            query = query.filter(_before(Post.date, Post.id, before))
+        rows += query.order_by(Post.date.desc(), Post.id.desc()).limit(limit + 1).all()
+        rows = sorted(set(rows), key=lambda r: (r[1], r[0]), reverse=True)
+
+    page, has_next = rows[:limit], len(rows) > limit
+    next_cursor = encode_cursor(page[-1][1], page[-1][0]) if has_next else None
+
+    posts_by_id = {p.id: p for p in Post.query.options(joinedload(Post.author_user)).filter(
+        Post.id.in_([post_id for post_id, _ in page])).all()} if page else {}
+    return [posts_by_id[post_id] for post_id, _ in page if post_id in posts_by_id], next_cursor
+
+
+def rebuild_all():
+    """根据现有好友关系重建全部时间线（首次上线或数据修复时使用）"""
+    TimelineEntry.query.delete(synchronize_session=False)
+    pairs = db.session.query(Friendship.requester_id, Friendship.receiver_id).filter(
+        Friendship.status == 'accepted').all()
+    for user_id_a, user_id_b in pairs:
+        backfill(user_id_a, user_id_b)
+        backfill(user_id_b, user_id_a)
+    return len(pairs)
@@ -0,0 +1,120 @@
+"""
+本地模拟 Coze 服务，用于离线调试 AI 聊天组件。
+
+实现 /v3/chat（流式与非流式）、/v3/chat/retrieve、/v3/chat/message/list 和 /v1/conversation/create，
+回复内容为对用户消息的复述，按 token 间隔逐段推送。
+
+用法：
+    python tools/mock_coze.py --port 5055 --delay 0.05
+    COZE_API_BASE=http://127.0.0.1:5055 python app.py
+
+特殊消息：
+    包含 [slow] 时每段之间等待 5 秒，用于模拟上游变慢
+    包含 [fail] 时对话直接失败
+"""
+import argparse
+import json
+import time
+import uuid
+
+from flask import Flask, Response, jsonify, request
+
+mock = Flask(__name__)
+mock.config['TOKEN_DELAY'] = 0.05
+
+# 非流式对话：chat_id -> {conversation_id, answer, created, status}
+_chats = {}
+
+
+def _answer_for(message):
+    return f"这是模拟回复：{message}\n（来自本地 mock Coze 服务）"
+
+
+def _tokens(text, size=3):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+def _sse(event, data):
+    return f"event:{event}\ndata:{json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+@mock.route('/v3/chat', methods=['POST'])
+def create_chat():
+    payload = request.get_json(force=True) or {}
+    message = ''.join(m.get('content', '') for m in payload.get('additional_messages', []))
+    chat_id = uuid.uuid4().hex
+    conversation_id = payload.get('conversation_id') or uuid.uuid4().hex
+    answer = _answer_for(message)
+    delay = 5 if '[slow]' in message else mock.config['TOKEN_DELAY']
+    failed = '[fail]' in message
+
+    if not payload.get('stream'):
+        _chats[chat_id] = {
+            'conversation_id': conversation_id,
+            'answer': answer,
+            'created': time.time(),
+            'status': 'failed' if failed else 'in_progress',
+        }
+        return jsonify({'code': 0, 'msg': '', 'data': {
+            'id': chat_id, 'conversation_id': conversation_id, 'status': 'in_progress'}})
+
+    def generate():
+        base = {'id': chat_id, 'conversation_id': conversation_id}
+        yield _sse('conversation.chat.created', dict(base, status='created'))
+        yield _sse('conversation.chat.in_progress', dict(base, status='in_progress'))
+        if failed:
+            yield _sse('conversation.chat.failed', dict(base, status='failed',
+                                                        last_error={'code': 500, 'msg': 'mock failure'}))
+            return
+        for token in _tokens(answer):
+            time.sleep(delay)
+            yield _sse('conversation.message.delta', dict(
+                base, role='assistant', type='answer', content=token, content_type='text'))
+        yield _sse('conversation.message.completed', dict(
+            base, role='assistant', type='answer', content=answer, content_type='text'))
+        yield _sse('conversation.chat.completed', dict(base, status='completed'))
+        yield 'event:done\ndata:"[DONE]"\n\n'
+
+    return Response(generate(), mimetype='text/event-stream')
+
+
+@mock.route('/v1/conversation/create', methods=['POST'])
+def create_conversation():
+    payload = request.get_json(force=True) or {}
+    if any('[fail]' in m.get('content', '') for m in payload.get('messages', [])):
+        return jsonify({'code': 4000, 'msg': 'mock failure'})
+    return jsonify({'code': 0, 'msg': '', 'data': {'id': uuid.uuid4().hex, 'created_at': int(time.time())}})
+
+
+@mock.route('/v3/chat/retrieve')
+def retrieve_chat():
+    chat = _chats.get(request.args.get('chat_id'))
+    if not chat:
+        return jsonify({'code': 4000, 'msg': 'chat not found'}), 404
+    # 模拟生成耗时：按 token 数估算完成时间
+    if chat['status'] == 'in_progress' and \
+            time.time() - chat['created'] >= len(_tokens(chat['answer'])) * mock.config['TOKEN_DELAY']:
+        chat['status'] = 'completed'
+    return jsonify({'code': 0, 'data': {'id': request.args.get('chat_id'),
+                                        'conversation_id': chat['conversation_id'],
+                                        'status': chat['status']}})
+
+
+@mock.route('/v3/chat/message/list')
+def list_messages():
+    chat = _chats.get(request.args.get('chat_id'))
+    if not chat:
+        return jsonify({'code': 4000, 'msg': 'chat not found'}), 404
+    return jsonify({'code': 0, 'data': [
+        {'role': 'assistant', 'type': 'answer', 'content': chat['answer'], 'content_type': 'text'},
+    ]})
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='本地模拟 Coze 服务')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=5055)
+    parser.add_argument('--delay', type=float, default=0.05, help='每段回复之间的间隔（秒）')
+    args = parser.parse_args()
+    mock.config['TOKEN_DELAY'] = args.delay
+    mock.run(host=args.host, port=args.port, threaded=True)
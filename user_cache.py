@@ -0,0 +1,53 @@
+"""
+当前登录用户的快照缓存。
+
+几乎每个请求都要经由 inject_user 取当前用户，但模板和权限判断只用到 id、用户名、角色、头像和简介。
+这里把这几个字段以元组形式缓存在跨进程缓存中（USER_CACHE_TTL 秒），命中时不再加载 User 行。
+修改资料、头像或密码后调用 invalidate() 立即失效；管理员在数据库中直接调整角色时，
+权限变化最迟在 TTL 之后生效。
+"""
+from collections import namedtuple
+
+from flask import current_app
+
+import cache
+import db_routing
+import metrics
+from database import db
+from models import User
+
+_FIELDS = ('id', 'username', 'role', 'avatar_path', 'bio')
+
+
+class UserSnapshot(namedtuple('UserSnapshot', _FIELDS)):
+    """只读的用户快照，属性与 User 同名，可直接传给模板和权限判断"""
+    __slots__ = ()
+
+    @property
+    def is_admin(self):
+        return self.role == 'admin'
+
+
+def _key(user_id):
+    return f'user:{user_id}'
+
+
+def get(user_id):
+    """返回用户快照，用户不存在时返回 None"""
+    row = cache.get(_key(user_id))
+    metrics.cache_result('user', row is not None)
+    if row is None:
+        # 加载期间资料或角色被修改并失效时不回填，避免旧快照被缓存 USER_CACHE_TTL 秒
+        generation = cache.generation(_key(user_id))
+        with db_routing.primary():  # 失效后立即回填，读主库避免缓存副本上的旧资料
+            row = db.session.query(*[getattr(User, field) for field in _FIELDS]).filter(User.id == user_id).first()
+        if row is None:
+            return None
+        row = tuple(row)
+        cache.put_if_current(_key(user_id), row, generation, current_app.config['USER_CACHE_TTL'])
+    return UserSnapshot(*row)
+
+
+def invalidate(user_id):
+    """用户资料变化并提交后调用"""
+    cache.invalidate(_key(user_id))
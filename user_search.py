@@ -0,0 +1,99 @@
+"""
+用户名搜索。
+
+用户名按小写拆成单字和相邻双字写入 username_gram 表：
+  - 前缀匹配直接走 user.username 唯一索引的范围扫描（LIKE 'q%'）；
+  - 子串匹配先用 n-gram 表求出候选用户，再在内存中确认并排序。
+排序规则：完全匹配 > 前缀匹配 > 包含匹配，同级按用户名长度。
+每个查询词的命中结果在跨进程缓存中保留 SEARCH_CACHE_TTL 秒，好友关系状态由 friend_graph 批量补充。
+"""
+import hashlib
+
+from sqlalchemy import func, insert
+
+import cache
+import metrics
+from database import db
+from models import User, UsernameGram
+
+SEARCH_CACHE_TTL = 30  # 搜索结果缓存时间（秒）
+CANDIDATE_LIMIT = 200  # 子串匹配最多取出的候选用户数
+
+
+def username_grams(username):
+    """用户名（小写）的全部单字与相邻双字"""
+    name = username.lower()
+    return {name[i:i + n] for n in (1, 2) for i in range(len(name) - n + 1)}
+
+
+def index_user(user_id, username):
+    """为用户写入 n-gram 索引（注册时调用，与用户同一事务提交）"""
+    UsernameGram.query.filter_by(user_id=user_id).delete(synchronize_session=False)
+    grams = username_grams(username)
+    if grams:
+        db.session.execute(insert(UsernameGram).values([{'gram': g, 'user_id': user_id} for g in grams]))
+
+
+def rebuild_index():
+    """为全部用户重建 n-gram 索引"""
+    UsernameGram.query.delete(synchronize_session=False)
+    users = db.session.query(User.id, User.username).all()
+    for user_id, username in users:
+        index_user(user_id, username)
+    return len(users)
+
+
+def _rank(username, q):
+    name = username.lower()
+    if name == q:
+        return 0, len(name), name
+    if name.startswith(q):
+        return 1, len(name), name
+    return 2, len(name), name
+
+
+def _escape_like(q):
+    return q.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def _search_uncached(q, limit):
+    columns = (User.id, User.username, User.bio, User.avatar_path)
+
+    # 1. 完全匹配 + 前缀匹配：唯一索引上的范围扫描，按索引顺序取前 limit 个，结果与读哪个库无关
+    hits = {row.id: row for row in db.session.query(*columns).filter(
+        User.username.like(_escape_like(q) + '%', escape='\\')
+    ).order_by(User.username).limit(limit).all()}
+
+    # 2. 不足一页时，用 n-gram 求出同时包含查询词全部片段的候选用户
+    if len(hits) < limit:
+        grams = {q} if len(q) == 1 else {q[i:i + 2] for i in range(len(q) - 1)}
+        candidate_ids = db.session.query(UsernameGram.user_id).filter(
+            UsernameGram.gram.in_(grams)
+        ).group_by(UsernameGram.user_id).having(
+            func.count(func.distinct(UsernameGram.gram)) == len(grams)
+        ).limit(CANDIDATE_LIMIT).subquery()
+        for row in db.session.query(*columns).filter(User.id.in_(db.session.query(candidate_ids))).all():
+            if q in row.username.lower():
+                hits.setdefault(row.id, row)
+
+    ranked = sorted(hits.values(), key=lambda row: _rank(row.username, q))[:limit]
+    return [{
+        'id': row.id,
+        'username': row.username,
+        'bio': row.bio,
+        'avatar': f'/static/{row.avatar_path}' if row.avatar_path else None,
+    } for row in ranked]
+
+
+def search(q, limit=10):
+    """按用户名搜索，返回排序后的用户 dict 列表（带缓存）"""
+    q = q.strip().lower()
+    if not q:
+        return []
+    key = 'user_search:' + hashlib.md5(f'{limit}:{q}'.encode('utf-8')).hexdigest()
+    users = cache.get(key)
+    metrics.cache_result('user_search', users is not None)
+    if users is None:
+        users = _search_uncached(q, limit)
+        cache.put(key, users, SEARCH_CACHE_TTL)
+    return users
@@ -0,0 +1,89 @@
+"""
+worker 启动预热。
+
+每个 worker 收到第一个请求时才编译用到的 Jinja 模板、配置 SQLAlchemy 映射、建立数据库连接，
+重启或扩容后的头几个请求明显变慢。这里在开始接收请求前完成这些工作：
+- 模板编译结果（字节码）缓存在 JINJA_BYTECODE_CACHE_DIR，重启后的 worker 直接从磁盘加载，
+  模板文件修改后按修改时间自动失效；
+- 在 uWSGI 下运行时，导入 app.py 的最后一步编译全部模板并配置映射；
+- 每个 worker 预先建立 DB_WARMUP_CONNECTIONS 个数据库连接放入连接池。
+
+uWSGI 默认（preforking）由 master 导入应用后 fork 出 worker：模板和映射在 master 中预热一次，
+各 worker 以写时复制共享；数据库连接不能跨进程共享，fork 之后在各 worker 中丢弃继承的连接池再建立。
+配置 lazy-apps = true 时每个 worker 自己导入应用，导入时直接建立连接。
+开发服务器和 flask 命令不做预热。
+"""
+import os
+import time
+
+from jinja2 import FileSystemBytecodeCache
+from sqlalchemy import text
+from sqlalchemy.orm import configure_mappers
+
+from database import db
+
+try:
+    import uwsgi
+except ImportError:  # 不在 uWSGI 下运行
+    uwsgi = None
+
+
+def compile_templates(app):
+    """编译全部模板（有字节码缓存时从缓存加载），返回模板数"""
+    names = app.jinja_env.list_templates()
+    for name in names:
+        app.jinja_env.get_template(name)
+    return len(names)
+
+
+def prime_pool(app):
+    """为每个数据库（主库与各副本）建立 DB_WARMUP_CONNECTIONS 个连接后归还连接池"""
+    count = app.config['DB_WARMUP_CONNECTIONS']
+    with app.app_context():
+        for engine in db.engines.values():
+            connections = [engine.connect() for _ in range(count)]
+            for connection in connections:
+                connection.execute(text('SELECT 1'))
+                connection.close()
+
+
+def _prime_logged(app):
+    started = time.perf_counter()
+    try:
+        prime_pool(app)
+    except Exception as e:  # 数据库暂时不可用时照常启动，由请求按需重连
+        app.logger.warning(f'预热数据库连接失败: {e}')
+        return
+    app.logger.info(f'worker {os.getpid()} 已建立数据库连接（{(time.perf_counter() - started) * 1000:.0f}ms）')
+
+
+def _after_fork(app):
+    # 丢弃从 master 继承的连接池（不关闭底层连接，以免影响其他进程），再建立本进程的连接
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
+    _prime_logged(app)
+
+
+def init_app(app):
+    """设置 Jinja 字节码缓存；必须在第一次访问 app.jinja_env 之前调用"""
+    directory = app.config['JINJA_BYTECODE_CACHE_DIR']
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+        app.jinja_options = {**app.jinja_options, 'bytecode_cache': FileSystemBytecodeCache(directory)}
+
+
+def on_start(app):
+    """在 app.py 末尾（路由、过滤器都已注册后）调用；只在 uWSGI 下预热"""
+    if uwsgi is None or not app.config['WARMUP_ON_START']:
+        return
+    started = time.perf_counter()
+    templates = compile_templates(app)
+    configure_mappers()
+    app.logger.info(f'已预热 {templates} 个模板（{(time.perf_counter() - started) * 1000:.0f}ms）')
+
+    if uwsgi.worker_id() > 0:  # lazy-apps：已经在 worker 中
+        _prime_logged(app)
+    else:
+        import uwsgidecorators
+        uwsgidecorators.postfork(lambda: _after_fork(app))